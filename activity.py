@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, func, and_, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from models import Artist, Venue, Show, ArtistActivity, VenueActivity, db
+
+#----------------------------------------------------------------------------#
+# Upcoming-show summaries.
+#----------------------------------------------------------------------------#
+
+def _refresh(model, summary, key, show_fk, ids, now):
+    # recomputes the summary rows for `ids` (every row when ids is None) in one
+    # INSERT ... SELECT ... ON CONFLICT, so the cost is one statement per kind
+    source = select(
+        model.id,
+        func.count(Show.id),
+        func.min(Show.start_time),
+        literal(now),
+    ).outerjoin(Show, and_(show_fk == model.id, Show.start_time >= now)) \
+     .group_by(model.id)
+    if ids is not None:
+        source = source.where(model.id.in_(ids))
+
+    statement = insert(summary).from_select(
+        [key, 'upcoming_shows_count', 'next_show_time', 'refreshed_at'], source)
+    statement = statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            'upcoming_shows_count': statement.excluded.upcoming_shows_count,
+            'next_show_time': statement.excluded.next_show_time,
+            'refreshed_at': statement.excluded.refreshed_at,
+        })
+    db.session.execute(statement)
+
+
+def refresh_activity(artist_ids=None, venue_ids=None, now=None, everything=False):
+    # refreshes only the ids given, or both tables when everything=True;
+    # the caller commits
+    now = now or datetime.now()
+    if everything or artist_ids:
+        _refresh(Artist, ArtistActivity, 'artist_id', Show.artist_id,
+                 None if everything else {int(artist_id) for artist_id in artist_ids}, now)
+    if everything or venue_ids:
+        _refresh(Venue, VenueActivity, 'venue_id', Show.venue_id,
+                 None if everything else {int(venue_id) for venue_id in venue_ids}, now)
+
+
+def stale_ids(summary, key, now):
+    # rows whose next show has started are the only ones time can invalidate
+    return db.session.scalars(select(getattr(summary, key)).where(summary.next_show_time < now)).all()
+
+
+@click.command('refresh-activity')
+@click.option('--all', 'everything', is_flag=True,
+              help='Recompute every row instead of only those whose next show has started.')
+@with_appcontext
+def refresh_activity_command(everything):
+    """Recompute upcoming-show counters; run from cron every few minutes."""
+    now = datetime.now()
+    if everything:
+        refresh_activity(now=now, everything=True)
+    else:
+        refresh_activity(stale_ids(ArtistActivity, 'artist_id', now), stale_ids(VenueActivity, 'venue_id', now), now)
+    db.session.commit()
+    click.echo('Activity counters refreshed.')
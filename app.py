@@ -2,99 +2,139 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
-import sys
-import dateutil.parser
-import babel
+# Kept to what every process needs. Controllers, CLI commands and optional
+# dependencies are imported inside create_app, and only when they are used.
+import os
 from flask import Flask, render_template
-from models import db, Venue, Artist, Show
-from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from models import Artist, Venue, Show, db
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import Form
-from flask_migrate import Migrate
-from datetime import datetime
-from routes.IndexController import index_blueprint
-from routes.VenueController import venue_blueprint
-from routes.ArtistController import artist_blueprint
-from routes.ShowController import show_blueprint
+from models import db
 
 
 #----------------------------------------------------------------------------#
-# App Config.
+# App Factory.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db.init_app(app)
-migrate = Migrate(app, db)
+def create_app(config='config'):
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    #  Extensions
+    #  ----------------------------------------------------------------
+    import pool_metrics
+    import http_cache
+    import metrics
+    import warmup
+    from flask_moment import Moment
+    from cache import detail_cache, fragment_cache
+    from thumbnails import thumbnail_store
+    from profiler import QueryProfiler
+
+    Moment(app)
+    if not os.environ.get('FLASK_RUN_FROM_CLI'):
+        _apply_statement_timeout(app)
+    pool_metrics.init_app(app)
+    db.init_app(app)
+    detail_cache.init_app(app)
+    fragment_cache.init_app(app)
+    thumbnail_store.init_app(app)
+    QueryProfiler(app)
+    metrics.init_app(app)
+    http_cache.init_app(app)
+    warmup.init_app(app)
+
+    # Migrations and bulk commands only matter to the `flask` CLI; Flask-Migrate
+    # alone pulls in all of Alembic, so web workers skip them.
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        from importer import import_command
+        from activity import refresh_activity_command
+        from conflicts import conflicts_command
+        from genres import refresh_genres_command
+        from jobs import worker_command
+        from deletion import purge_deleted_command
+        Migrate(app, db)
+        app.cli.add_command(import_command)
+        app.cli.add_command(refresh_activity_command)
+        app.cli.add_command(conflicts_command)
+        app.cli.add_command(refresh_genres_command)
+        app.cli.add_command(worker_command)
+        app.cli.add_command(purge_deleted_command)
+
+    #  Filters
+    #  ----------------------------------------------------------------
+    from filters import format_datetime
+    app.jinja_env.filters['datetime'] = format_datetime
+
+    #  Controllers
+    #  ----------------------------------------------------------------
+    from routes.IndexController import index_blueprint
+    from routes.VenueController import venue_blueprint
+    from routes.ArtistController import artist_blueprint
+    from routes.ShowController import show_blueprint
+    from routes.ApiController import api_blueprint
+    from routes.MetricsController import metrics_blueprint
+    from routes.ImageController import image_blueprint
+
+    app.register_blueprint(index_blueprint)
+    app.register_blueprint(venue_blueprint, url_prefix='/venues')
+    app.register_blueprint(artist_blueprint, url_prefix='/artists')
+    app.register_blueprint(show_blueprint, url_prefix='/shows')
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+    app.register_blueprint(metrics_blueprint)
+    app.register_blueprint(image_blueprint, url_prefix='/img')
+
+    #  Error Handlers
+    #  ----------------------------------------------------------------
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return render_template('errors/404.html'), 404
+
+    @app.errorhandler(500)
+    def server_error(error):
+        return render_template('errors/500.html'), 500
+
+    #  Logging
+    #  ----------------------------------------------------------------
+    if not app.debug and not app.testing:
+        import logging
+        from logging import Formatter, FileHandler
+        file_handler = FileHandler('error.log')
+        file_handler.setFormatter(
+            Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+        )
+        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(logging.INFO)
+        app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
+
+
+def _apply_statement_timeout(app):
+    # a copy, so the config module's options stay free of it for CLI apps
+    timeout_ms = app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if not timeout_ms or not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    connect_args = dict(options.get('connect_args', {}))
+    connect_args['options'] = '-c statement_timeout={}'.format(timeout_ms)
+    options['connect_args'] = connect_args
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
 
 
-
-
-#----------------------------------------------------------------------------#
-# Filters.
-#----------------------------------------------------------------------------#
-
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
-app.jinja_env.filters['datetime'] = format_datetime
-
-
-
-#----------------------------------------------------------------------------#
-# Controllers.
-#----------------------------------------------------------------------------#
-app.register_blueprint(index_blueprint)
-app.register_blueprint(venue_blueprint, url_prefix='/venues')
-app.register_blueprint(artist_blueprint, url_prefix='/artists')
-app.register_blueprint(show_blueprint, url_prefix='/shows')
-
-#----------------------------------------------------------------------------#
-# Error Handlers.
-#----------------------------------------------------------------------------#
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
-
-
-#----------------------------------------------------------------------------#
-# App Debugger.
-#----------------------------------------------------------------------------#
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
-
 #----------------------------------------------------------------------------#
 # App Launcher.
 #----------------------------------------------------------------------------#
 
+# `flask run` and the other `flask` commands find create_app on their own.
+# Under gunicorn, call the factory: gunicorn 'app:create_app()'
+
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
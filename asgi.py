@@ -0,0 +1,83 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#----------------------------------------------------------------------------#
+
+# Serves the read paths (home, venue and artist listings and detail pages,
+# shows) from async handlers over asyncpg, and hands every other request to
+# the regular Flask app, so one server covers the whole site:
+#
+#     $ hypercorn asgi:application --workers 4
+#
+# The Flask app keeps its own psycopg2 pool for the write paths.
+
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, render_template, request, session
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import RequestRedirect
+from async_db import async_db
+from http_cache import cache_control_for
+from routes.AsyncController import (
+   async_index_blueprint,
+   async_venue_blueprint,
+   async_artist_blueprint,
+   async_show_blueprint
+)
+from app import create_app
+from filters import format_datetime
+from thumbnails import thumbnail_url
+
+
+async_app = Quart(__name__)
+async_app.config.from_object('config')
+async_db.init_app(async_app)
+async_app.jinja_env.filters['datetime'] = format_datetime
+async_app.jinja_env.globals['thumbnail_url'] = thumbnail_url
+
+async_app.register_blueprint(async_index_blueprint)
+async_app.register_blueprint(async_venue_blueprint, url_prefix='/venues')
+async_app.register_blueprint(async_artist_blueprint, url_prefix='/artists')
+async_app.register_blueprint(async_show_blueprint, url_prefix='/shows')
+
+
+@async_app.after_request
+async def apply_cache_control(response):
+    policy = cache_control_for(async_app, request, response, session.modified)
+    if policy and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+    return response
+
+
+@async_app.errorhandler(404)
+async def not_found_error(error):
+    return await render_template('errors/404.html'), 404
+
+@async_app.errorhandler(500)
+async def server_error(error):
+    return await render_template('errors/500.html'), 500
+
+
+class ReadPathDispatcher():
+    # routes a request to the async app when one of its URL rules matches
+    # the path and method, otherwise to the wrapped WSGI app
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+
+    def handles(self, scope):
+        adapter = self.async_app.url_map.bind('localhost')
+        try:
+            adapter.match(scope['path'], scope['method'])
+        except RequestRedirect:
+            # /venues -> /venues/ and friends; the async app redirects
+            return True
+        except (NotFound, MethodNotAllowed):
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self.handles(scope):
+            return await self.wsgi_app(scope, receive, send)
+        return await self.async_app(scope, receive, send)
+
+
+application = ReadPathDispatcher(async_app, create_app())
@@ -0,0 +1,43 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+#----------------------------------------------------------------------------#
+# Async database access for the ASGI read paths.
+#----------------------------------------------------------------------------#
+
+class AsyncDatabase():
+    # the models are plain declarative mappings, so the statements in
+    # queries.py run unchanged on an AsyncSession over asyncpg
+    def __init__(self, app=None):
+        self.engine = None
+        self.sessions = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.engine = create_async_engine(app.config['ASYNC_SQLALCHEMY_DATABASE_URI'],
+                                          **app.config.get('ASYNC_SQLALCHEMY_ENGINE_OPTIONS', {}))
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        app.extensions['async_db'] = self
+
+        @app.after_serving
+        async def dispose_engine():
+            await self.engine.dispose()
+
+    # Each call below takes its own session, and with it its own pooled
+    # connection, so independent statements can be awaited together with
+    # asyncio.gather instead of queueing on one connection.
+
+    async def all(self, statement):
+        async with self.sessions() as session:
+            return (await session.execute(statement)).all()
+
+    async def scalars(self, statement):
+        async with self.sessions() as session:
+            return (await session.scalars(statement)).all()
+
+    async def get(self, model, ident):
+        async with self.sessions() as session:
+            return await session.get(model, ident)
+
+
+async_db = AsyncDatabase()
@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# Read-path load benchmark.
+#----------------------------------------------------------------------------#
+
+# Fires the same mix of read requests at one or more running servers and
+# reports throughput and latency percentiles for each, e.g. the sync app
+# under gunicorn against asgi.py under hypercorn:
+#
+#     $ gunicorn 'app:create_app()' --workers 4 --threads 8 --bind :8000
+#     $ hypercorn asgi:application --workers 4 --bind :8001
+#     $ python bench.py http://127.0.0.1:8000 http://127.0.0.1:8001 --concurrency 64
+#
+# Only the standard library is used, so it runs from any machine.
+
+import argparse
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+DEFAULT_PATHS = ('/', '/venues/', '/artists/', '/shows/', '/artists/1', '/venues/1')
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except Exception:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(base_url, paths, requests, concurrency):
+    urls = [base_url.rstrip('/') + path for path in islice(cycle(paths), requests)]
+    with ThreadPoolExecutor(concurrency) as pool:
+        # warm connection pools and caches before timing
+        list(pool.map(fetch, urls[:concurrency]))
+        started = time.perf_counter()
+        results = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    print('{}: {} requests, {} concurrent, {} errors'.format(base_url, requests, concurrency, errors))
+    print('  {:.0f} req/s, p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms'.format(
+        requests / elapsed,
+        percentile(latencies, .50) * 1000,
+        percentile(latencies, .95) * 1000,
+        percentile(latencies, .99) * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('servers', nargs='+', help='base URLs, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='path to request; repeat for a mix (default: the read pages)')
+    args = parser.parse_args()
+    for server in args.servers:
+        run(server, args.paths or DEFAULT_PATHS, args.requests, args.concurrency)
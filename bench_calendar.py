@@ -0,0 +1,125 @@
+#----------------------------------------------------------------------------#
+# Show range-query benchmark.
+#----------------------------------------------------------------------------#
+
+# Grows the shows table through 10k, 100k and 1M rows and times the /shows
+# filters and calendar counts at each size, against the configured Postgres:
+#
+#     $ python bench_calendar.py
+#     $ python bench_calendar.py --sizes 10000 100000 1000000 --max-growth 0.25
+#
+# Shows are generated at a steady rate per day, so a fixed window (one
+# weekend, one month) holds the same rows at every size and only the table
+# around it grows. A range query that scans the table would slow down in step
+# with it; the report's growth column is the log-log slope of latency against
+# table size, 1.0 for linear and near 0 for an index range scan. The script
+# exits non-zero when any query's slope is above --max-growth.
+#
+# Everything runs in one transaction that is rolled back, so the database is
+# left as it was.
+
+import argparse
+import math
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import create_app
+from models import db
+from queries import ShowFilter, calendar_counts_query, show_listing_query
+
+EPOCH = datetime(2030, 1, 4)   # a Friday
+SHOWS_PER_DAY = 200
+VENUES = 500
+ARTISTS = 2000
+CITIES = (('Austin', 'TX'), ('Chicago', 'IL'), ('Denver', 'CO'), ('Portland', 'OR'), ('Seattle', 'WA'))
+
+# all inside the first size's span, so every size has the same rows in them
+QUERIES = (
+    ('weekend in a city', lambda venue_id: show_listing_query(None, 51, ShowFilter(
+        start=EPOCH, end=EPOCH + timedelta(days=3), city='austin', state='TX'))),
+    ('month at a venue', lambda venue_id: show_listing_query(None, 51, ShowFilter(
+        start=EPOCH, end=EPOCH + timedelta(days=30), venue_id=venue_id))),
+    ('day counts, one month', lambda venue_id: calendar_counts_query('day', ShowFilter(
+        start=EPOCH, end=EPOCH + timedelta(days=30)))),
+    ('week counts in a state', lambda venue_id: calendar_counts_query('week', ShowFilter(
+        start=EPOCH, end=EPOCH + timedelta(days=42), state='WA'))),
+)
+
+
+def seed_places(session):
+    # returns (venue ids, artist ids)
+    # create_app gives scripts the web workers' statement_timeout; the bulk
+    # inserts may outlast it, so it is lifted for this transaction
+    session.execute(text('SET LOCAL statement_timeout = 0'))
+    venue_ids = session.execute(text(
+        "INSERT INTO venues (name, city, state, updated_at) "
+        "SELECT 'Bench venue ' || n, (:cities)[1 + n % :city_count], (:states)[1 + n % :city_count], now() "
+        "FROM generate_series(1, :venues) AS n RETURNING id"
+    ), {'cities': [city for city, _ in CITIES], 'states': [state for _, state in CITIES],
+        'city_count': len(CITIES), 'venues': VENUES}).scalars().all()
+    artist_ids = session.execute(text(
+        "INSERT INTO artists (name, updated_at) "
+        "SELECT 'Bench artist ' || n, now() FROM generate_series(1, :artists) AS n RETURNING id"
+    ), {'artists': ARTISTS}).scalars().all()
+    return venue_ids, artist_ids
+
+
+def grow_shows(session, venue_ids, artist_ids, first, last):
+    # shows first..last, inserted in start_time order as a live table fills
+    session.execute(text(
+        "INSERT INTO shows (venue_id, artist_id, start_time, updated_at) "
+        "SELECT (:venue_ids)[1 + n % :venue_count], (:artist_ids)[1 + (n * 7) % :artist_count], "
+        "       :epoch + n * (interval '1 day' / :per_day), now() "
+        "FROM generate_series(:first, :last) AS n"
+    ), {'venue_ids': venue_ids, 'venue_count': len(venue_ids), 'artist_ids': artist_ids,
+        'artist_count': len(artist_ids), 'epoch': EPOCH, 'per_day': SHOWS_PER_DAY,
+        'first': first, 'last': last})
+    session.execute(text('ANALYZE shows'))
+
+
+def time_query(session, query, repeat):
+    # median wall time in milliseconds, after one untimed run to warm caches
+    session.execute(query).all()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        session.execute(query).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-growth', type=float, default=0.25,
+                        help='largest allowed log-log slope of latency against table size')
+    args = parser.parse_args()
+    sizes = sorted(args.sizes)
+
+    app = create_app()
+    with app.app_context():
+        session = db.session
+        try:
+            venue_ids, artist_ids = seed_places(session)
+            results = {name: [] for name, _ in QUERIES}
+            seeded = 0
+            for size in sizes:
+                grow_shows(session, venue_ids, artist_ids, seeded, size - 1)
+                seeded = size
+                for name, build in QUERIES:
+                    results[name].append(time_query(session, build(venue_ids[0]), args.repeat))
+        finally:
+            session.rollback()
+
+    print('{:<24}'.format('query') + ''.join('{:>12}'.format(size) for size in sizes) + '{:>9}'.format('growth'))
+    failed = False
+    for name, timings in results.items():
+        growth = math.log(timings[-1] / timings[0]) / math.log(sizes[-1] / sizes[0]) if len(sizes) > 1 else 0.0
+        failed = failed or growth > args.max_growth
+        print('{:<24}'.format(name) + ''.join('{:>9.2f} ms'.format(timing) for timing in timings)
+              + '{:>9.2f}'.format(growth))
+    raise SystemExit(1 if failed else 0)
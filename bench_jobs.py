@@ -0,0 +1,76 @@
+#----------------------------------------------------------------------------#
+# Job queue throughput benchmark.
+#----------------------------------------------------------------------------#
+
+# Queues a batch of jobs, drains it with 1, 2, 4 and 8 worker threads and
+# reports jobs per second for each, against the configured Postgres or any
+# other database URL:
+#
+#     $ python bench_jobs.py --jobs 20000
+#     $ python bench_jobs.py --database-url sqlite:////tmp/jobs.db --threads 1 4
+#
+# The jobs table is created if it does not exist, and only the jobs queued
+# here are removed afterwards. --work-ms adds simulated work to each job, as
+# a handler that calls out to another service would.
+
+import argparse
+import time
+
+from sqlalchemy import delete
+
+import config
+from app import create_app
+from jobs import enqueue, handler, run_workers
+from models import Job, db
+
+
+@handler('bench')
+def bench_job(payload):
+    if payload['work_ms']:
+        time.sleep(payload['work_ms'] / 1000)
+
+
+def bench_config(database_url):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings['JOBS_EAGER'] = False
+    if database_url:
+        settings['SQLALCHEMY_DATABASE_URI'] = database_url
+        if database_url.startswith('sqlite'):
+            # one writer at a time; the others wait instead of failing
+            settings['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    return type('BenchConfig', (), settings)
+
+
+def fill(count, work_ms, run):
+    started = time.perf_counter()
+    for number in range(count):
+        enqueue('bench', {'work_ms': work_ms}, key='bench:{}:{}'.format(run, number))
+    db.session.commit()
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', help='Defaults to the app configuration.')
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--work-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    app = create_app(bench_config(args.database_url))
+    with app.app_context():
+        Job.__table__.create(db.engine, checkfirst=True)
+        run = int(time.time())
+        try:
+            for threads in args.threads:
+                key = '{}-{}'.format(run, threads)
+                fill_seconds = fill(args.jobs, args.work_ms, key)
+                started = time.perf_counter()
+                counts = run_workers(app, threads, burst=True)
+                elapsed = time.perf_counter() - started
+                print('{:>2} threads: queued {} in {:.2f}s ({:.0f}/s), ran {} in {:.2f}s ({:.0f}/s), {} failed'.format(
+                    threads, args.jobs, fill_seconds, args.jobs / fill_seconds,
+                    counts['done'], elapsed, counts['done'] / elapsed, counts['failed']))
+        finally:
+            db.session.execute(delete(Job).where(Job.name == 'bench'))
+            db.session.commit()
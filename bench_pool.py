@@ -0,0 +1,96 @@
+#----------------------------------------------------------------------------#
+# Connection pool load test.
+#----------------------------------------------------------------------------#
+
+# Sends the listing pages from many threads at once, in-process, under each
+# pool setting in turn, against the configured Postgres as it is. For each
+# setting it reports throughput, latency, failed requests and the pool's own
+# counters: time spent waiting for a connection, checkout timeouts, peak
+# overflow and connections opened.
+#
+#     $ python bench_pool.py
+#     $ python bench_pool.py --threads 32 --hold-ms 20 --setting 5:10:10 --setting 2:0:1
+#
+# A setting is DB_POOL_SIZE:DB_MAX_OVERFLOW:DB_POOL_TIMEOUT. --hold-ms keeps
+# every request's connection checked out that much longer (pg_sleep), as
+# slower queries would, so that a pool smaller than --threads has to queue.
+# Detail and fragment caches are off, so every request reads the database.
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from sqlalchemy import text
+
+import config
+import pool_metrics
+from app import create_app
+from bench import percentile
+from models import db
+
+DEFAULT_PATHS = ('/shows/', '/artists/', '/venues/')
+DEFAULT_SETTINGS = ('5:10:10', '2:0:1', '2:14:10', '16:0:10')
+
+
+def pool_config(pool_size, max_overflow, pool_timeout):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings['DEBUG'] = False
+    settings['DETAIL_CACHE_BACKEND'] = settings['FRAGMENT_CACHE_BACKEND'] = 'none'
+    settings['SQLALCHEMY_ENGINE_OPTIONS'] = dict(config.SQLALCHEMY_ENGINE_OPTIONS, pool_size=pool_size,
+                                                 max_overflow=max_overflow, pool_timeout=pool_timeout)
+    return type('PoolConfig', (), settings)
+
+
+def run(setting, paths, requests, threads, hold_ms):
+    # (requests per second, sorted latencies, failed requests, pool stats)
+    app = create_app(pool_config(*(int(part) for part in setting.split(':'))))
+    # checkout timeouts are counted below instead of logged one by one
+    app.logger.disabled = True
+    if hold_ms:
+        @app.before_request
+        def hold_connection():
+            db.session.execute(text('SELECT pg_sleep(:seconds)'), {'seconds': hold_ms / 1000})
+
+    def fetch(path):
+        started = time.perf_counter()
+        status = app.test_client().get(path).status_code
+        return time.perf_counter() - started, status == 200
+
+    with ThreadPoolExecutor(threads) as executor:
+        # open connections and compile templates before timing
+        list(executor.map(fetch, paths * threads))
+        pool_metrics.reset_stats()
+        started = time.perf_counter()
+        results = list(executor.map(fetch, islice(cycle(paths), requests)))
+        elapsed = time.perf_counter() - started
+    with app.app_context():
+        stats = pool_metrics.pool_stats(db.engine)
+        db.engine.dispose()
+
+    latencies = sorted(latency for latency, _ in results)
+    return requests / elapsed, latencies, sum(1 for _, ok in results if not ok), stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--hold-ms', type=float, default=10)
+    parser.add_argument('--setting', action='append', dest='settings',
+                        help='DB_POOL_SIZE:DB_MAX_OVERFLOW:DB_POOL_TIMEOUT; repeat for several')
+    parser.add_argument('--path', action='append', dest='paths', help='path to request; repeat for a mix')
+    args = parser.parse_args()
+
+    print('{} requests from {} threads, connections held {} ms longer'.format(
+        args.requests, args.threads, args.hold_ms))
+    print('{:<12}{:>9}{:>11}{:>11}{:>8}{:>13}{:>13}{:>10}{:>10}{:>10}'.format(
+        'pool', 'req/s', 'p50', 'p95', 'failed', 'wait/req', 'wait max', 'timeouts', 'overflow', 'connects'))
+    for setting in args.settings or DEFAULT_SETTINGS:
+        rate, latencies, failed, stats = run(setting, list(args.paths or DEFAULT_PATHS),
+                                             args.requests, args.threads, args.hold_ms)
+        print('{:<12}{:>9.0f}{:>8.1f} ms{:>8.1f} ms{:>8}{:>10.2f} ms{:>10.1f} ms{:>10}{:>10}{:>10}'.format(
+            setting, rate, percentile(latencies, .50) * 1000, percentile(latencies, .95) * 1000, failed,
+            stats['checkout_wait_seconds_total'] / max(stats['checkouts'], 1) * 1000,
+            stats['checkout_wait_seconds_max'] * 1000, stats['timeouts'], stats['overflow_peak'],
+            stats['connects']))
@@ -0,0 +1,97 @@
+#----------------------------------------------------------------------------#
+# Search benchmark.
+#----------------------------------------------------------------------------#
+
+# Fills the artists table to 100k rows and times each search term two ways,
+# against the configured Postgres: the ILIKE '%term%' filter OR'ed across
+# name, city and state that /artists/search used to run, and the ranked
+# tsvector/trigram query it runs now (queries.search_query):
+#
+#     $ python bench_search.py
+#     $ python bench_search.py --rows 100000 --term jazz --term 'wild sax'
+#
+# The old path fetched every match; the new one fetches a page, with the
+# total alongside. Everything runs in one transaction that is rolled back,
+# so the database is left as it was.
+
+import argparse
+import statistics
+import time
+
+from sqlalchemy import or_, select, text
+
+from app import create_app
+from models import Artist, ArtistActivity, db
+from queries import search_query
+
+ADJECTIVES = ('Wild', 'Blue', 'Electric', 'Velvet', 'Golden', 'Midnight', 'Silent', 'Crimson', 'Lonely', 'Brass')
+NOUNS = ('Sax Band', 'Quartet', 'Jazz Trio', 'Orchestra', 'Collective', 'Choir', 'Rebels', 'Strings', 'Machine', 'Kids')
+CITIES = (('Austin', 'TX'), ('Chicago', 'IL'), ('Denver', 'CO'), ('Portland', 'OR'), ('San Francisco', 'CA'))
+DEFAULT_TERMS = ('jazz', 'velv', 'wild sax', 'quartet portland', 'golden orchestra 1234', 'nomatch')
+PAGE_SIZE = 20
+
+
+def seed_artists(session, rows):
+    # no statement_timeout for the seeding, as for any bulk load
+    session.execute(text('SET LOCAL statement_timeout = 0'))
+    # names combine a word from each list and a number, so a word matches a
+    # tenth of the table and a pair of words a hundredth
+    session.execute(text(
+        "INSERT INTO artists (name, city, state, genres, updated_at) "
+        "SELECT (:adjectives)[1 + n % 10] || ' ' || (:nouns)[1 + (n / 10) % 10] || ' ' || n, "
+        "       (:cities)[1 + n % :city_count], (:states)[1 + n % :city_count], ARRAY['Jazz'], now() "
+        "FROM generate_series(1, :rows) AS n"
+    ), {'adjectives': list(ADJECTIVES), 'nouns': list(NOUNS), 'cities': [city for city, _ in CITIES],
+        'states': [state for _, state in CITIES], 'city_count': len(CITIES), 'rows': rows})
+    # bulk-inserted rows wait in the GIN indexes' pending lists, which are
+    # scanned linearly until a vacuum merges them; merge them now
+    for index in ('ix_artists_search_vector', 'ix_artists_search_text_trgm'):
+        session.execute(text('SELECT gin_clean_pending_list(CAST(:index AS regclass))'), {'index': index})
+    session.execute(text('ANALYZE artists'))
+
+
+def ilike_query(term):
+    # the search as it was before search_query
+    pattern = '%{}%'.format(term)
+    return select(Artist.id, Artist.name) \
+        .where(or_(Artist.name.ilike(pattern), Artist.city.ilike(pattern), Artist.state.ilike(pattern)))
+
+
+def ranked_query(term):
+    return search_query(Artist, ArtistActivity, ArtistActivity.artist_id, term, PAGE_SIZE)
+
+
+def time_query(session, query, repeat):
+    # (median wall time in milliseconds, rows fetched), after one untimed run to warm caches
+    rows = session.execute(query).all()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        session.execute(query).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--term', action='append', dest='terms', help='search term; repeat for several')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        session = db.session
+        try:
+            seed_artists(session, args.rows)
+            results = [(term, time_query(session, ilike_query(term), args.repeat),
+                        time_query(session, ranked_query(term), args.repeat))
+                       for term in args.terms or DEFAULT_TERMS]
+        finally:
+            session.rollback()
+
+    print('{} artists, pages of {}'.format(args.rows, PAGE_SIZE))
+    print('{:<24}{:>12}{:>9}{:>12}{:>9}{:>10}'.format('term', 'ILIKE', 'rows', 'ranked', 'rows', 'speedup'))
+    for term, (ilike_ms, ilike_rows), (ranked_ms, ranked_rows) in results:
+        print('{:<24}{:>9.2f} ms{:>9}{:>9.2f} ms{:>9}{:>9.1f}x'.format(
+            term, ilike_ms, ilike_rows, ranked_ms, ranked_rows, ilike_ms / ranked_ms))
@@ -0,0 +1,90 @@
+#----------------------------------------------------------------------------#
+# Show tile rendering benchmark.
+#----------------------------------------------------------------------------#
+
+# Renders pages/shows.html with 10k show tiles, and formats their 10k start
+# times on their own, once with the `datetime` filter as it is and once with
+# the filter it replaced, which re-parsed every string with dateutil and
+# recompiled the Babel pattern on every call:
+#
+#     $ python bench_tiles.py
+#     $ python bench_tiles.py --tiles 10000 --repeat 5
+#
+# No database is needed; the tiles are made up in memory.
+
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template
+
+from app import create_app
+from filters import format_datetime
+
+EPOCH = datetime(2030, 1, 4, 20)
+
+
+def legacy_format_datetime(value, format='medium'):
+    # the filter before it cached patterns and took datetimes as they are
+    import babel.dates
+    import dateutil.parser
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def make_tiles(count):
+    # the dicts queries.show_listing_data hands the template
+    return [{
+        'venue_id': number % 50,
+        'venue_name': 'Venue {}'.format(number % 50),
+        'artist_id': number % 200,
+        'artist_name': 'Artist {}'.format(number % 200),
+        'artist_image_link': 'https://example.com/artists/{}.jpg'.format(number % 200),
+        'start_time': (EPOCH + timedelta(hours=3 * number)).strftime('%Y-%m-%d %H:%M:%S'),
+    } for number in range(count)]
+
+
+def median_ms(repeat, run):
+    # median wall time in milliseconds, after one untimed run
+    run()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tiles', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    tiles = make_tiles(args.tiles)
+    times = [tile['start_time'] for tile in tiles]
+    parsed = [datetime.strptime(value, '%Y-%m-%d %H:%M:%S') for value in times]
+
+    def render_page():
+        with app.test_request_context('/shows/'):
+            render_template('pages/shows.html', shows=tiles, next_cursor=None, filter_args={})
+
+    results = [
+        ('filter, legacy', median_ms(args.repeat, lambda: [legacy_format_datetime(value, 'full') for value in times])),
+        ('filter, strings', median_ms(args.repeat, lambda: [format_datetime(value, 'full') for value in times])),
+        ('filter, datetimes', median_ms(args.repeat, lambda: [format_datetime(value, 'full') for value in parsed])),
+    ]
+    app.jinja_env.filters['datetime'] = legacy_format_datetime
+    results.append(('page, legacy filter', median_ms(args.repeat, render_page)))
+    app.jinja_env.filters['datetime'] = format_datetime
+    results.append(('page', median_ms(args.repeat, render_page)))
+
+    print('{} tiles'.format(args.tiles))
+    for name, elapsed in results:
+        print('{:<22}{:>10.1f} ms'.format(name, elapsed))
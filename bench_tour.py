@@ -0,0 +1,113 @@
+#----------------------------------------------------------------------------#
+# Tour booking benchmark.
+#----------------------------------------------------------------------------#
+
+# Books the same number of dates for two bench artists, against the configured
+# Postgres: once as one POST /shows/create per date, once as a single POST
+# /shows/tour, and reports the wall time and statements of each:
+#
+#     $ python bench_tour.py
+#     $ python bench_tour.py --dates 10 40 200
+#
+# Requests go through the app in-process, so the numbers are the app's and
+# the database's work without network or server overhead. A bench artist and
+# venues are created for the run and removed afterwards, with their shows and
+# queued jobs.
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, select
+
+from app import create_app
+from models import Artist, Venue, Show, Job, db
+
+VENUES = 20
+EPOCH = datetime(2031, 1, 1, 20)
+
+
+def seed(run):
+    artists = [Artist(name='Bench tour artist {} {}'.format(run, side)) for side in ('single', 'tour')]
+    venues = [Venue(name='Bench tour venue {} {}'.format(run, number), city='Austin', state='TX')
+              for number in range(VENUES)]
+    db.session.add_all(artists + venues)
+    db.session.commit()
+    return [artist.id for artist in artists], [venue.id for venue in venues]
+
+
+def dates(venue_ids, first_night, count):
+    # one date a night, each at the next venue round the list
+    return [(venue_ids[night % len(venue_ids)], EPOCH + timedelta(days=night))
+            for night in range(first_night, first_night + count)]
+
+
+def count_statements(engine):
+    counter = {'statements': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter['statements'] += 1
+
+    return counter, lambda: event.remove(engine, 'before_cursor_execute', count)
+
+
+def book_singly(client, artist_id, tour):
+    for venue_id, start_time in tour:
+        client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                           'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
+                                           'duration_minutes': 120})
+
+
+def book_as_tour(client, artist_id, tour):
+    client.post('/shows/tour', data={
+        'artist_id': artist_id,
+        'dates': '\n'.join('{}, {:%Y-%m-%d %H:%M}'.format(venue_id, start_time) for venue_id, start_time in tour),
+        'duration_minutes': 120,
+    })
+
+
+def clean_up(artist_ids, venue_ids):
+    show_ids = db.session.scalars(select(Show.id).where(Show.artist_id.in_(artist_ids))).all()
+    keys = ['show-created:{}'.format(show_id) for show_id in show_ids] + \
+           ['tour-created:{}'.format(show_id) for show_id in show_ids]
+    db.session.execute(delete(Job).where(Job.idempotency_key.in_(keys)))
+    db.session.execute(delete(Show).where(Show.artist_id.in_(artist_ids)))
+    db.session.execute(delete(Artist).where(Artist.id.in_(artist_ids)))
+    db.session.execute(delete(Venue).where(Venue.id.in_(venue_ids)))
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dates', type=int, nargs='+', default=[10, 40, 100])
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['JOBS_EAGER'] = False
+    client = app.test_client()
+    print('{:>6}{:>16}{:>12}{:>16}{:>12}{:>10}'.format(
+        'dates', 'single-show', 'queries', 'tour', 'queries', 'speedup'))
+    for count in args.dates:
+        with app.app_context():
+            (single_artist, tour_artist), venue_ids = seed('{}-{}'.format(int(time.time()), count))
+            try:
+                timings = []
+                # the same venues on consecutive runs of nights, so neither
+                # side's dates overlap the other's
+                for book, artist_id, first_night in ((book_singly, single_artist, 0),
+                                                     (book_as_tour, tour_artist, count)):
+                    counter, stop = count_statements(db.engine)
+                    started = time.perf_counter()
+                    book(client, artist_id, dates(venue_ids, first_night, count))
+                    timings.append(((time.perf_counter() - started) * 1000, counter['statements']))
+                    stop()
+                booked = db.session.scalar(select(func.count()).select_from(Show)
+                                           .where(Show.artist_id.in_([single_artist, tour_artist])))
+                if booked != 2 * count:
+                    print('warning: booked {} of {} shows'.format(booked, 2 * count))
+            finally:
+                clean_up([single_artist, tour_artist], venue_ids)
+        (single_ms, single_queries), (tour_ms, tour_queries) = timings
+        print('{:>6}{:>13.1f} ms{:>12}{:>13.1f} ms{:>12}{:>9.1f}x'.format(
+            count, single_ms, single_queries, tour_ms, tour_queries, single_ms / tour_ms))
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# Cache backends.
+#----------------------------------------------------------------------------#
+
+class LRUBackend():
+    # in-process, per-worker cache bounded by entry count; entries also
+    # expire after `ttl` seconds so past/upcoming splits don't go stale
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend():
+    # shared cache for all workers; takes any client exposing get/setex/delete,
+    # so tests can hand in a local stand-in instead of a Redis server
+    def __init__(self, client=None, url=None, ttl=60, prefix='fyyur:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        # evictions happen server side and are reported by Redis INFO
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, json.dumps(value))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def __len__(self):
+        return 0
+
+
+class NullBackend():
+    evictions = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+def backend_from_config(app, kind, size, ttl):
+    # kind is 'memory' (per-worker LRU), 'redis' or anything else for no caching
+    if kind == 'memory':
+        return LRUBackend(size, ttl)
+    if kind == 'redis':
+        return RedisBackend(url=app.config['REDIS_URL'], ttl=ttl)
+    return NullBackend()
+
+
+#----------------------------------------------------------------------------#
+# Detail page cache.
+#----------------------------------------------------------------------------#
+
+class DetailCache():
+    # read-through cache of the artist/venue detail payloads, keyed by
+    # "<kind>:<id>" and invalidated explicitly by the write paths
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        if backend is None:
+            backend = backend_from_config(app, app.config.get('DETAIL_CACHE_BACKEND', 'memory'),
+                                          app.config.get('DETAIL_CACHE_SIZE', 1024),
+                                          app.config.get('DETAIL_CACHE_TTL', 60))
+        self.backend = backend
+        app.extensions['detail_cache'] = self
+
+    def get_or_set(self, kind, entity_id, build):
+        # `build` returns the payload, or None for a missing entity (not cached)
+        key = '{}:{}'.format(kind, entity_id)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = build()
+        if value is not None:
+            self.backend.set(key, value)
+        return value
+
+    async def get_or_set_async(self, kind, entity_id, build):
+        # the same, for the ASGI read paths: `build` is a coroutine function
+        key = '{}:{}'.format(kind, entity_id)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await build()
+        if value is not None:
+            self.backend.set(key, value)
+        return value
+
+    def invalidate(self, kind, *entity_ids):
+        self.backend.delete(*['{}:{}'.format(kind, entity_id) for entity_id in entity_ids])
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "size": len(self.backend)
+        }
+
+
+detail_cache = DetailCache()
+
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+class FragmentCache():
+    # rendered HTML fragments with stale-while-revalidate: an entry is fresh
+    # for FRAGMENT_CACHE_TTL seconds, then kept as a stale copy until the
+    # backend expires it. When an entry is stale or invalidated, one request
+    # per worker re-renders it and the others keep serving the stale copy,
+    # so a burst of traffic after a write costs one query, not one per request.
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.fresh_for = 30
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._locks = {}
+        self._async_locks = {}
+        self._locks_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        self.fresh_for = app.config.get('FRAGMENT_CACHE_TTL', 30)
+        if backend is None:
+            # the backend's own expiry is how long a stale copy may be served
+            backend = backend_from_config(app, app.config.get('FRAGMENT_CACHE_BACKEND', 'memory'),
+                                          app.config.get('FRAGMENT_CACHE_SIZE', 64),
+                                          app.config.get('FRAGMENT_CACHE_STALE_TTL', 600))
+        self.backend = backend
+        app.extensions['fragment_cache'] = self
+
+    def _lock(self, key, locks, factory):
+        with self._locks_lock:
+            return locks.setdefault(key, factory())
+
+    def _fresh(self, entry):
+        # wall-clock time, since a Redis entry is shared between processes
+        return entry is not None and entry['fresh_until'] > time.time()
+
+    def _store(self, key, html):
+        self.misses += 1
+        html = str(html)
+        self.backend.set(key, {'html': html, 'fresh_until': time.time() + self.fresh_for})
+        return html
+
+    def get_or_render(self, key, render):
+        entry = self.backend.get(key)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry['html']
+
+        lock = self._lock(key, self._locks, threading.Lock)
+        if entry is not None and not lock.acquire(blocking=False):
+            # someone else is already re-rendering it
+            self.stale_hits += 1
+            return entry['html']
+        if entry is None:
+            # nothing to fall back on: wait for whoever is rendering it
+            lock.acquire()
+        try:
+            entry = self.backend.get(key)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry['html']
+            return self._store(key, render())
+        finally:
+            lock.release()
+
+    async def get_or_render_async(self, key, render):
+        # the same, for the ASGI read paths: `render` is a coroutine function
+        entry = self.backend.get(key)
+        if self._fresh(entry):
+            self.hits += 1
+            return entry['html']
+
+        lock = self._lock(key, self._async_locks, asyncio.Lock)
+        if entry is not None and lock.locked():
+            self.stale_hits += 1
+            return entry['html']
+        async with lock:
+            entry = self.backend.get(key)
+            if self._fresh(entry):
+                self.hits += 1
+                return entry['html']
+            return self._store(key, await render())
+
+    def invalidate(self, *keys):
+        # marks entries stale rather than dropping them, so the next readers
+        # still have a copy to serve while one of them re-renders
+        for key in keys:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.backend.set(key, dict(entry, fresh_until=0))
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "size": len(self.backend)
+        }
+
+
+fragment_cache = FragmentCache()
@@ -24,4 +24,114 @@ DB_NAME = os.getenv('DB_NAME', 'fyyur_db')
 SQLALCHEMY_DATABASE_URI = 'postgresql+psycopg2://{}:{}@{}/{}'.format(DB_USER, DB_PASSWORD, DB_HOST, DB_NAME)
 
 
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, sized per gunicorn worker. pre_ping and recycle keep
+# connections the load balancer silently dropped from reaching a request.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+}
+# Server-side cap on any single statement. Only web workers apply it (see
+# create_app); migrations and `flask` commands run as long as they need.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+# The ASGI entry point (asgi.py) reads through asyncpg with its own pool
+ASYNC_SQLALCHEMY_DATABASE_URI = 'postgresql+asyncpg://{}:{}@{}/{}'.format(DB_USER, DB_PASSWORD, DB_HOST, DB_NAME)
+ASYNC_SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+    'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+    'connect_args': {
+        'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT_MS)}
+    },
+}
+
+# Per-request SQL profiling: response headers plus one JSON log line per request
+SQL_PROFILER = os.getenv('SQL_PROFILER', 'false').lower() == 'true'
+SQL_PROFILER_NPLUSONE_THRESHOLD = int(os.getenv('SQL_PROFILER_NPLUSONE_THRESHOLD', 3))
+
+# Pagination
+SHOWS_PAGE_SIZE = int(os.getenv('SHOWS_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+AREAS_PER_PAGE = int(os.getenv('AREAS_PER_PAGE', 20))
+SEARCH_RESULTS_PER_PAGE = int(os.getenv('SEARCH_RESULTS_PER_PAGE', 20))
+# Cap on past shows listed on artist/venue pages; unset lists the whole history.
+PAST_SHOWS_LIMIT = int(os.environ['PAST_SHOWS_LIMIT']) if os.getenv('PAST_SHOWS_LIMIT') else None
+
+# JSON API: pages may be large because they are streamed off a server-side cursor
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 10000))
+API_YIELD_PER = int(os.getenv('API_YIELD_PER', 500))
+# Calendar counts: the range used when ?to= is missing, and the widest allowed
+CALENDAR_DEFAULT_DAYS = int(os.getenv('CALENDAR_DEFAULT_DAYS', 31))
+CALENDAR_MAX_DAYS = int(os.getenv('CALENDAR_MAX_DAYS', 366))
+
+# Tour booking: the most dates one request may book
+TOUR_MAX_SHOWS = int(os.getenv('TOUR_MAX_SHOWS', 200))
+# Deleted artists and venues are kept this long before `flask purge-deleted` removes them
+DELETED_RETENTION_DAYS = int(os.getenv('DELETED_RETENTION_DAYS', 30))
+
+# Detail page cache: 'memory' (per-worker LRU), 'redis' or 'none'
+DETAIL_CACHE_BACKEND = os.getenv('DETAIL_CACHE_BACKEND', 'memory')
+DETAIL_CACHE_TTL = int(os.getenv('DETAIL_CACHE_TTL', 60))
+DETAIL_CACHE_SIZE = int(os.getenv('DETAIL_CACHE_SIZE', 1024))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+# Compiled templates are kept here across restarts; `flask warmup` fills it
+JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+
+# Thumbnails served at /img/<kind>/<id>/<size>, rendered once from image_link
+# and kept on disk under a size limit. THUMBNAIL_FETCHER is 'http', or 'local'
+# to read every image from THUMBNAIL_LOCAL_DIR by file name instead.
+THUMBNAIL_SIZES = {'small': (160, 160), 'medium': (320, 320), 'large': (640, 640)}
+THUMBNAIL_CACHE_DIR = os.getenv('THUMBNAIL_CACHE_DIR', os.path.join(basedir, '.thumbnail_cache'))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+THUMBNAIL_FETCHER = os.getenv('THUMBNAIL_FETCHER', 'http')
+THUMBNAIL_LOCAL_DIR = os.getenv('THUMBNAIL_LOCAL_DIR', os.path.join(basedir, 'static', 'img'))
+THUMBNAIL_FETCH_TIMEOUT = float(os.getenv('THUMBNAIL_FETCH_TIMEOUT', 5))
+THUMBNAIL_MAX_SOURCE_BYTES = int(os.getenv('THUMBNAIL_MAX_SOURCE_BYTES', 10 * 1024 * 1024))
+THUMBNAIL_MAX_PIXELS = int(os.getenv('THUMBNAIL_MAX_PIXELS', 40000000))
+# a source that could not be fetched is tried again after this long
+THUMBNAIL_RETRY_SECONDS = int(os.getenv('THUMBNAIL_RETRY_SECONDS', 300))
+# thumbnail URLs carry a version of image_link and are cached for a year;
+# requests without it (or with an old one) are cached briefly
+THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', 365 * 24 * 3600))
+THUMBNAIL_UNVERSIONED_MAX_AGE = int(os.getenv('THUMBNAIL_UNVERSIONED_MAX_AGE', 300))
+
+# Cache-Control for successful GETs, by blueprint. Detail pages and /shows
+# answer conditional requests, so caches may keep them but must revalidate.
+# Form pages carry a CSRF token and are always sent with no-store.
+CACHE_CONTROL = {
+    'home': 'public, max-age=60',
+    'venues': 'public, max-age=0, must-revalidate',
+    'artists': 'public, max-age=0, must-revalidate',
+    'shows': 'public, max-age=0, must-revalidate',
+    'api': 'public, max-age=0, must-revalidate',
+    'metrics': 'no-store',
+}
+
+# Home page fragments: fresh for FRAGMENT_CACHE_TTL seconds, then served stale
+# (while one request re-renders) for up to FRAGMENT_CACHE_STALE_TTL seconds
+FRAGMENT_CACHE_BACKEND = os.getenv('FRAGMENT_CACHE_BACKEND', 'memory')
+FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 30))
+FRAGMENT_CACHE_STALE_TTL = int(os.getenv('FRAGMENT_CACHE_STALE_TTL', 600))
+FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 64))
+
+# Job queue (`flask worker`). JOBS_EAGER runs each job inside the request that
+# queues it instead, for development without a worker running.
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'false').lower() == 'true'
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+# retries wait JOB_BACKOFF_SECONDS, doubling per attempt up to JOB_BACKOFF_MAX_SECONDS
+JOB_BACKOFF_SECONDS = float(os.getenv('JOB_BACKOFF_SECONDS', 2))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv('JOB_BACKOFF_MAX_SECONDS', 600))
+# a running job not finished after this long is assumed lost and run again
+JOB_LOCK_TIMEOUT_SECONDS = int(os.getenv('JOB_LOCK_TIMEOUT_SECONDS', 300))
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', 4))
+WORKER_POLL_SECONDS = float(os.getenv('WORKER_POLL_SECONDS', 1))
+WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', 10))
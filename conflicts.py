@@ -0,0 +1,74 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from models import Show, db
+from queries import booking_conflicts_query
+
+#----------------------------------------------------------------------------#
+# Double bookings.
+#----------------------------------------------------------------------------#
+
+# The exclusion constraints on shows reject an overlapping booking when it is
+# written. These helpers turn that into a message, and report overlaps that
+# predate the constraints or were written around them.
+
+EXCLUSION_VIOLATION = '23P01'
+
+
+def is_double_booking(error):
+    # True for the DBAPIError raised when a write trips an exclusion constraint
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+def booking_conflicts(artist_id, venue_id, start, end):
+    # the shows a new booking would overlap, found before it is written
+    return db.session.execute(booking_conflicts_query(artist_id, venue_id, start, end)).all()
+
+
+def describe_conflict(show, artist_id, venue_id):
+    if show.venue_id == int(venue_id):
+        return 'Venue {} already has show {} from {:%Y-%m-%d %H:%M} to {:%H:%M}.'.format(
+            venue_id, show.id, show.start_time, show.end_time)
+    return 'Artist {} is already playing show {} from {:%Y-%m-%d %H:%M} to {:%H:%M}.'.format(
+        artist_id, show.id, show.start_time, show.end_time)
+
+
+def sweep(key):
+    # One pass over shows ordered by (key, start_time), read off the matching
+    # (key, start_time) index. Within a key, a show overlaps when it starts
+    # before the latest end seen so far, and the show holding that end is the
+    # one it overlaps. Yields (key value, earlier show, overlapping show).
+    column = getattr(Show, key)
+    rows = db.session.execute(
+        select(column.label('key'), Show.id, Show.start_time, Show.end_time)
+        .order_by(column, Show.start_time, Show.id)
+        .execution_options(yield_per=current_app.config['API_YIELD_PER'])
+    )
+    latest = None
+    for row in rows:
+        if latest is None or row.key != latest.key:
+            latest = row
+            continue
+        if row.start_time < latest.end_time:
+            yield row.key, latest, row
+        if row.end_time > latest.end_time:
+            latest = row
+
+
+@click.command('conflicts')
+@click.option('--by', 'keys', type=click.Choice(['venue', 'artist']), multiple=True,
+              help='Only check venues or only artists; both by default.')
+@with_appcontext
+def conflicts_command(keys):
+    """List overlapping shows at each venue and for each artist."""
+    found = 0
+    for key in keys or ('venue', 'artist'):
+        for value, earlier, show in sweep(key + '_id'):
+            found += 1
+            click.echo('{} {}: show {} ({:%Y-%m-%d %H:%M}) overlaps show {} ({:%Y-%m-%d %H:%M} to {:%H:%M})'.format(
+                key, value, show.id, show.start_time, earlier.id, earlier.start_time, earlier.end_time))
+    click.echo('{} overlapping shows found.'.format(found))
+    if found:
+        raise SystemExit(1)
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, update
+
+from genres import count_genres
+from jobs import enqueue
+from models import Artist, Venue, Show, db
+from queries import not_deleted, touch
+
+#----------------------------------------------------------------------------#
+# Deleting artists and venues.
+#----------------------------------------------------------------------------#
+
+# An artist or venue is deleted by setting deleted_at, and its shows are
+# deleted outright, each with one statement whatever the number of rows:
+# nothing is loaded into the session. The row itself stays out of every
+# listing until `flask purge-deleted` removes it; the foreign keys cascade,
+# so the database deletes anything still attached.
+
+DELETABLE = {
+    # kind: (model, its column in shows, the other side, its column in shows)
+    'artist': (Artist, Show.artist_id, Venue, Show.venue_id),
+    'venue': (Venue, Show.venue_id, Artist, Show.artist_id),
+}
+
+
+def soft_delete(kind, entity_id, now=None):
+    # deletes one artist or venue and its shows; returns the ids of the
+    # records on the other side whose shows went with it, or None when
+    # there is no such live record. The caller commits.
+    model, show_key, counterpart, counterpart_key = DELETABLE[kind]
+    now = now or datetime.now()
+    deleted = db.session.execute(
+        update(model)
+        .where(model.id == entity_id, not_deleted(model))
+        .values(deleted_at=now, updated_at=now)
+        .returning(model.genres)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if deleted is None:
+        return None
+    counterpart_ids = sorted(set(db.session.scalars(
+        delete(Show).where(show_key == entity_id).returning(counterpart_key)
+        .execution_options(synchronize_session=False))))
+    count_genres(kind, removed=[deleted.genres])
+    # their pages listed the deleted shows
+    touch(db.session, counterpart, counterpart_ids, now)
+    other = 'venue_ids' if kind == 'artist' else 'artist_ids'
+    enqueue('refresh_activity', {other: counterpart_ids}, key='{}-deleted:{}'.format(kind, entity_id))
+    return counterpart_ids
+
+
+def purge_deleted(older_than):
+    # removes artists and venues deleted before `older_than`; returns
+    # {kind: rows removed}. The caller commits.
+    return {kind: db.session.execute(delete(model).where(model.deleted_at < older_than)).rowcount
+            for kind, (model, _, _, _) in DELETABLE.items()}
+
+
+@click.command('purge-deleted')
+@click.option('--days', type=int, help='Defaults to DELETED_RETENTION_DAYS.')
+@with_appcontext
+def purge_deleted_command(days):
+    """Remove artists and venues deleted more than --days days ago."""
+    days = current_app.config['DELETED_RETENTION_DAYS'] if days is None else days
+    purged = purge_deleted(datetime.now() - timedelta(days=days))
+    db.session.commit()
+    click.echo('Purged {} artists and {} venues.'.format(purged['artist'], purged['venue']))
@@ -0,0 +1,39 @@
+from datetime import datetime
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Template filters.
+#----------------------------------------------------------------------------#
+
+# babel and dateutil are imported on first use rather than at startup: they
+# are among the slowest imports in the app and a worker that never renders
+# a date (or a CLI command) should not pay for them.
+
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def compiled_datetime_pattern(format, locale):
+  # parsing a Babel pattern and resolving a locale is far slower than applying
+  # them, so both are done once per (format, locale)
+  import babel
+  import babel.dates
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale=None):
+  import babel.dates
+  if not isinstance(value, datetime):
+    # controllers hand over strftime('%Y-%m-%d %H:%M:%S') strings; anything
+    # else still goes through the lenient dateutil parser
+    try:
+      value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+      import dateutil.parser
+      value = dateutil.parser.parse(value)
+  format = DATETIME_FORMATS.get(format, format)
+  if format in ('short', 'long'):
+    return babel.dates.format_datetime(value, format, locale=locale or babel.dates.LC_TIME)
+  pattern, locale = compiled_datetime_pattern(format, locale or babel.dates.LC_TIME)
+  return pattern.apply(value, locale)
@@ -1,8 +1,8 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
 import re
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField, RadioField
-from wtforms.validators import ValidationError, DataRequired, AnyOf, URL, optional, length, Regexp
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField, RadioField, IntegerField
+from wtforms.validators import ValidationError, DataRequired, AnyOf, URL, optional, length, Regexp, NumberRange
 
 stateList = [
          ('AL', 'AL'),
@@ -92,6 +92,36 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[optional(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
+
+class TourForm(FlaskForm):
+    artist_id = IntegerField(
+        'artist_id', validators=[DataRequired()]
+    )
+    # one "venue_id, start time" per line
+    dates = TextAreaField(
+        'dates'
+    )
+    # or every date of a recurrence rule at one venue
+    venue_id = IntegerField(
+        'venue_id', validators=[optional()]
+    )
+    start_time = DateTimeField(
+        'start_time', validators=[optional()],
+        format=['%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S']
+    )
+    rule = StringField(
+        'rule', validators=[optional(), length(max=200)]
+    )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[optional(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
 
 class VenueForm(FlaskForm):
     name = StringField(
@@ -0,0 +1,60 @@
+from collections import Counter
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert
+
+from models import Artist, Venue, GenreCount, db
+from queries import not_deleted
+
+#----------------------------------------------------------------------------#
+# Genre counts.
+#----------------------------------------------------------------------------#
+
+GENRE_MODELS = {
+    'artist': Artist,
+    'venue': Venue,
+}
+
+
+def count_genres(kind, added=(), removed=()):
+    # applies the genre lists of created (`added`) and deleted (`removed`)
+    # records to the counts in one upsert; an edit passes its new and old
+    # lists. The caller commits.
+    delta = Counter()
+    for genres in added:
+        delta.update(set(genres or ()))
+    for genres in removed:
+        delta.subtract(set(genres or ()))
+    # sorted, so concurrent writers lock the rows in the same order
+    rows = [{'kind': kind, 'genre': genre, 'total': total} for genre, total in sorted(delta.items()) if total]
+    if not rows:
+        return
+    statement = insert(GenreCount).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=['kind', 'genre'],
+        set_={'total': GenreCount.total + statement.excluded.total})
+    db.session.execute(statement)
+
+
+def refresh_genre_counts(kinds=tuple(GENRE_MODELS)):
+    # recounts from the records themselves; the caller commits
+    for kind in kinds:
+        model = GENRE_MODELS[kind]
+        listed = select(model.id, func.unnest(model.genres).label('genre')) \
+            .where(not_deleted(model)).subquery()
+        db.session.execute(delete(GenreCount).where(GenreCount.kind == kind))
+        db.session.execute(insert(GenreCount).from_select(
+            ['kind', 'genre', 'total'],
+            select(literal(kind), listed.c.genre, func.count(listed.c.id.distinct()))
+            .group_by(listed.c.genre)))
+
+
+@click.command('refresh-genres')
+@with_appcontext
+def refresh_genres_command():
+    """Recount the artists and venues listing each genre."""
+    refresh_genre_counts()
+    db.session.commit()
+    click.echo('Genre counts refreshed.')
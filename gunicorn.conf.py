@@ -0,0 +1,24 @@
+#----------------------------------------------------------------------------#
+# Gunicorn settings.
+#----------------------------------------------------------------------------#
+
+# $ gunicorn
+#
+# The app is loaded once in the master and warmed up there, so every worker
+# forks with compiled templates and a built route map instead of paying for
+# them on its first request. Database connections are only opened lazily,
+# inside the workers, so nothing pooled is shared across the fork.
+
+import os
+
+wsgi_app = 'app:create_app()'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+preload_app = True
+
+
+def when_ready(server):
+    from warmup import warm_up
+    count, elapsed = warm_up(server.app.wsgi())
+    server.log.info('Warmed up %d templates in %.2fs before forking workers', count, elapsed)
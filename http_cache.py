@@ -0,0 +1,82 @@
+import hashlib
+from datetime import timezone
+from flask import request, session, current_app, make_response
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# Pages are checked against their validators before any heavy query runs or
+# any template renders, so an unchanged page costs one small lookup and a 304.
+
+def validators(kind, last_modified, *parts):
+    # (etag, last_modified) for a page of `kind` whose content depends on
+    # `parts` and last changed at `last_modified`; None when there is no
+    # timestamp to go on
+    if last_modified is None:
+        return None
+    digest = hashlib.sha1(repr((kind, last_modified) + parts).encode()).hexdigest()[:20]
+    # updated_at is naive local time; HTTP dates are UTC
+    return '{}-{}'.format(kind, digest), last_modified.astimezone(timezone.utc)
+
+
+def newest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def is_fresh(request, etag, last_modified):
+    # If-None-Match wins over If-Modified-Since, as RFC 9110 asks
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    # weak, because the same page may be served gzipped or not
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    return response
+
+
+def conditional(page_validators, render):
+    # a bodiless 304 when the client's copy is current, otherwise render()
+    # with the validators attached
+    if page_validators is None:
+        return render()
+    if is_fresh(request, *page_validators):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+    return set_validators(response, *page_validators)
+
+
+#  Cache-Control
+#  ----------------------------------------------------------------
+
+def no_store(view):
+    # for pages that must never be cached, such as forms carrying a CSRF token
+    view.no_store = True
+    return view
+
+
+def cache_control_for(app, request, response, session_modified=False):
+    # the CACHE_CONTROL policy of the request's blueprint, for successful GETs
+    if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+        return None
+    view = app.view_functions.get(request.endpoint)
+    if getattr(view, 'no_store', False) or session_modified:
+        # a page that consumed a flashed message belongs to one visitor only
+        return 'no-store'
+    return app.config.get('CACHE_CONTROL', {}).get(request.blueprint)
+
+
+def init_app(app):
+    @app.after_request
+    def apply_cache_control(response):
+        policy = cache_control_for(app, request, response, session.modified)
+        if policy and 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = policy
+        return response
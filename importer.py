@@ -0,0 +1,187 @@
+import csv
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from werkzeug.datastructures import MultiDict
+
+from genres import count_genres
+from jobs import enqueue
+from models import Artist, Venue, Show, SHOW_DURATION_MINUTES, db
+from queries import existing_ids, touch
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# form classes are named rather than imported: forms.py is only loaded when
+# an import actually runs, not whenever the CLI starts
+IMPORTS = {
+    'artists': (Artist, 'ArtistForm'),
+    'venues': (Venue, 'VenueForm'),
+    'shows': (Show, 'ShowForm'),
+}
+
+
+def read_rows(path, fmt):
+    # yields (line number, dict, errors) lazily so files of any size stream
+    # through; a JSONL line that is not an object comes with errors instead
+    with open(path, newline='') as source:
+        if fmt == 'csv':
+            for line_no, row in enumerate(csv.DictReader(source), start=2):
+                yield line_no, row, None
+        else:
+            for line_no, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield line_no, None, {'json': [str(error)]}
+                    continue
+                if isinstance(row, dict):
+                    yield line_no, row, None
+                else:
+                    yield line_no, None, {'json': ['expected an object, got {}'.format(type(row).__name__)]}
+
+
+def to_formdata(row):
+    # CSV cells hold genres as "Jazz,Blues"; JSONL rows may use a list
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, item)
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def validate_row(kind, form_class, row):
+    # the same rules the create forms declare; returns (record, errors)
+    form = form_class(formdata=to_formdata(row), meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    record = dict(form.data)
+    if kind == 'shows':
+        try:
+            record['artist_id'] = int(record['artist_id'])
+            record['venue_id'] = int(record['venue_id'])
+        except (TypeError, ValueError):
+            return None, {'artist_id/venue_id': ['must be integer ids']}
+        record['duration_minutes'] = record.get('duration_minutes') or SHOW_DURATION_MINUTES
+    else:
+        seeking = 'seeking_venue' if kind == 'artists' else 'seeking_talent'
+        record[seeking] = str(record[seeking]).lower() == 'true'
+        record['created_at'] = datetime.now()
+    return record, None
+
+
+def resolve_show_keys(batch):
+    # one IN query per side for the whole batch instead of one lookup per row
+    artist_ids = existing_ids(db.session, Artist, {record['artist_id'] for _, record in batch})
+    venue_ids = existing_ids(db.session, Venue, {record['venue_id'] for _, record in batch})
+    resolved, errors = [], []
+    for line_no, record in batch:
+        if record['artist_id'] not in artist_ids:
+            errors.append((line_no, {'artist_id': ['no artist with id {}'.format(record['artist_id'])]}))
+        elif record['venue_id'] not in venue_ids:
+            errors.append((line_no, {'venue_id': ['no venue with id {}'.format(record['venue_id'])]}))
+        else:
+            resolved.append((line_no, record))
+    return resolved, errors
+
+
+def insert_batch(model, batch):
+    # executemany over the whole batch; if the database rejects it, retry row
+    # by row inside savepoints so one bad row only costs itself. The caller
+    # commits, together with the batch's counters.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model), [record for _, record in batch])
+        return len(batch), []
+    except DBAPIError:
+        pass
+
+    inserted, errors = 0, []
+    for line_no, record in batch:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), [record])
+            inserted += 1
+        except DBAPIError as error:
+            errors.append((line_no, {'database': [str(error.orig).strip()]}))
+    return inserted, errors
+
+
+def run_import(kind, path, fmt, batch_size, report=print):
+    import forms
+    model, form_name = IMPORTS[kind]
+    form_class = getattr(forms, form_name)
+    rows = read_rows(path, fmt)
+    total = inserted = failed = 0
+    started = time.perf_counter()
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        total += len(chunk)
+        batch, errors = [], []
+        for line_no, row, row_errors in chunk:
+            if not row_errors:
+                record, row_errors = validate_row(kind, form_class, row)
+            if row_errors:
+                errors.append((line_no, row_errors))
+            else:
+                batch.append((line_no, record))
+        if kind == 'shows':
+            batch, key_errors = resolve_show_keys(batch)
+            errors.extend(key_errors)
+        if batch:
+            batch_inserted, insert_errors = insert_batch(model, batch)
+            inserted += batch_inserted
+            errors.extend(insert_errors)
+            rejected = {line_no for line_no, _ in insert_errors}
+            accepted = [record for line_no, record in batch if line_no not in rejected]
+            if kind == 'shows' and accepted:
+                # their pages list the new shows now; the counters catch up in a job
+                artist_ids = sorted({record['artist_id'] for record in accepted})
+                venue_ids = sorted({record['venue_id'] for record in accepted})
+                touch(db.session, Artist, artist_ids)
+                touch(db.session, Venue, venue_ids)
+                enqueue('refresh_activity', {'artist_ids': artist_ids, 'venue_ids': venue_ids})
+            elif kind != 'shows':
+                count_genres(kind[:-1], added=[record['genres'] for record in accepted])
+            # the rows and their counters commit together
+            db.session.commit()
+        for line_no, row_errors in sorted(errors, key=lambda error: error[0]):
+            report('{}:{}: {}'.format(path, line_no, json.dumps(row_errors)))
+        failed += len(errors)
+
+    elapsed = time.perf_counter() - started
+    report('Imported {} of {} {} ({} rejected) in {:.2f}s, {:.0f} rows/sec'.format(
+        inserted, total, kind, failed, elapsed, total / elapsed if elapsed else 0))
+    return inserted, failed
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def import_command(kind, path, fmt, batch_size):
+    """Bulk-load artists, venues or shows from a CSV or JSONL file."""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    run_import(kind, path, fmt, batch_size, report=click.echo)
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Import-time budget.
+#----------------------------------------------------------------------------#
+
+# Boots the app in a fresh interpreter under `python -X importtime`, prints
+# the slowest top-level imports and exits non-zero when the total is over
+# budget, so CI can catch a heavy import creeping back into worker boot:
+#
+#     $ python importtime.py --budget-ms 1000
+#     $ python importtime.py --cli --budget-ms 1200    # as `flask db upgrade` boots
+#
+# Only the standard library is used.
+
+import argparse
+import os
+import subprocess
+import sys
+
+BOOT = 'from app import create_app; create_app()'
+
+
+def measure(cli=False):
+    # returns [(module, cumulative microseconds)] for the top-level imports
+    env = dict(os.environ)
+    if cli:
+        env['FLASK_RUN_FROM_CLI'] = 'true'
+    else:
+        env.pop('FLASK_RUN_FROM_CLI', None)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', BOOT],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nesting is shown by indentation; top-level imports have the least
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    top = min(depth for depth, _, _ in entries)
+    return [(name, cumulative) for depth, name, cumulative in entries if depth == top]
+
+
+def total_ms(imports):
+    return sum(cumulative for _, cumulative in imports) / 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget-ms', type=float, default=1000)
+    parser.add_argument('--cli', action='store_true', help='boot as the flask CLI does, with its commands')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    imports = measure(args.cli)
+    total = total_ms(imports)
+    for name, cumulative in sorted(imports, key=lambda entry: -entry[1])[:args.top]:
+        print('{:>9.1f} ms  {}'.format(cumulative / 1000, name))
+    print('total {:.1f} ms, budget {:.0f} ms'.format(total, args.budget_ms))
+    sys.exit(0 if total <= args.budget_ms else 1)
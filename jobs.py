@@ -0,0 +1,202 @@
+import random
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Job, db
+
+#----------------------------------------------------------------------------#
+# Job queue.
+#----------------------------------------------------------------------------#
+
+# Follow-up work for a write is queued in the write's own transaction, so a
+# job exists exactly when the write committed, and `flask worker` runs it
+# outside the request. Workers claim ready jobs with FOR UPDATE SKIP LOCKED,
+# so any number of them poll the table without waiting on each other.
+#
+# A job's handler runs in the same transaction that marks it done: its
+# database writes and the completion commit together. A failed job is retried
+# with exponential backoff until JOB_MAX_ATTEMPTS, then left as failed.
+
+HANDLERS = {}
+
+
+def handler(name):
+    # registers the decorated function as the handler of jobs named `name`;
+    # it is called with the job's payload and must not commit
+    def register(function):
+        HANDLERS[name] = function
+        return function
+    return register
+
+
+def enqueue(name, payload=None, key=None, run_at=None, max_attempts=None):
+    # Adds a job to the current transaction; the caller commits. A job whose
+    # idempotency `key` has been used before is not queued again. With
+    # JOBS_EAGER the handler runs right here instead.
+    if name not in HANDLERS:
+        raise KeyError('No job handler named {!r}'.format(name))
+    payload = payload or {}
+    if current_app.config['JOBS_EAGER']:
+        HANDLERS[name](payload)
+        return
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(Job).values(
+        name=name,
+        payload=payload,
+        idempotency_key=key,
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=run_at or datetime.now(),
+    )
+    if key is not None:
+        statement = statement.on_conflict_do_nothing(index_elements=['idempotency_key'])
+    db.session.execute(statement)
+
+
+def backoff(attempts):
+    # seconds before retry number `attempts`, doubling each time, with jitter
+    # so jobs that failed together do not all retry together
+    config = current_app.config
+    delay = min(config['JOB_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['JOB_BACKOFF_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(limit, now=None):
+    # marks up to `limit` ready jobs as running and returns them, in one
+    # statement; jobs another worker holds are skipped rather than waited on
+    now = now or datetime.now()
+    ready = select(Job.id) \
+        .where(Job.status == 'pending', Job.run_at <= now) \
+        .order_by(Job.run_at, Job.id) \
+        .limit(limit) \
+        .with_for_update(skip_locked=True)
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(ready.scalar_subquery()))
+        .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts)
+    ).all()
+    db.session.commit()
+    return claimed
+
+
+def release_lost(now=None):
+    # puts jobs back in the queue whose worker stopped without finishing them.
+    # claim() counted the lost run as an attempt, so a job that keeps taking
+    # its worker down ends up failed instead of being retried forever.
+    now = now or datetime.now()
+    timeout = current_app.config['JOB_LOCK_TIMEOUT_SECONDS']
+    expired = now - timedelta(seconds=timeout)
+    exhausted = Job.attempts >= Job.max_attempts
+    released = db.session.execute(
+        update(Job)
+        .where(Job.status == 'running', Job.locked_at < expired)
+        .values(status=case((exhausted, 'failed'), else_='pending'),
+                run_at=now,
+                finished_at=case((exhausted, now), else_=Job.finished_at),
+                last_error='Worker lost the job: not finished within {} s of being claimed.'.format(timeout))
+    ).rowcount
+    db.session.commit()
+    return released
+
+
+def run(job):
+    # runs one claimed job; returns True when it succeeded
+    try:
+        HANDLERS[job.name](job.payload)
+        db.session.execute(update(Job).where(Job.id == job.id).values(
+            status='done', finished_at=datetime.now(), last_error=None))
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        current_app.logger.warning('Job %s (%s) failed on attempt %s:\n%s', job.id, job.name, job.attempts, error)
+        if job.attempts < job.max_attempts:
+            values = {'status': 'pending', 'run_at': datetime.now() + timedelta(seconds=backoff(job.attempts))}
+        else:
+            values = {'status': 'failed', 'finished_at': datetime.now()}
+        db.session.execute(update(Job).where(Job.id == job.id).values(last_error=error, **values))
+        db.session.commit()
+        return False
+
+
+#  Worker
+#  ----------------------------------------------------------------
+
+def work(app, stop, burst=False, counts=None):
+    # one worker thread: claims a batch, runs it, and sleeps when the queue is
+    # empty. `burst` returns once no job is ready instead of polling.
+    counts = counts if counts is not None else {'done': 0, 'failed': 0}
+    with app.app_context():
+        config = app.config
+        try:
+            while not stop.is_set():
+                jobs = claim(config['WORKER_BATCH_SIZE'])
+                if not jobs:
+                    if release_lost():
+                        continue
+                    if burst:
+                        break
+                    stop.wait(config['WORKER_POLL_SECONDS'])
+                    continue
+                for job in jobs:
+                    counts['done' if run(job) else 'failed'] += 1
+        finally:
+            db.session.remove()
+    return counts
+
+
+def run_workers(app, threads, burst=False):
+    # runs `threads` worker threads until SIGINT/SIGTERM (or, with `burst`,
+    # until the queue is drained); returns {'done': n, 'failed': n}
+    stop = threading.Event()
+    counts = [{'done': 0, 'failed': 0} for _ in range(threads)]
+    pool = [threading.Thread(target=work, args=(app, stop, burst, count), daemon=True) for count in counts]
+
+    def shutdown(signum, frame):
+        # jobs already claimed are finished first
+        stop.set()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        while thread.is_alive():
+            thread.join(0.5)
+    return {key: sum(count[key] for count in counts) for key in ('done', 'failed')}
+
+
+@click.command('worker')
+@click.option('--threads', type=int, help='Defaults to WORKER_THREADS.')
+@click.option('--burst', is_flag=True, help='Exit once no job is ready instead of polling for more.')
+@with_appcontext
+def worker_command(threads, burst):
+    """Run queued jobs until interrupted."""
+    app = current_app._get_current_object()
+    threads = threads or app.config['WORKER_THREADS']
+    click.echo('Worker running with {} threads.'.format(threads))
+    started = time.perf_counter()
+    counts = run_workers(app, threads, burst)
+    click.echo('{} jobs done, {} failed in {:.1f}s.'.format(counts['done'], counts['failed'],
+                                                          time.perf_counter() - started))
+
+
+#  Handlers
+#  ----------------------------------------------------------------
+
+@handler('refresh_activity')
+def refresh_activity_job(payload):
+    # upcoming-show counters of the artists and venues a write touched
+    from activity import refresh_activity
+    refresh_activity(payload.get('artist_ids'), payload.get('venue_ids'))
@@ -0,0 +1,235 @@
+import bisect
+import threading
+import time
+
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Metric types.
+#----------------------------------------------------------------------------#
+
+# Values live in this process only; under gunicorn each worker exposes its own.
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in pairs) + '}'
+
+
+class Metric():
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return ['# HELP {} {}'.format(self.name, self.documentation),
+                '# TYPE {} {}'.format(self.name, self.kind)]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = self.header()
+        for labels, value in sorted(self._values.items()):
+            lines.append('{}{} {}'.format(self.name, _format_labels(self.labelnames, labels), value))
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def expose(self):
+        lines = self.header()
+        for labels, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, _format_labels(self.labelnames, labels, [('le', le)]), cumulative))
+            lines.append('{}_sum{} {}'.format(self.name, _format_labels(self.labelnames, labels), total))
+            lines.append('{}_count{} {}'.format(self.name, _format_labels(self.labelnames, labels), cumulative))
+        return lines
+
+
+#----------------------------------------------------------------------------#
+# Registry.
+#----------------------------------------------------------------------------#
+
+class Registry():
+    def __init__(self):
+        self.metrics = []
+        # callables returning (name, kind, documentation, {labels: value}) at scrape time
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        self.collectors.append(function)
+        return function
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose())
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append('# HELP {} {}'.format(name, documentation))
+                lines.append('# TYPE {} {}'.format(name, kind))
+                for labels, value in samples.items():
+                    lines.append('{}{} {}'.format(name, _format_labels([key for key, _ in labels], [v for _, v in labels]), value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    'fyyur_request_duration_seconds', 'Time spent handling a request.', ('blueprint', 'endpoint')))
+TEMPLATE_RENDER = registry.register(Histogram(
+    'fyyur_template_render_seconds', 'Time spent in render_template, by top-level template.', ('template',)))
+REQUEST_DB_TIME = registry.register(Histogram(
+    'fyyur_request_db_seconds', 'Time a request spent waiting on SQL statements.', ('blueprint', 'endpoint')))
+REQUESTS = registry.register(Counter(
+    'fyyur_requests_total', 'Requests handled.', ('blueprint', 'endpoint', 'status')))
+IN_FLIGHT = registry.register(Gauge(
+    'fyyur_requests_in_flight', 'Requests currently being handled.', ('blueprint',)))
+
+
+def _cache_samples():
+    # every cache the app keeps, read at scrape time
+    from cache import detail_cache, fragment_cache
+    from thumbnails import thumbnail_store
+    caches = {(('cache', 'detail'),): detail_cache.stats(), (('cache', 'fragment'),): fragment_cache.stats(),
+              (('cache', 'thumbnail'),): thumbnail_store.stats()}
+
+    def samples(key):
+        return {cache: stats[key] for cache, stats in caches.items() if key in stats}
+
+    yield 'fyyur_cache_hits_total', 'counter', 'Cache lookups answered from the cache.', samples('hits')
+    yield 'fyyur_cache_stale_hits_total', 'counter', 'Lookups answered with a stale copy while it was re-rendered.', samples('stale_hits')
+    yield 'fyyur_cache_misses_total', 'counter', 'Cache lookups that had to be computed.', samples('misses')
+    yield 'fyyur_cache_evictions_total', 'counter', 'Entries evicted to stay within the size bound.', samples('evictions')
+    yield 'fyyur_cache_failures_total', 'counter', 'Misses whose source could not be fetched or decoded.', samples('failures')
+    yield 'fyyur_cache_entries', 'gauge', 'Entries currently held.', samples('size')
+
+
+def _pool_samples():
+    from models import db
+    from pool_metrics import pool_stats
+    stats = pool_stats(db.engine)
+    for key, kind, documentation in (
+            ('checkouts', 'counter', 'Connections checked out of the pool.'),
+            ('invalidations', 'counter', 'Connections invalidated.'),
+            ('timeouts', 'counter', 'Checkouts that gave up waiting for a connection.'),
+            ('checkout_wait_seconds_total', 'counter', 'Time spent waiting for a pooled connection.'),
+            ('checked_out', 'gauge', 'Connections currently checked out.'),
+            ('overflow_in_use', 'gauge', 'Overflow connections currently open.')):
+        if key in stats:
+            name = 'fyyur_db_pool_' + key
+            if kind == 'counter' and not name.endswith('_total'):
+                name += '_total'
+            yield name, kind, documentation, {(): stats[key]}
+
+
+registry.collector(_cache_samples)
+registry.collector(_pool_samples)
+
+
+#----------------------------------------------------------------------------#
+# Flask integration.
+#----------------------------------------------------------------------------#
+
+def _labels():
+    return (request.blueprint or 'app', request.endpoint or 'unmatched')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_start_time'].pop()
+    if has_request_context() and 'metrics_db_time' in g:
+        g.metrics_db_time += elapsed
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault('metrics_render_starts', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    starts = g.get('metrics_render_starts') if has_request_context() else None
+    if starts:
+        TEMPLATE_RENDER.observe(time.perf_counter() - starts.pop(), template.name or 'string')
+
+
+def init_app(app):
+    # on this app's engine only, and once, so DB time is not counted again
+    # for every other app built in the process
+    with app.app_context():
+        engine = app.extensions['sqlalchemy'].engine
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute)):
+        if not event.contains(engine, name, listener):
+            event.listen(engine, name, listener)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_db_time = 0.0
+        IN_FLIGHT.inc(_labels()[0])
+
+    @app.after_request
+    def count_request(response):
+        REQUESTS.inc(*_labels(), str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def stop_timer(exception=None):
+        # streamed responses tear the request context down a second time
+        # once the body is sent; only the first teardown is counted
+        started = g.pop('metrics_start', None)
+        if started is None:
+            return
+        labels = _labels()
+        REQUEST_DURATION.observe(time.perf_counter() - started, *labels)
+        REQUEST_DB_TIME.observe(g.metrics_db_time, *labels)
+        IN_FLIGHT.dec(labels[0])
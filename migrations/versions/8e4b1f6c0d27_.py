@@ -0,0 +1,39 @@
+"""add generated search columns with full-text and trigram indexes
+
+Revision ID: 8e4b1f6c0d27
+Revises: 3c7d9e1a2b4f
+Create Date: 2026-10-18 10:03:17.284906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '8e4b1f6c0d27'
+down_revision = '3c7d9e1a2b4f'
+branch_labels = None
+depends_on = None
+
+SEARCH_TEXT = "coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, '')"
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('artists', 'venues'):
+        op.add_column(table, sa.Column('search_text', sa.Text(), sa.Computed(SEARCH_TEXT, persisted=True), nullable=True))
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(),
+                                       sa.Computed("to_tsvector('simple'::regconfig, {})".format(SEARCH_TEXT), persisted=True),
+                                       nullable=True))
+        op.create_index('ix_{}_search_vector'.format(table), table, ['search_vector'], unique=False,
+                        postgresql_using='gin')
+        op.create_index('ix_{}_search_text_trgm'.format(table), table, ['search_text'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        op.drop_index('ix_{}_search_text_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.drop_column(table, 'search_vector')
+        op.drop_column(table, 'search_text')
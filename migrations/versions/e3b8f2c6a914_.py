@@ -0,0 +1,73 @@
+"""soft-delete artists and venues, cascade their shows, index only live rows
+
+Revision ID: e3b8f2c6a914
+Revises: d1a7b5e9f320
+Create Date: 2026-10-18 20:41:52.903117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b8f2c6a914'
+down_revision = 'd1a7b5e9f320'
+branch_labels = None
+depends_on = None
+
+NOT_DELETED = sa.text('deleted_at IS NULL')
+
+# (name, columns, options) of the indexes listings read, rebuilt as partial
+# indexes over rows that are not deleted
+INDEXES = {
+    'artists': [
+        ('ix_artists_created_at', [sa.text('created_at DESC NULLS LAST'), sa.text('id DESC')], {}),
+        ('ix_artists_search_vector', ['search_vector'], {'postgresql_using': 'gin'}),
+        ('ix_artists_genres', ['genres'], {'postgresql_using': 'gin'}),
+        ('ix_artists_search_text_trgm', ['search_text'],
+         {'postgresql_using': 'gin', 'postgresql_ops': {'search_text': 'gin_trgm_ops'}}),
+    ],
+    'venues': [
+        ('ix_venues_city_state', ['city', 'state'], {}),
+        ('ix_venues_lower_city_state', [sa.text('lower(city)'), 'state'], {}),
+        ('ix_venues_created_at', [sa.text('created_at DESC NULLS LAST'), sa.text('id DESC')], {}),
+        ('ix_venues_search_vector', ['search_vector'], {'postgresql_using': 'gin'}),
+        ('ix_venues_genres', ['genres'], {'postgresql_using': 'gin'}),
+        ('ix_venues_search_text_trgm', ['search_text'],
+         {'postgresql_using': 'gin', 'postgresql_ops': {'search_text': 'gin_trgm_ops'}}),
+    ],
+}
+
+FOREIGN_KEYS = (
+    ('shows_artist_id_fkey', 'artists', 'artist_id'),
+    ('shows_venue_id_fkey', 'venues', 'venue_id'),
+)
+
+
+def upgrade():
+    for table, indexes in INDEXES.items():
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        for name, columns, options in indexes:
+            op.drop_index(name, table_name=table)
+            op.create_index(name, table, columns, unique=False, postgresql_where=NOT_DELETED, **options)
+        op.create_index('ix_{}_id_not_deleted'.format(table), table, ['id'], unique=False,
+                        postgresql_where=NOT_DELETED)
+    for name, referred, column in FOREIGN_KEYS:
+        op.drop_constraint(name, 'shows', type_='foreignkey')
+        op.create_foreign_key(name, 'shows', referred, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    # deleted rows would reappear in every listing; the cascade takes
+    # anything still attached to them
+    for table in INDEXES:
+        op.execute('DELETE FROM {} WHERE deleted_at IS NOT NULL'.format(table))
+    for name, referred, column in FOREIGN_KEYS:
+        op.drop_constraint(name, 'shows', type_='foreignkey')
+        op.create_foreign_key(name, 'shows', referred, [column], ['id'])
+    for table, indexes in INDEXES.items():
+        op.drop_index('ix_{}_id_not_deleted'.format(table), table_name=table, postgresql_where=NOT_DELETED)
+        for name, columns, options in indexes:
+            op.drop_index(name, table_name=table)
+            op.create_index(name, table, columns, unique=False, **options)
+        op.drop_column(table, 'deleted_at')
@@ -1,7 +1,27 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, ExcludeConstraint
 
 db = SQLAlchemy()
 
+# updated_at feeds the Last-Modified/ETag validators. The ORM bumps it on
+# every UPDATE; writes that change what another record's page shows bump
+# that record too (see queries.touch).
+
+# Searchable text shared by artists and venues. The columns built from it are
+# generated by Postgres, so every INSERT and UPDATE keeps them current.
+SEARCH_TEXT = "coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, '')"
+
+# A show occupies its venue and artist from start_time to end_time; shows
+# listed without a duration are assumed to run two hours.
+SHOW_DURATION_MINUTES = 120
+SHOW_END_TIME = "start_time + duration_minutes * interval '1 minute'"
+
+# Deleted artists and venues keep their row, with deleted_at set, until
+# `flask purge-deleted` removes it. Every listing filters on NOT_DELETED, the
+# predicate of the partial indexes they read, so deleted rows are never visited.
+NOT_DELETED = db.text('deleted_at IS NULL')
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
@@ -15,14 +35,34 @@ class Venue(db.Model):
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(250), nullable=True)
-    shows = db.relationship('Show', backref="venue", lazy=True)
+    # the database deletes a venue's shows with it; the ORM never loads them to do so
+    shows = db.relationship('Show', backref="venue", lazy=True, passive_deletes='all')
     created_at = db.Column(db.DateTime(), nullable=True)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.now, onupdate=datetime.now)
+    deleted_at = db.Column(db.DateTime(), nullable=True)
+    search_text = db.Column(db.Text, db.Computed(SEARCH_TEXT, persisted=True))
+    search_vector = db.Column(TSVECTOR, db.Computed("to_tsvector('simple'::regconfig, {})".format(SEARCH_TEXT), persisted=True))
+
+    __table_args__ = (
+        db.Index('ix_venues_city_state', 'city', 'state', postgresql_where=NOT_DELETED),
+        # /shows?city= matches the city case-insensitively
+        db.Index('ix_venues_lower_city_state', db.func.lower(city), 'state', postgresql_where=NOT_DELETED),
+        # the home page lists the newest venues
+        db.Index('ix_venues_created_at', created_at.desc().nulls_last(), id.desc(), postgresql_where=NOT_DELETED),
+        # the API walks venues by id
+        db.Index('ix_venues_id_not_deleted', 'id', postgresql_where=NOT_DELETED),
+        db.Index('ix_venues_search_vector', 'search_vector', postgresql_using='gin', postgresql_where=NOT_DELETED),
+        # /venues?genre= is genres @> ARRAY[genre]
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin', postgresql_where=NOT_DELETED),
+        db.Index('ix_venues_search_text_trgm', 'search_text', postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}, postgresql_where=NOT_DELETED),
+    )
 
 
 class Artist(db.Model):
@@ -33,19 +73,136 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean(), default=False)
     seeking_description = db.Column(db.String(250), nullable=True)
-    shows = db.relationship('Show', backref="artist", lazy=True)
+    shows = db.relationship('Show', backref="artist", lazy=True, passive_deletes='all')
     created_at = db.Column(db.DateTime(), nullable=True)
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.now, onupdate=datetime.now)
+    deleted_at = db.Column(db.DateTime(), nullable=True)
+    search_text = db.Column(db.Text, db.Computed(SEARCH_TEXT, persisted=True))
+    search_vector = db.Column(TSVECTOR, db.Computed("to_tsvector('simple'::regconfig, {})".format(SEARCH_TEXT), persisted=True))
+
+    __table_args__ = (
+        db.Index('ix_artists_created_at', created_at.desc().nulls_last(), id.desc(), postgresql_where=NOT_DELETED),
+        db.Index('ix_artists_id_not_deleted', 'id', postgresql_where=NOT_DELETED),
+        db.Index('ix_artists_search_vector', 'search_vector', postgresql_using='gin', postgresql_where=NOT_DELETED),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin', postgresql_where=NOT_DELETED),
+        db.Index('ix_artists_search_text_trgm', 'search_text', postgresql_using='gin',
+                 postgresql_ops={'search_text': 'gin_trgm_ops'}, postgresql_where=NOT_DELETED),
+    )
 
 class Show(db.Model):
     __tablename__ = 'shows'
 
     id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=SHOW_DURATION_MINUTES,
+                                 server_default=str(SHOW_DURATION_MINUTES))
+    end_time = db.Column(db.DateTime, db.Computed(SHOW_END_TIME, persisted=True))
+    updated_at = db.Column(db.DateTime(), nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        db.CheckConstraint('duration_minutes > 0', name='ck_shows_duration_minutes_positive'),
+        # no venue hosts, and no artist plays, two shows at once; each GiST
+        # index also answers the overlap lookups in queries.booking_conflicts_query
+        ExcludeConstraint(('venue_id', '='), (db.text('tsrange(start_time, end_time)'), '&&'),
+                          name='ex_shows_venue_id_overlap', using='gist'),
+        ExcludeConstraint(('artist_id', '='), (db.text('tsrange(start_time, end_time)'), '&&'),
+                          name='ex_shows_artist_id_overlap', using='gist'),
+        # detail pages filter on the owner and split on start_time
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        # the /shows keyset walks (start_time, id)
+        db.Index('ix_shows_start_time', 'start_time', 'id'),
+        # shows are mostly inserted in start_time order, so a few bytes of
+        # per-block min/max serve the wide range scans behind calendar counts
+        db.Index('ix_shows_start_time_brin', 'start_time', postgresql_using='brin',
+                 postgresql_with={'pages_per_range': 32}),
+    )
+
+
+#----------------------------------------------------------------------------#
+# Activity summaries.
+#----------------------------------------------------------------------------#
+
+# Maintained by activity.refresh_activity() whenever shows are written, and
+# periodically by `flask refresh-activity` as upcoming shows slip into the past.
+class ArtistActivity(db.Model):
+    __tablename__ = 'artist_activity'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, nullable=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_artist_activity_upcoming', 'upcoming_shows_count', 'next_show_time'),
+    )
+
+
+class VenueActivity(db.Model):
+    __tablename__ = 'venue_activity'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, nullable=True)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_venue_activity_upcoming', 'upcoming_shows_count', 'next_show_time'),
+    )
+
+
+#----------------------------------------------------------------------------#
+# Genre counts.
+#----------------------------------------------------------------------------#
+
+# How many artists and venues list each genre, for the listing pages' genre
+# links. Kept current by genres.count_genres() on every artist and venue
+# write; `flask refresh-genres` recounts from scratch.
+class GenreCount(db.Model):
+    __tablename__ = 'genre_counts'
+
+    # 'artist' or 'venue'
+    kind = db.Column(db.String(16), primary_key=True)
+    genre = db.Column(db.String(120), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+#----------------------------------------------------------------------------#
+# Jobs.
+#----------------------------------------------------------------------------#
+
+# Deferred work queued by jobs.enqueue() and run by `flask worker`.
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # a job enqueued twice under the same key runs once
+    idempotency_key = db.Column(db.String(200), nullable=True, unique=True)
+    # pending -> running -> done, or back to pending for a retry, or failed
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        # workers poll for the next ready jobs; done jobs stay out of the index
+        db.Index('ix_jobs_pending_run_at', 'run_at', 'id',
+                 postgresql_where=db.text("status = 'pending'"), sqlite_where=db.text("status = 'pending'")),
+        # and look for jobs whose worker died mid-run
+        db.Index('ix_jobs_running_locked_at', 'locked_at',
+                 postgresql_where=db.text("status = 'running'"), sqlite_where=db.text("status = 'running'")),
+    )
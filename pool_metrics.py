@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool instrumentation.
+#----------------------------------------------------------------------------#
+
+# Counters are per process, so under gunicorn every worker reports its own.
+_lock = threading.Lock()
+_stats = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "invalidations": 0,
+    "timeouts": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+    "overflow_peak": 0,
+}
+
+
+def _incr(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+class InstrumentedQueuePool(QueuePool):
+    # QueuePool offers no event before a checkout starts waiting, so the wait
+    # is timed around _do_get, the method that blocks on the queue
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            _incr("timeouts")
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with _lock:
+                _stats["checkout_wait_seconds_total"] += waited
+                _stats["checkout_wait_seconds_max"] = max(_stats["checkout_wait_seconds_max"], waited)
+                _stats["overflow_peak"] = max(_stats["overflow_peak"], self.overflow())
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    _incr("connects")
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _incr("checkouts")
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    _incr("checkins")
+
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    _incr("invalidations")
+
+
+def init_app(app):
+    # must run before db.init_app, which builds the engine from these options
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        options.setdefault('poolclass', InstrumentedQueuePool)
+
+
+def pool_stats(engine):
+    # snapshot for this worker: cumulative counters plus the pool's live state
+    with _lock:
+        stats = dict(_stats)
+    pool = engine.pool
+    stats["pid"] = os.getpid()
+    if isinstance(pool, QueuePool):
+        stats["pool_size"] = pool.size()
+        stats["checked_out"] = pool.checkedout()
+        stats["overflow_in_use"] = max(pool.overflow(), 0)
+    return stats
+
+
+def reset_stats():
+    # zeroes this worker's counters, between benchmark runs for instance
+    with _lock:
+        for name, value in _stats.items():
+            _stats[name] = type(value)()
@@ -0,0 +1,174 @@
+import json
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Request-level SQL profiler.
+#----------------------------------------------------------------------------#
+
+_whitespace = re.compile(r'\s+')
+# expanded IN lists render one placeholder per value; fold them so
+# "IN (%(id_1)s, %(id_2)s)" and "IN (%(id_1)s)" count as the same shape
+_in_list = re.compile(r'\(\s*(%\(\w+?\)s|\?)(\s*,\s*(%\(\w+?\)s|\?))*\s*\)')
+
+
+def statement_shape(statement):
+    return _in_list.sub('(...)', _whitespace.sub(' ', statement).strip())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if not has_request_context():
+        return
+    profile = g.get('sql_profile')
+    if profile is None:
+        profile = g.sql_profile = {'count': 0, 'time': 0.0, 'shapes': Counter()}
+    profile['count'] += 1
+    profile['time'] += elapsed
+    profile['shapes'][statement_shape(statement)] += 1
+
+
+def request_profile():
+    # the current request's numbers, or None when nothing has run yet
+    profile = g.get('sql_profile')
+    if profile is None:
+        return None
+    threshold = g.get('sql_profile_threshold', 3)
+    repeated = [(shape, count) for shape, count in profile['shapes'].most_common()
+                if count >= threshold and shape.upper().startswith('SELECT')]
+    return {
+        'endpoint': request.endpoint,
+        'count': profile['count'],
+        'time_ms': round(profile['time'] * 1000, 2),
+        'duplicates': [(shape, count) for shape, count in profile['shapes'].most_common() if count > 1],
+        'n_plus_one': repeated,
+    }
+
+
+class QueryProfiler():
+    # opt-in (SQL_PROFILER=true): adds X-Query-Count / X-Query-Time-Ms headers,
+    # an X-N-Plus-One header naming the route when one SELECT shape repeats
+    # SQL_PROFILER_NPLUSONE_THRESHOLD times, and one JSON log line per request
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('SQL_PROFILER'):
+            return
+        threshold = app.config.get('SQL_PROFILER_NPLUSONE_THRESHOLD', 3)
+        # this app's engine only, once however often init_app runs
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+        for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                               ('after_cursor_execute', _after_cursor_execute)):
+            if not event.contains(engine, name, listener):
+                event.listen(engine, name, listener)
+
+        @app.before_request
+        def start_profile():
+            g.sql_profile = {'count': 0, 'time': 0.0, 'shapes': Counter()}
+            g.sql_profile_threshold = threshold
+
+        @app.after_request
+        def report_profile(response):
+            profile = request_profile()
+            if profile is None:
+                return response
+            response.headers['X-Query-Count'] = str(profile['count'])
+            response.headers['X-Query-Time-Ms'] = str(profile['time_ms'])
+            if profile['n_plus_one']:
+                response.headers['X-N-Plus-One'] = '{} ({} repeated statements)'.format(
+                    profile['endpoint'], len(profile['n_plus_one']))
+            app.logger.info(json.dumps({
+                'event': 'sql_profile',
+                'endpoint': profile['endpoint'],
+                'path': request.path,
+                'queries': profile['count'],
+                'db_time_ms': profile['time_ms'],
+                'duplicates': [{'statement': shape, 'count': count} for shape, count in profile['duplicates']],
+                'n_plus_one': [{'statement': shape, 'count': count} for shape, count in profile['n_plus_one']],
+            }))
+            return response
+
+
+#  Query budgets
+#  ----------------------------------------------------------------
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(limit):
+    # fails when the wrapped block (typically one test-client request)
+    # issues more than `limit` statements on the current app's engine:
+    #
+    #     with app.app_context(), query_budget(2):
+    #         client.get('/shows/')
+    engine = current_app.extensions['sqlalchemy'].engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement_shape(statement))
+
+    event.listen(engine, 'after_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'after_cursor_execute', record)
+    if len(statements) > limit:
+        raise QueryBudgetExceeded('{} queries issued, budget is {}:\n{}'.format(
+            len(statements), limit, '\n'.join(statements)))
+
+
+#  Debug toolbar panel
+#  ----------------------------------------------------------------
+
+try:
+    from flask_debugtoolbar.panels import DebugPanel
+except ImportError:
+    DebugPanel = None
+
+if DebugPanel is not None:
+    from markupsafe import escape
+
+    class SQLProfilerPanel(DebugPanel):
+        # enable with DEBUG_TB_PANELS += ('profiler.SQLProfilerPanel',)
+        name = 'SQLProfiler'
+        has_content = True
+
+        def nav_title(self):
+            return 'SQL profile'
+
+        def nav_subtitle(self):
+            profile = request_profile()
+            if profile is None:
+                return 'no queries'
+            return '{count} queries, {time_ms} ms'.format(**profile)
+
+        def title(self):
+            return 'SQL profile'
+
+        def url(self):
+            return ''
+
+        def content(self):
+            profile = request_profile()
+            if profile is None:
+                return '<p>No queries ran for this request.</p>'
+            flagged = {shape for shape, _ in profile['n_plus_one']}
+            rows = ''.join(
+                '<tr{}><td>{}</td><td>{}</td></tr>'.format(
+                    ' class="flagged"' if shape in flagged else '', count, escape(shape))
+                for shape, count in g.sql_profile['shapes'].most_common())
+            return '<table><thead><tr><th>Count</th><th>Statement</th></tr></thead><tbody>{}</tbody></table>'.format(rows)
@@ -0,0 +1,555 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter
+from sqlalchemy import select, update, tuple_, func, or_, values, column, Integer, DateTime
+from models import Artist, Venue, Show, ArtistActivity, VenueActivity, GenreCount
+
+#----------------------------------------------------------------------------#
+# Shared query shapes.
+#----------------------------------------------------------------------------#
+
+# Cursors are "<start_time>_<id>" so they survive a round trip through a URL.
+# start_time to the microsecond: a truncated cursor would repeat rows that
+# start within the same second on the next page
+CURSOR_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_show_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.strftime(CURSOR_TIME_FORMAT), show_id)
+
+
+def decode_show_cursor(cursor):
+    # returns None for a missing or malformed cursor so callers fall back to page one
+    if not cursor:
+        return None
+    try:
+        start_time, show_id = cursor.rsplit('_', 1)
+        show_id = int(show_id)
+    except ValueError:
+        return None
+    # links handed out before cursors carried microseconds still decode
+    for time_format in (CURSOR_TIME_FORMAT, '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return datetime.strptime(start_time, time_format), show_id
+        except ValueError:
+            pass
+    return None
+
+
+def not_deleted(model):
+    # an artist or venue that has not been soft-deleted; the predicate the
+    # partial indexes on both tables are built with, so listings use them
+    return model.deleted_at.is_(None)
+
+
+#  Show filters
+#  ----------------------------------------------------------------
+
+# A time range (start inclusive, end exclusive) and a place, for "this
+# weekend in Austin" or "March at this venue". Every field is optional.
+ShowFilter = namedtuple('ShowFilter', 'start end city state venue_id artist_id', defaults=(None,) * 6)
+
+SHOW_FILTER_ARGS = ('from', 'to', 'city', 'state', 'venue_id', 'artist_id')
+
+
+def _decode_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def _decode_int(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def decode_show_filter(args):
+    # from query arguments: ?from=2026-03-01&to=2026-03-31 (both days
+    # included), ?city=Austin&state=TX, ?venue_id= and ?artist_id=. As with
+    # cursors, malformed values are ignored rather than rejected.
+    end = _decode_day(args.get('to'))
+    return ShowFilter(
+        start=_decode_day(args.get('from')),
+        end=end + timedelta(days=1) if end else None,
+        city=args.get('city') or None,
+        state=args.get('state') or None,
+        venue_id=_decode_int(args.get('venue_id')),
+        artist_id=_decode_int(args.get('artist_id')),
+    )
+
+
+def show_filter_args(args):
+    # the filter arguments present in `args`, for links that keep the filter
+    return {name: args[name] for name in SHOW_FILTER_ARGS if args.get(name)}
+
+
+def filter_shows(query, show_filter):
+    # `query` must already join Venue when filtering by city or state. Time
+    # ranges are served by ix_shows_start_time, ranges at one venue or for
+    # one artist by the (owner, start_time) indexes, and a city by first
+    # finding its few venues and then range-scanning each venue's shows.
+    if show_filter is None:
+        return query
+    if show_filter.start is not None:
+        query = query.where(Show.start_time >= show_filter.start)
+    if show_filter.end is not None:
+        query = query.where(Show.start_time < show_filter.end)
+    if show_filter.city or show_filter.state:
+        # deleted venues have no shows left; saying so lets the partial
+        # venue indexes serve the lookup
+        query = query.where(not_deleted(Venue))
+    if show_filter.city:
+        query = query.where(func.lower(Venue.city) == show_filter.city.lower())
+    if show_filter.state:
+        query = query.where(Venue.state == show_filter.state.upper())
+    if show_filter.venue_id is not None:
+        query = query.where(Show.venue_id == show_filter.venue_id)
+    if show_filter.artist_id is not None:
+        query = query.where(Show.artist_id == show_filter.artist_id)
+    return query
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def show_listing_query(after=None, limit=None, show_filter=None):
+    # one joined SELECT carrying only the columns shows.html renders,
+    # ordered by the (start_time, id) keyset used for pagination
+    query = select(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(Venue, Show.venue_id == Venue.id) \
+     .join(Artist, Show.artist_id == Artist.id) \
+     .order_by(Show.start_time, Show.id)
+    query = filter_shows(query, show_filter)
+
+    if after is not None:
+        query = query.where(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def show_listing_page_query(after=None, limit=None, show_filter=None):
+    # the listing's slice plus when each row, or the artist or venue it
+    # shows, last changed, so the page's validators come from the rows it
+    # fetched rather than from a second query over the same slice
+    return show_listing_query(after, limit, show_filter) \
+        .add_columns(func.greatest(Show.updated_at, Artist.updated_at, Venue.updated_at, type_=Show.updated_at.type).label('updated_at'))
+
+
+def show_listing_validator_parts(rows):
+    # (last modified, ids): a page is unchanged while the same rows, and the
+    # artists and venues they show, are
+    return max((row.updated_at for row in rows), default=None), tuple(row.id for row in rows)
+
+
+def show_listing_data(rows, page_size):
+    # (data, next_cursor) from the page_size + 1 rows show_listing_query returned
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_show_cursor(rows[-1].start_time, rows[-1].id)
+
+    data = []
+    for row in rows:
+        data.append({
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.artist_image_link,
+            "start_time": row.start_time.strftime('%Y-%m-%d %H:%M:%S')
+        })
+    return data, next_cursor
+
+
+
+#  Booking conflicts
+#  ----------------------------------------------------------------
+
+def booking_conflicts_query(artist_id, venue_id, start, end):
+    # shows overlapping [start, end) at the venue or by the artist; written
+    # as the exclusion constraints' own tsrange && so their GiST indexes
+    # answer each side
+    overlaps = func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start, end))
+    return select(Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time) \
+        .where(overlaps, or_(Show.venue_id == venue_id, Show.artist_id == artist_id)) \
+        .order_by(Show.start_time)
+
+
+def tour_conflicts_query(artist_id, entries):
+    # booking_conflicts_query for many (venue_id, start, end) bookings in one
+    # round trip: each VALUES row is probed against the GiST indexes in turn.
+    # Rows are (entry, show...), where entry is the booking's index.
+    bookings = values(column('entry', Integer), column('venue_id', Integer),
+                      column('start_time', DateTime), column('end_time', DateTime),
+                      name='bookings').data([(entry,) + tuple(booking) for entry, booking in enumerate(entries)])
+    overlaps = func.tsrange(Show.start_time, Show.end_time).op('&&')(
+        func.tsrange(bookings.c.start_time, bookings.c.end_time))
+    return select(bookings.c.entry, Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time) \
+        .join(Show, overlaps & or_(Show.venue_id == bookings.c.venue_id, Show.artist_id == artist_id)) \
+        .order_by(bookings.c.entry, Show.start_time)
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+CALENDAR_BUCKETS = ('day', 'week')
+
+
+def calendar_counts_query(bucket, show_filter):
+    # shows per day or per (ISO, Monday-first) week within the filter's
+    # range, for calendar views; only buckets that have shows come back
+    bucket_start = func.date_trunc(bucket, Show.start_time, type_=Show.start_time.type).label('bucket')
+    query = select(bucket_start, func.count().label('shows')).select_from(Show)
+    if show_filter.city or show_filter.state:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    return filter_shows(query, show_filter).group_by(bucket_start).order_by(bucket_start)
+
+
+#  Artist and venue listings
+#  ----------------------------------------------------------------
+
+ARTIST_FIELDS = ('id', 'name', 'city', 'state', 'phone', 'genres', 'image_link', 'facebook_link',
+                 'website_link', 'seeking_venue', 'seeking_description')
+VENUE_FIELDS = ('id', 'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link', 'facebook_link',
+                'website_link', 'seeking_talent', 'seeking_description')
+
+
+def entity_listing_query(model, fields=('id', 'name'), after_id=None, limit=None):
+    # keyset on id; `fields` must be column names of `model` and always gets
+    # the id so callers can build the next cursor
+    columns = [getattr(model, field) for field in fields if field != 'id']
+    query = select(model.id, *columns).where(not_deleted(model)).order_by(model.id)
+    if after_id is not None:
+        query = query.where(model.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def recent_query(model, limit=10):
+    # newest first; rows without a created_at (seed data) sort last
+    return select(model.id, model.name) \
+        .where(not_deleted(model)) \
+        .order_by(model.created_at.desc().nulls_last(), model.id.desc()) \
+        .limit(limit)
+
+
+def activity_listing_query(model, summary, summary_key, active_only=False, by_activity=False, genre=None):
+    # listings that sort or filter by upcoming shows read the maintained
+    # summary table, so no aggregate runs at request time
+    upcoming = func.coalesce(summary.upcoming_shows_count, 0).label('num_upcoming_shows')
+    query = select(model.id, model.name, upcoming, summary.next_show_time) \
+        .outerjoin(summary, summary_key == model.id) \
+        .where(not_deleted(model))
+    if active_only:
+        query = query.where(summary.upcoming_shows_count > 0)
+    if genre:
+        query = query.where(model.genres.contains([genre]))
+    if by_activity:
+        return query.order_by(upcoming.desc(), summary.next_show_time.asc().nulls_last(), model.id)
+    return query.order_by(model.id)
+
+
+def artist_listing_query(active_only=False, by_activity=False, genre=None):
+    return activity_listing_query(Artist, ArtistActivity, ArtistActivity.artist_id, active_only, by_activity, genre)
+
+
+def genre_facets_query(kind):
+    # the genre links above a listing, read from the maintained counts
+    # rather than grouped over every artist or venue
+    return select(GenreCount.genre, GenreCount.total) \
+        .where(GenreCount.kind == kind, GenreCount.total > 0) \
+        .order_by(GenreCount.total.desc(), GenreCount.genre)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_directory_query(first_area, last_area, genre=None):
+    # areas are numbered with dense_rank so one statement can both paginate
+    # by area and carry every venue in those areas with its upcoming count,
+    # read from the venue_activity summary rather than counted here
+    area_rank = func.dense_rank().over(order_by=(Venue.state, Venue.city)).label('area_rank')
+    upcoming = func.coalesce(VenueActivity.upcoming_shows_count, 0).label('num_upcoming_shows')
+    ranked = select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        upcoming,
+        area_rank,
+    ).outerjoin(VenueActivity, VenueActivity.venue_id == Venue.id) \
+     .where(not_deleted(Venue))
+    if genre:
+        # filtered before ranking, so pages hold only areas with a match
+        ranked = ranked.where(Venue.genres.contains([genre]))
+    ranked = ranked.subquery()
+
+    return select(ranked) \
+        .where(ranked.c.area_rank.between(first_area, last_area)) \
+        .order_by(ranked.c.area_rank, ranked.c.name, ranked.c.id)
+
+
+def venue_directory_page(session, page=1, areas_per_page=20, genre=None):
+    first_area = (page - 1) * areas_per_page + 1
+    # one area past the page tells us whether there is a next page
+    rows = session.execute(venue_directory_query(first_area, first_area + areas_per_page, genre)).all()
+    return venue_directory_data(rows, first_area, areas_per_page)
+
+
+def venue_directory_data(rows, first_area, areas_per_page):
+    # groups venue_directory_query rows by area; returns (areas, has_next)
+    data = []
+    has_next = False
+    for rank, area_rows in groupby(rows, key=attrgetter('area_rank')):
+        if rank >= first_area + areas_per_page:
+            has_next = True
+            break
+        area_rows = list(area_rows)
+        data.append({
+            "city": area_rows[0].city,
+            "state": area_rows[0].state,
+            "venues": [{
+                "id": row.id,
+                "name": row.name,
+                "num_upcoming_shows": row.num_upcoming_shows
+            } for row in area_rows]
+        })
+    return data, has_next
+
+
+#  Detail pages
+#  ----------------------------------------------------------------
+
+def _partitioned_shows_query(columns, counterpart, onclause, owner_filter, now, past_limit=None):
+    # past and upcoming shows in one pass: rows are tagged with which side of
+    # `now` they fall on, numbered newest-first within the past partition so
+    # the history can be capped, and carry their partition size for the counts
+    is_past = (Show.start_time < now).label('is_past')
+    partition = Show.start_time < now
+    ranked = select(
+        *columns,
+        Show.start_time,
+        is_past,
+        func.row_number().over(partition_by=partition, order_by=(Show.start_time.desc(), Show.id.desc())).label('past_rank'),
+        func.count().over(partition_by=partition).label('partition_count'),
+    ).join(counterpart, onclause) \
+     .where(owner_filter) \
+     .subquery()
+
+    query = select(ranked).order_by(ranked.c.start_time)
+    if past_limit is not None:
+        query = query.where(or_(ranked.c.is_past.is_(False), ranked.c.past_rank <= past_limit))
+    return query
+
+
+def artist_shows_query(artist_id, now, past_limit=None):
+    return _partitioned_shows_query(
+        (Show.venue_id, Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link')),
+        Venue, Show.venue_id == Venue.id, Show.artist_id == artist_id, now, past_limit)
+
+
+def venue_shows_query(venue_id, now, past_limit=None):
+    return _partitioned_shows_query(
+        (Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link')),
+        Artist, Show.artist_id == Artist.id, Show.venue_id == venue_id, now, past_limit)
+
+
+ARTIST_SHOW_FIELDS = ('venue_id', 'venue_name', 'venue_image_link')
+VENUE_SHOW_FIELDS = ('artist_id', 'artist_name', 'artist_image_link')
+
+
+def split_shows(rows, fields):
+    # returns (past_shows, past_count, upcoming_shows, upcoming_count); past
+    # shows come back newest first, upcoming shows soonest first
+    past_shows, upcoming_shows = [], []
+    past_count = upcoming_count = 0
+    for row in rows:
+        show_data = {field: getattr(row, field) for field in fields}
+        show_data["start_time"] = row.start_time.strftime('%Y-%m-%d %H:%M:%S')
+        if row.is_past:
+            past_shows.append(show_data)
+            past_count = row.partition_count
+        else:
+            upcoming_shows.append(show_data)
+            upcoming_count = row.partition_count
+    past_shows.reverse()
+    return past_shows, past_count, upcoming_shows, upcoming_count
+
+
+def artist_shows(session, artist_id, past_limit=None, now=None):
+    now = now or datetime.now()
+    rows = session.execute(artist_shows_query(artist_id, now, past_limit)).all()
+    return split_shows(rows, ARTIST_SHOW_FIELDS)
+
+
+def venue_shows(session, venue_id, past_limit=None, now=None):
+    now = now or datetime.now()
+    rows = session.execute(venue_shows_query(venue_id, now, past_limit)).all()
+    return split_shows(rows, VENUE_SHOW_FIELDS)
+
+
+def artist_detail(session, artist_id, past_limit=None, now=None):
+    # everything show_artist.html renders; None when the artist doesn't exist
+    artist = session.get(Artist, artist_id)
+    if artist is None or artist.deleted_at is not None:
+        return None
+    return artist_payload(artist, artist_shows(session, artist_id, past_limit, now))
+
+
+def artist_payload(artist, shows):
+    # `shows` is the (past, past_count, upcoming, upcoming_count) split_shows returns
+    past_shows, past_shows_count, upcoming_shows, upcoming_shows_count = shows
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website_link": artist.website_link,
+        "image_link": artist.image_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "past_shows": past_shows,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": upcoming_shows_count
+    }
+
+
+def venue_detail(session, venue_id, past_limit=None, now=None):
+    # everything show_venue.html renders; None when the venue doesn't exist
+    venue = session.get(Venue, venue_id)
+    if venue is None or venue.deleted_at is not None:
+        return None
+    return venue_payload(venue, venue_shows(session, venue_id, past_limit, now))
+
+
+def venue_payload(venue, shows):
+    past_shows, past_shows_count, upcoming_shows, upcoming_shows_count = shows
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres,
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        "website_link": venue.website_link,
+        "image_link": venue.image_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "past_shows": past_shows,
+        "past_shows_count": past_shows_count,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": upcoming_shows_count
+    }
+
+
+def detail_validator_query(model, summary, summary_key, entity_id):
+    # what a detail page's validators are built from: the record's own
+    # updated_at and when its upcoming-show summary was last refreshed.
+    # One primary-key lookup; the shows table is never read.
+    return select(model.updated_at, summary.refreshed_at) \
+        .outerjoin(summary, summary_key == model.id) \
+        .where(model.id == entity_id, not_deleted(model))
+
+
+def artist_validator_query(artist_id):
+    return detail_validator_query(Artist, ArtistActivity, ArtistActivity.artist_id, artist_id)
+
+
+def venue_validator_query(venue_id):
+    return detail_validator_query(Venue, VenueActivity, VenueActivity.venue_id, venue_id)
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_query(model, summary, summary_key, term, limit, offset=0):
+    # full-text matches use the GIN tsvector index and partial matches the
+    # pg_trgm index on search_text; results are ranked by both, and the
+    # upcoming-show count and total hit count ride along in the same SELECT
+    ts_query = func.plainto_tsquery('simple', term)
+    rank = (func.ts_rank(model.search_vector, ts_query) + func.similarity(model.search_text, term)).label('rank')
+    return select(
+        model.id,
+        model.name,
+        func.coalesce(summary.upcoming_shows_count, 0).label('num_upcoming_shows'),
+        func.count().over().label('total'),
+        rank,
+    ).outerjoin(summary, summary_key == model.id) \
+     .where(or_(model.search_vector.op('@@')(ts_query),
+                model.search_text.ilike('%{}%'.format(_escape_like(term)), escape='\\')),
+            not_deleted(model)) \
+     .order_by(rank.desc(), model.name, model.id) \
+     .limit(limit) \
+     .offset(offset)
+
+
+def search_page(session, model, summary, summary_key, term, page=1, per_page=20):
+    rows = session.execute(search_query(model, summary, summary_key, term, per_page, (page - 1) * per_page)).all()
+    data = []
+    for row in rows:
+        data.append({
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows
+        })
+    return {
+        "count": rows[0].total if rows else 0,
+        "data": data,
+        "page": page,
+        "has_next": bool(rows) and rows[0].total > page * per_page
+    }
+
+
+def artist_search_page(session, term, page=1, per_page=20):
+    return search_page(session, Artist, ArtistActivity, ArtistActivity.artist_id, term, page, per_page)
+
+
+def venue_search_page(session, term, page=1, per_page=20):
+    return search_page(session, Venue, VenueActivity, VenueActivity.venue_id, term, page, per_page)
+
+
+#  Relations
+#  ----------------------------------------------------------------
+
+def artist_ids_for_venue(session, venue_id):
+    return session.scalars(select(Show.artist_id).where(Show.venue_id == venue_id).distinct()).all()
+
+
+def venue_ids_for_artist(session, artist_id):
+    return session.scalars(select(Show.venue_id).where(Show.artist_id == artist_id).distinct()).all()
+
+
+def existing_ids(session, model, ids):
+    # the subset of artist or venue `ids` that exist and are not deleted, in one IN query
+    if not ids:
+        return set()
+    return set(session.scalars(select(model.id).where(model.id.in_(ids), not_deleted(model))))
+
+
+def touch(session, model, ids, now=None):
+    # marks pages that render another record's data as changed, in one UPDATE
+    if ids:
+        session.execute(update(model).where(model.id.in_(ids)).values(updated_at=now or datetime.now()))
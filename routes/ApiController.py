@@ -0,0 +1,209 @@
+from models import Artist, Venue, SHOW_DURATION_MINUTES, db
+from flask import (
+   Response,
+   request,
+   jsonify,
+   abort,
+   Blueprint,
+   current_app,
+   stream_with_context
+)
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from cache import detail_cache
+from conflicts import is_double_booking
+from http_cache import conditional, validators, newest
+from tours import TourError, book_tour, parse_start, tour_conflict, tour_entries
+from queries import (
+   ARTIST_FIELDS,
+   VENUE_FIELDS,
+   entity_listing_query,
+   CALENDAR_BUCKETS,
+   calendar_counts_query,
+   show_listing_query,
+   decode_show_cursor,
+   decode_show_filter,
+   encode_show_cursor,
+   artist_detail,
+   artist_validator_query,
+   venue_detail,
+   venue_validator_query
+)
+import json
+
+api_blueprint = Blueprint('api', __name__)
+
+SHOW_FIELDS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _requested_fields(allowed):
+    # ?fields=id,name limits the payload; unknown names are a client error
+    fields = request.args.get('fields')
+    if not fields:
+        return allowed
+    fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        abort(400, 'Unknown fields: {}'.format(', '.join(unknown)))
+    return fields
+
+
+def _page_size():
+    limit = request.args.get('limit', current_app.config['API_PAGE_SIZE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
+
+def _stream_page(query, fields, limit, cursor_for):
+    # streams {"data": [...], "next_cursor": ...} straight off a server-side
+    # cursor: rows are fetched yield_per at a time and written out one by one,
+    # so memory stays flat however large the page is. The query asks for one
+    # row more than `limit` so the cursor is only set when another page exists.
+    result = db.session.execute(query.execution_options(yield_per=current_app.config['API_YIELD_PER']))
+
+    def generate():
+        yield '{"data": ['
+        last = None
+        next_cursor = None
+        for count, row in enumerate(result):
+            if count == limit:
+                next_cursor = cursor_for(last)
+                break
+            item = {field: _json_value(getattr(row, field)) for field in fields}
+            yield (',' if count else '') + json.dumps(item)
+            last = row
+        result.close()
+        yield '], "next_cursor": {}}}'.format(json.dumps(next_cursor))
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+#  API routes
+#  ----------------------------------------------------------------
+class ApiController():
+
+    @api_blueprint.route('/shows')
+    def shows():
+        fields = _requested_fields(SHOW_FIELDS)
+        limit = _page_size()
+        query = show_listing_query(decode_show_cursor(request.args.get('after')), limit + 1,
+                                   decode_show_filter(request.args))
+        return _stream_page(query, fields, limit, lambda row: encode_show_cursor(row.start_time, row.id))
+
+    @api_blueprint.route('/shows/calendar')
+    def shows_calendar():
+        # {"bucket": "day", "data": [{"start": ..., "shows": n}, ...]} over
+        # ?from= (default today) to ?to=, narrowed by the same filters as /shows
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in CALENDAR_BUCKETS:
+            abort(400, 'bucket must be one of: {}'.format(', '.join(CALENDAR_BUCKETS)))
+        show_filter = decode_show_filter(request.args)
+        start = show_filter.start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = show_filter.end or start + timedelta(days=current_app.config['CALENDAR_DEFAULT_DAYS'])
+        if end <= start:
+            abort(400, 'to must not be before from')
+        if end - start > timedelta(days=current_app.config['CALENDAR_MAX_DAYS']):
+            abort(400, 'Ranges are limited to {} days'.format(current_app.config['CALENDAR_MAX_DAYS']))
+        rows = db.session.execute(calendar_counts_query(bucket, show_filter._replace(start=start, end=end))).all()
+        return jsonify({
+            'bucket': bucket,
+            'from': start.date().isoformat(),
+            'to': (end - timedelta(days=1)).date().isoformat(),
+            'data': [{'start': row.bucket.date().isoformat(), 'shows': row.shows} for row in rows]
+        })
+
+    @api_blueprint.route('/shows/tour', methods=['POST'])
+    def create_tour():
+        # {"artist_id": 1, "duration_minutes": 120,
+        #  "shows": [{"venue_id": 2, "start_time": "2030-03-06T20:00"}, ...],
+        #  "rule": {"venue_id": 3, "start_time": ..., "rrule": "FREQ=WEEKLY;COUNT=4"}}
+        # books every date it can and answers one result per date, in order
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            abort(400, 'Expected a JSON object')
+        try:
+            artist_id = int(body['artist_id'])
+            duration = int(body.get('duration_minutes') or SHOW_DURATION_MINUTES)
+            if not 1 <= duration <= 24 * 60:
+                raise TourError('duration_minutes must be between 1 and 1440')
+            rule = body.get('rule') or {}
+            entries = tour_entries(
+                current_app.config['TOUR_MAX_SHOWS'],
+                [(int(show['venue_id']), parse_start(str(show['start_time']))) for show in body.get('shows') or ()],
+                int(rule['venue_id']) if rule.get('venue_id') is not None else None,
+                parse_start(str(rule['start_time'])) if rule.get('start_time') else None,
+                rule.get('rrule'))
+        except TourError as error:
+            abort(400, str(error))
+        except (KeyError, TypeError, ValueError):
+            abort(400, 'artist_id, and venue_id and start_time for each show, are required')
+        try:
+            results = book_tour(artist_id, entries, duration)
+        except IntegrityError as error:
+            if not is_double_booking(error):
+                raise
+            # a concurrent request booked one of the slots after the check
+            abort(409, '{}; nothing was listed.'.format(
+                tour_conflict(artist_id, entries, duration) or 'A date was just booked for an overlapping time'))
+        booked = sum(result['status'] == 'booked' for result in results)
+        return jsonify({
+            'booked': booked,
+            'rejected': len(results) - booked,
+            'data': [{key: _json_value(value) for key, value in result.items()} for result in results]
+        }), 201 if booked else 200
+
+    @api_blueprint.route('/artists')
+    def artists():
+        fields = _requested_fields(ARTIST_FIELDS)
+        limit = _page_size()
+        query = entity_listing_query(Artist, fields, request.args.get('after', type=int), limit + 1)
+        return _stream_page(query, fields, limit, lambda row: str(row.id))
+
+    @api_blueprint.route('/venues')
+    def venues():
+        fields = _requested_fields(VENUE_FIELDS)
+        limit = _page_size()
+        query = entity_listing_query(Venue, fields, request.args.get('after', type=int), limit + 1)
+        return _stream_page(query, fields, limit, lambda row: str(row.id))
+
+    @api_blueprint.route('/artists/<int:artist_id>')
+    def show_artist(artist_id):
+        validator = db.session.execute(artist_validator_query(artist_id)).first()
+        if validator is None:
+            abort(404)
+
+        def render():
+            data = detail_cache.get_or_set('artist', artist_id, lambda: artist_detail(
+                db.session, artist_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return jsonify(data)
+
+        return conditional(validators('api-artist', newest(*validator), artist_id), render)
+
+    @api_blueprint.route('/venues/<int:venue_id>')
+    def show_venue(venue_id):
+        validator = db.session.execute(venue_validator_query(venue_id)).first()
+        if validator is None:
+            abort(404)
+
+        def render():
+            data = detail_cache.get_or_set('venue', venue_id, lambda: venue_detail(
+                db.session, venue_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return jsonify(data)
+
+        return conditional(validators('api-venue', newest(*validator), venue_id), render)
+
+
+@api_blueprint.errorhandler(400)
+@api_blueprint.errorhandler(404)
+@api_blueprint.errorhandler(409)
+def api_error(error):
+    return jsonify({"error": error.description}), error.code
@@ -6,108 +6,82 @@ from flask import (
    flash,
    redirect,
    url_for,
-   Blueprint
+   Blueprint,
+   current_app,
+   abort
 )
 from datetime import datetime
-from forms import ArtistForm
+from cache import detail_cache, fragment_cache
+from deletion import soft_delete
+from genres import count_genres
+from http_cache import conditional, validators, newest, no_store
+from routes.IndexController import RECENT_ARTISTS
+from queries import artist_listing_query, genre_facets_query, artist_detail, artist_validator_query, artist_search_page, venue_ids_for_artist, touch
 import sys
 import json
 
 artist_blueprint = Blueprint('artists', __name__)
 
 
-
-
 #  Artist
 #  ----------------------------------------------------------------
 class ArtistController():
 
     @artist_blueprint.route('/')
     def artists():
-        query_data = Artist.query.all()
+        # ?active=1 keeps artists with upcoming shows, ?sort=activity puts the busiest first,
+        # ?genre=Jazz keeps artists listing that genre
+        active_only = request.args.get('active') == '1'
+        by_activity = request.args.get('sort') == 'activity'
+        genre = request.args.get('genre') or None
+        query_data = db.session.execute(artist_listing_query(active_only, by_activity, genre)).all()
         data = []
         for item in query_data:
             data.append({
               "id": item.id,
               "name": item.name,
+              "num_upcoming_shows": item.num_upcoming_shows,
             })
 
-        return render_template('pages/artists.html', artists=data)
+        return render_template('pages/artists.html', artists=data,
+                               active_only=active_only, by_activity=by_activity, genre=genre,
+                               genre_facets=db.session.execute(genre_facets_query('artist')).all())
 
     @artist_blueprint.route('/search', methods=['POST'])
     def search_artists():
         # implement search on artists with partial string search. Ensure it is case-insensitive.
         # search for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
         # search for "band" should return "The Wild Sax Band".
-        term = request.form.get('search_term')
-        term = "%{}%".format(term)
-        query_data = Artist.query.filter(Artist.name.ilike(term)|Artist.city.ilike(term)|Artist.state.ilike(term)).all()
-        data = []
-        for item in query_data:
-            data.append({
-              "id": item.id,
-              "name": item.name,
-              "num_upcoming_shows": 0
-            })
-        response={
-          "count": len(query_data),
-          "data": data
-        }
+        term = request.form.get('search_term', '')
+        page = max(request.form.get('page', 1, type=int), 1)
+        response = artist_search_page(db.session, term, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
         return render_template('pages/search_artists.html',
                                 results=response, search_term=request.form.get('search_term', ''))
 
     @artist_blueprint.route('/<int:artist_id>')
     def show_artist(artist_id):
-        artist = Artist.query.filter_by(id=artist_id).first()
-        past_shows_query = db.session.query(Show).join(Artist).filter(Show.artist_id==artist_id).filter(Show.start_time<datetime.now()).all()   
-        past_shows = []
-        for show in past_shows_query:
-            show_data = {
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link":show.artist.image_link,
-                "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            }
-            past_shows.append(show_data)
-            
-        upcoming_shows_query = db.session.query(Show).join(Artist).filter(Show.artist_id==artist_id).filter(Show.start_time>datetime.now()).all()   
-        upcoming_shows = []
-        for show in upcoming_shows_query:
-            show_data = {
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            } 
-            upcoming_shows.append(show_data)
-               
-
-        data = {
-            "id": artist.id,
-            "name": artist.name,
-            "genres": artist.genres,
-            "city": artist.city,
-            "state": artist.state,
-            "phone": artist.phone,
-            "website_link": artist.website_link,
-            "image_link": artist.image_link,
-            "facebook_link": artist.facebook_link,
-            "seeking_venue": artist.seeking_venue,
-            "seeking_description": artist.seeking_description,
-            "past_shows": past_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows": upcoming_shows,
-            "upcoming_shows_count": len(upcoming_shows)
-        }
-
-        return render_template('pages/show_artist.html', artist=data)
+        # answered from the artist row alone when the client's copy is current
+        validator = db.session.execute(artist_validator_query(artist_id)).first()
+        if validator is None:
+            abort(404)
+
+        def render():
+            data = detail_cache.get_or_set('artist', artist_id, lambda: artist_detail(
+                db.session, artist_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return render_template('pages/show_artist.html', artist=data)
+
+        return conditional(validators('artist', newest(*validator), artist_id), render)
 
 
     #  Create Artist
     #  ----------------------------------------------------------------
 
     @artist_blueprint.route('/create', methods=['GET'])
+    @no_store
     def create_artist_form():
+        from forms import ArtistForm
         form = ArtistForm()
         return render_template('forms/new_artist.html', form=form)
 
@@ -134,7 +108,9 @@ class ArtistController():
                         website_link=website_link, seeking_venue=seeking_venue, seeking_description=seeking_description,
                         created_at=created_at)
             db.session.add(artist)
+            count_genres('artist', added=[genres])
             db.session.commit()
+            fragment_cache.invalidate(RECENT_ARTISTS)
         except:
             error = True
             db.session.rollback()
@@ -154,9 +130,13 @@ class ArtistController():
     #  Update Artist
     #  ----------------------------------------------------------------
     @artist_blueprint.route('/<int:artist_id>/edit', methods=['GET'])
+    @no_store
     def edit_artist(artist_id):
+        from forms import ArtistForm
         form = ArtistForm()
-        artist = Artist.query.filter_by(id=artist_id).first()
+        artist = Artist.query.filter_by(id=artist_id, deleted_at=None).first()
+        if artist is None:
+            abort(404)
 
         form.seeking_venue.default = artist.seeking_venue
         form.process()
@@ -177,13 +157,17 @@ class ArtistController():
     def edit_artist_submission(artist_id):
         # take values from the form submitted, and update existing
         # artist record with ID <artist_id> using the new attributes
-        artist = Artist.query.get(artist_id)
+        artist = Artist.query.filter_by(id=artist_id, deleted_at=None).first()
+        if artist is None:
+            abort(404)
         error = False
         try:
+            old_genres = artist.genres
             artist.name = request.form.get('name')
             artist.city = request.form.get('city')
             artist.state = request.form.get('state')
             artist.genres = request.form.getlist('genres')
+            count_genres('artist', added=[artist.genres], removed=[old_genres])
             artist.phone = request.form.get('phone')
             artist.image_link = request.form.get('image_link')
             artist.facebook_link = request.form.get('facebook_link')
@@ -191,7 +175,14 @@ class ArtistController():
             artist.seeking_venue = json.loads(request.form.get('seeking_venue').lower())
             artist.seeking_description = request.form.get('seeking_description')
 
+            venue_ids = venue_ids_for_artist(db.session, artist_id)
+            # venue pages list this artist's name and image too
+            touch(db.session, Venue, venue_ids)
             db.session.commit()
+            detail_cache.invalidate('artist', artist_id)
+            detail_cache.invalidate('venue', *venue_ids)
+            # the home page lists names too
+            fragment_cache.invalidate(RECENT_ARTISTS)
         except:
             error = True
             db.session.rollback()
@@ -205,5 +196,36 @@ class ArtistController():
             flash('Artist ' + request.form['name'] + ' was successfully updated!')
         return redirect(url_for('artists.show_artist', artist_id=artist_id))
 
+    #  Delete Artist
+    #  ----------------------------------------------------------------
+
+    @artist_blueprint.route('/<int:artist_id>', methods=['DELETE'])
+    def delete_artist(artist_id):
+        error = False
+        venue_ids = None
+        try:
+            # the artist is marked deleted and their shows removed in two
+            # statements, however many shows they had
+            venue_ids = soft_delete('artist', artist_id)
+            if venue_ids is not None:
+                db.session.commit()
+                detail_cache.invalidate('artist', artist_id)
+                detail_cache.invalidate('venue', *venue_ids)
+                fragment_cache.invalidate(RECENT_ARTISTS)
+        except:
+            error = True
+            db.session.rollback()
+            print(sys.exc_info())
+        finally:
+            db.session.close()
+
+        if venue_ids is None and not error:
+            abort(404)
+        if error:
+            flash('An error occurred. Artist could not be deleted.')
+        if not error:
+            flash('Artist was successfully deleted.')
+
+        return redirect(url_for('home.index'))
 
    
\ No newline at end of file
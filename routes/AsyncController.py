@@ -0,0 +1,170 @@
+from models import Artist, Venue
+from quart import (
+   render_template,
+   make_response,
+   request,
+   Blueprint,
+   current_app,
+   abort
+)
+from datetime import datetime
+from async_db import async_db
+from markupsafe import Markup
+from cache import detail_cache, fragment_cache
+from http_cache import is_fresh, set_validators, validators, newest
+from routes.IndexController import RECENT_ARTISTS, RECENT_VENUES
+from queries import (
+   ARTIST_SHOW_FIELDS,
+   VENUE_SHOW_FIELDS,
+   artist_listing_query,
+   artist_payload,
+   artist_shows_query,
+   artist_validator_query,
+   decode_show_cursor,
+   decode_show_filter,
+   genre_facets_query,
+   recent_query,
+   show_filter_args,
+   show_listing_data,
+   show_listing_page_query,
+   show_listing_validator_parts,
+   split_shows,
+   venue_directory_data,
+   venue_directory_query,
+   venue_payload,
+   venue_shows_query,
+   venue_validator_query
+)
+import asyncio
+
+# Same blueprint names and URLs as the sync controllers, so url_for() in the
+# shared templates resolves the same way under either entry point.
+async_index_blueprint = Blueprint('home', __name__)
+async_venue_blueprint = Blueprint('venues', __name__)
+async_artist_blueprint = Blueprint('artists', __name__)
+async_show_blueprint = Blueprint('shows', __name__)
+
+
+async def artist_detail(artist_id, past_limit=None):
+    # the artist row and its shows come back on two connections at once
+    artist, rows = await asyncio.gather(
+        async_db.get(Artist, artist_id),
+        async_db.all(artist_shows_query(artist_id, datetime.now(), past_limit)))
+    if artist is None or artist.deleted_at is not None:
+        return None
+    return artist_payload(artist, split_shows(rows, ARTIST_SHOW_FIELDS))
+
+
+async def venue_detail(venue_id, past_limit=None):
+    venue, rows = await asyncio.gather(
+        async_db.get(Venue, venue_id),
+        async_db.all(venue_shows_query(venue_id, datetime.now(), past_limit)))
+    if venue is None or venue.deleted_at is not None:
+        return None
+    return venue_payload(venue, split_shows(rows, VENUE_SHOW_FIELDS))
+
+
+async def conditional(page_validators, render):
+    # http_cache.conditional for Quart: `render` is a coroutine function
+    if page_validators is None:
+        return await render()
+    if is_fresh(request, *page_validators):
+        response = current_app.response_class('', status=304)
+    else:
+        response = await make_response(await render())
+    return set_validators(response, *page_validators)
+
+
+#  Async read routes
+#  ----------------------------------------------------------------
+class AsyncController():
+
+    @async_index_blueprint.route('/')
+    async def index():
+        async def render_venues():
+            return await render_template('fragments/recent_venues.html',
+                                         most_recent_venues=await async_db.all(recent_query(Venue)))
+
+        async def render_artists():
+            return await render_template('fragments/recent_artists.html',
+                                         most_recent_artists=await async_db.all(recent_query(Artist)))
+
+        recent_venues, recent_artists = await asyncio.gather(
+            fragment_cache.get_or_render_async(RECENT_VENUES, render_venues),
+            fragment_cache.get_or_render_async(RECENT_ARTISTS, render_artists))
+        return await render_template('pages/home.html', recent_venues=Markup(recent_venues),
+                                     recent_artists=Markup(recent_artists))
+
+    @async_venue_blueprint.route('/')
+    async def venues():
+        page = max(request.args.get('page', 1, type=int), 1)
+        genre = request.args.get('genre') or None
+        areas_per_page = current_app.config['AREAS_PER_PAGE']
+        first_area = (page - 1) * areas_per_page + 1
+        rows, genre_facets = await asyncio.gather(
+            async_db.all(venue_directory_query(first_area, first_area + areas_per_page, genre)),
+            async_db.all(genre_facets_query('venue')))
+        data, has_next = venue_directory_data(rows, first_area, areas_per_page)
+        return await render_template('pages/venues.html', areas=data, page=page, has_next=has_next, genre=genre,
+                                     genre_facets=genre_facets)
+
+    @async_venue_blueprint.route('/<int:venue_id>')
+    async def show_venue(venue_id):
+        validator = await async_db.all(venue_validator_query(venue_id))
+        if not validator:
+            abort(404)
+
+        async def render():
+            data = await detail_cache.get_or_set_async('venue', venue_id, lambda: venue_detail(
+                venue_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return await render_template('pages/show_venue.html', venue=data)
+
+        return await conditional(validators('venue', newest(*validator[0]), venue_id), render)
+
+    @async_artist_blueprint.route('/')
+    async def artists():
+        active_only = request.args.get('active') == '1'
+        by_activity = request.args.get('sort') == 'activity'
+        genre = request.args.get('genre') or None
+        rows, genre_facets = await asyncio.gather(
+            async_db.all(artist_listing_query(active_only, by_activity, genre)),
+            async_db.all(genre_facets_query('artist')))
+        data = [{"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows}
+                for row in rows]
+        return await render_template('pages/artists.html', artists=data,
+                                     active_only=active_only, by_activity=by_activity, genre=genre,
+                                     genre_facets=genre_facets)
+
+    @async_artist_blueprint.route('/<int:artist_id>')
+    async def show_artist(artist_id):
+        validator = await async_db.all(artist_validator_query(artist_id))
+        if not validator:
+            abort(404)
+
+        async def render():
+            data = await detail_cache.get_or_set_async('artist', artist_id, lambda: artist_detail(
+                artist_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return await render_template('pages/show_artist.html', artist=data)
+
+        return await conditional(validators('artist', newest(*validator[0]), artist_id), render)
+
+    @async_show_blueprint.route('/')
+    async def shows():
+        page_size = min(request.args.get('per_page', current_app.config['SHOWS_PAGE_SIZE'], type=int),
+                        current_app.config['MAX_PAGE_SIZE'])
+        page_size = max(page_size, 1)
+        after = decode_show_cursor(request.args.get('after'))
+        show_filter = decode_show_filter(request.args)
+        rows = await async_db.all(show_listing_page_query(after, page_size + 1, show_filter))
+        updated_at, ids = show_listing_validator_parts(rows)
+
+        async def render():
+            data, next_cursor = show_listing_data(rows, page_size)
+            return await render_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+                                         filter_args=show_filter_args(request.args))
+
+        return await conditional(validators('shows', updated_at, ids, show_filter), render)
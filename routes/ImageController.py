@@ -0,0 +1,43 @@
+from models import Artist, Venue, db
+from flask import Blueprint, request, redirect, send_file, current_app, abort
+from sqlalchemy import select
+from thumbnails import thumbnail_store, link_version
+from queries import not_deleted
+import os
+
+image_blueprint = Blueprint('images', __name__)
+
+IMAGE_MODELS = {
+    'artist': Artist,
+    'venue': Venue,
+}
+
+#  Thumbnails
+#  ----------------------------------------------------------------
+class ImageController():
+
+    @image_blueprint.route('/<kind>/<int:id>/<size>')
+    def thumbnail(kind, id, size):
+        model = IMAGE_MODELS.get(kind)
+        if model is None or size not in current_app.config['THUMBNAIL_SIZES']:
+            abort(404)
+        image_link = db.session.scalar(select(model.image_link).where(model.id == id, not_deleted(model)))
+        if not image_link:
+            abort(404)
+
+        thumbnail = thumbnail_store.get(image_link, size)
+        if thumbnail is None:
+            # the source could not be fetched or read; let the browser try it
+            response = redirect(image_link)
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['THUMBNAIL_UNVERSIONED_MAX_AGE']
+            return response
+
+        # a new image_link means a new ?v=, so a versioned URL never changes
+        versioned = request.args.get('v') == link_version(image_link)
+        max_age = current_app.config['THUMBNAIL_MAX_AGE' if versioned else 'THUMBNAIL_UNVERSIONED_MAX_AGE']
+        # the file name is the source's hash and the size, so it is the ETag
+        response = send_file(thumbnail, mimetype='image/jpeg', etag=os.path.basename(thumbnail.name),
+                             conditional=True, max_age=max_age)
+        response.cache_control.immutable = versioned
+        return response
@@ -1,14 +1,21 @@
-from models import Artist, Venue
-from sqlalchemy import asc
+from models import Artist, Venue, db
 from flask import render_template, Blueprint
+from markupsafe import Markup
+from cache import fragment_cache
+from queries import recent_query
 
 index_blueprint = Blueprint('home', __name__)
 
+# Fragment keys, invalidated by create_artist_submission/create_venue_submission
+RECENT_ARTISTS = 'home:recent_artists'
+RECENT_VENUES = 'home:recent_venues'
+
 class IndexController():
     @index_blueprint.route('/')
     def index():
-        most_recent_artists = Artist.query.order_by(asc(Artist.created_at)).limit(10).all()
-        most_recent_venues = Venue.query.order_by(asc(Venue.created_at)).limit(10).all()
-        return render_template('pages/home.html', most_recent_artists=most_recent_artists,
-                                 most_recent_venues=most_recent_venues)
-
+        recent_venues = fragment_cache.get_or_render(RECENT_VENUES, lambda: render_template(
+            'fragments/recent_venues.html', most_recent_venues=db.session.execute(recent_query(Venue)).all()))
+        recent_artists = fragment_cache.get_or_render(RECENT_ARTISTS, lambda: render_template(
+            'fragments/recent_artists.html', most_recent_artists=db.session.execute(recent_query(Artist)).all()))
+        return render_template('pages/home.html', recent_venues=Markup(recent_venues),
+                               recent_artists=Markup(recent_artists))
@@ -0,0 +1,12 @@
+from flask import Response, Blueprint
+from metrics import registry
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+#  Metrics
+#  ----------------------------------------------------------------
+class MetricsController():
+
+    @metrics_blueprint.route('/metrics')
+    def metrics():
+        return Response(registry.expose(), mimetype='text/plain; version=0.0.4')
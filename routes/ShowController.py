@@ -1,14 +1,29 @@
-from models import Artist, Venue, Show, db
+from models import Artist, Venue, Show, SHOW_DURATION_MINUTES, db
 from sqlalchemy import asc
 from flask import (
    render_template,
    request,
    flash,
    url_for,
-   Blueprint
+   Blueprint,
+   current_app
+)
+from datetime import datetime, timedelta
+from jobs import enqueue
+from tours import TourError, book_tour, parse_entries, tour_conflict, tour_entries
+from conflicts import booking_conflicts, describe_conflict, is_double_booking
+from cache import detail_cache
+from http_cache import conditional, validators, no_store
+from queries import (
+   existing_ids,
+   show_listing_data,
+   show_listing_page_query,
+   show_listing_validator_parts,
+   decode_show_cursor,
+   decode_show_filter,
+   show_filter_args,
+   touch
 )
-from datetime import datetime
-from forms import ShowForm
 import sys
 import json
 
@@ -19,22 +34,29 @@ show_blueprint = Blueprint('shows', __name__)
 class ShowController():
     @show_blueprint.route('/')
     def shows():
-        # displays list of shows at /shows
-        query_data = Show.query.all()
-        data = []
-        for item in query_data:
-            data.append({
-              "venue_id": item.venue_id,
-              "venue_name": item.venue.name,
-              "artist_id": item.artist_id,
-              "artist_name": item.artist.name,
-              "artist_image_link": item.artist.image_link,
-              "start_time": item.start_time.strftime('%Y-%m-%d %H:%M:%S')
-            })
-        return render_template('pages/shows.html', shows=data)
+        # displays list of shows at /shows, one keyset page at a time,
+        # optionally narrowed to a date range and a city, state or venue
+        page_size = min(request.args.get('per_page', current_app.config['SHOWS_PAGE_SIZE'], type=int),
+                        current_app.config['MAX_PAGE_SIZE'])
+        page_size = max(page_size, 1)
+        after = decode_show_cursor(request.args.get('after'))
+        show_filter = decode_show_filter(request.args)
+        # one extra row tells whether a next page exists without a COUNT; the
+        # validators come from the same rows, so an unchanged page is not rendered
+        rows = db.session.execute(show_listing_page_query(after, page_size + 1, show_filter)).all()
+        updated_at, ids = show_listing_validator_parts(rows)
+
+        def render():
+            data, next_cursor = show_listing_data(rows, page_size)
+            return render_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+                                   filter_args=show_filter_args(request.args))
+
+        return conditional(validators('shows', updated_at, ids, show_filter), render)
 
     @show_blueprint.route('/create')
+    @no_store
     def create_shows():
+        from forms import ShowForm
         form = ShowForm()
         return render_template('forms/new_show.html', form=form)
 
@@ -43,26 +65,104 @@ class ShowController():
         error = False
         # called to create new shows in the db, upon submitting new show listing form
         # insert form data as a new Show record in the db, instead
+        conflict = None
         try:
+            import dateutil.parser
+            from forms import ShowForm
             artist_id = request.form['artist_id']
             venue_id = request.form['venue_id']
-            start_time = request.form['start_time']
-            show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
-            db.session.add(show)
-            db.session.commit()
-        except:
+            start_time = dateutil.parser.parse(request.form['start_time'])
+            # the form's range check, so the CHECK constraint never has to refuse
+            # the value; start_time is parsed more leniently above
+            form = ShowForm(meta={'csrf': False})
+            duration_valid = form.duration_minutes.validate(form)
+            duration = form.duration_minutes.data or SHOW_DURATION_MINUTES
+            # the foreign keys accept deleted artists and venues, so ask
+            missing = not existing_ids(db.session, Artist, {int(artist_id)}) \
+                or not existing_ids(db.session, Venue, {int(venue_id)})
+            # the exclusion constraints have the final word; asking first
+            # lets the message name the show already booked
+            conflicts = [] if missing or not duration_valid else booking_conflicts(
+                artist_id, venue_id, start_time, start_time + timedelta(minutes=duration))
+            if not duration_valid:
+                conflict = 'Duration (minutes): {}'.format(' '.join(form.duration_minutes.errors))
+            elif missing:
+                conflict = 'Artist {} or venue {} does not exist.'.format(artist_id, venue_id)
+            elif conflicts:
+                conflict = describe_conflict(conflicts[0], artist_id, venue_id)
+            else:
+                show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time,
+                            duration_minutes=duration)
+                db.session.add(show)
+                db.session.flush()
+                # both pages list the new show now; their counters catch up off the request path
+                touch(db.session, Artist, [int(artist_id)])
+                touch(db.session, Venue, [int(venue_id)])
+                enqueue('refresh_activity', {'artist_ids': [int(artist_id)], 'venue_ids': [int(venue_id)]},
+                        key='show-created:{}'.format(show.id))
+                db.session.commit()
+                detail_cache.invalidate('artist', artist_id)
+                detail_cache.invalidate('venue', venue_id)
+        except Exception as exc:
             error = True
             db.session.rollback()
+            if is_double_booking(exc):
+                # booked by a concurrent request between the check and the insert
+                conflict = 'That venue or artist was just booked for an overlapping time.'
             print(sys.exc_info())
         finally:
             db.session.close()
 
-        if error:
+        if conflict:
+            flash('Show could not be listed: ' + conflict)
+        elif error:
             # on unsuccessful db insert, flash an error.
             flash('An error occurred. Show could not be listed!')
-        if not error:
+        else:
             # on successful db insert, flash success
             flash('Show was successfully listed!')
         # e.g., flash('An error occurred. Show could not be listed.')
         # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
-        return render_template('pages/home.html')
\ No newline at end of file
+        return render_template('pages/home.html')
+    @show_blueprint.route('/tour')
+    @no_store
+    def create_tour():
+        from forms import TourForm
+        form = TourForm()
+        return render_template('forms/new_tour.html', form=form)
+
+    @show_blueprint.route('/tour', methods=['POST'])
+    def create_tour_submission():
+        # books many dates for one artist in one transaction; each date is
+        # reported as booked or rejected on the results page
+        from forms import TourForm
+        # the page carries no CSRF token, like the other forms here
+        form = TourForm(meta={'csrf': False})
+        if not form.validate():
+            flash('Tour could not be listed: ' + '; '.join(
+                '{}: {}'.format(name, ' '.join(errors)) for name, errors in form.errors.items()))
+            return render_template('forms/new_tour.html', form=form)
+        artist_id = form.artist_id.data
+        duration = form.duration_minutes.data or SHOW_DURATION_MINUTES
+        try:
+            entries = tour_entries(current_app.config['TOUR_MAX_SHOWS'], parse_entries(form.dates.data or ''),
+                                   form.venue_id.data, form.start_time.data, (form.rule.data or '').strip())
+        except TourError as exc:
+            flash('Tour could not be listed: ' + str(exc))
+            return render_template('forms/new_tour.html', form=form)
+        try:
+            results = book_tour(artist_id, entries, duration)
+        except Exception as exc:
+            db.session.rollback()
+            if is_double_booking(exc):
+                # booked by a concurrent request between the check and the insert
+                flash('Tour could not be listed: {}; nothing was listed.'.format(
+                    tour_conflict(artist_id, entries, duration) or 'A date was just booked for an overlapping time'))
+            else:
+                print(sys.exc_info())
+                flash('An error occurred. Tour could not be listed!')
+            return render_template('forms/new_tour.html', form=form)
+        finally:
+            db.session.close()
+        return render_template('pages/tour_results.html', artist_id=artist_id, results=results,
+                               booked=sum(result['status'] == 'booked' for result in results))
@@ -6,111 +6,68 @@ from flask import (
    flash,
    redirect,
    url_for,
-   Blueprint
+   Blueprint,
+   current_app,
+   abort
 )
 from datetime import datetime
-from forms import VenueForm
+from deletion import soft_delete
+from cache import detail_cache, fragment_cache
+from genres import count_genres
+from http_cache import conditional, validators, newest, no_store
+from routes.IndexController import RECENT_VENUES
+from queries import venue_directory_page, genre_facets_query, venue_detail, venue_validator_query, venue_search_page, artist_ids_for_venue, touch
 import sys
 import json
 
 venue_blueprint = Blueprint('venues', __name__)
 
+
 #  Venue routes
 #  ----------------------------------------------------------------
 class VenueController():
 
     @venue_blueprint.route('/')
     def venues():
-        all_cities = Venue.query.with_entities(Venue.city, Venue.state).distinct().all()
-        data = []
-        for item in all_cities:
-            venues_list = []
-            venues_query = Venue.query.filter_by(city=item.city).filter_by(state=item.state).all()
-            for venue in venues_query:
-                venues_list.append({
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": len([])
-                })
-            data.append({
-                "city": item.city,
-                "state": item.state,
-                "venues": venues_list
-            })
-
-        return render_template('pages/venues.html', areas=data)
+        # one grouped query per page, however many cities there are;
+        # ?genre=Jazz keeps venues listing that genre
+        page = max(request.args.get('page', 1, type=int), 1)
+        genre = request.args.get('genre') or None
+        data, has_next = venue_directory_page(db.session, page, current_app.config['AREAS_PER_PAGE'], genre)
+        return render_template('pages/venues.html', areas=data, page=page, has_next=has_next, genre=genre,
+                               genre_facets=db.session.execute(genre_facets_query('venue')).all())
 
     @venue_blueprint.route('/search', methods=['POST'])
     def search_venues():
-        term = request.form.get('search_term')
-        term = "%{}%".format(term)
-        query_data = Venue.query.filter(Venue.name.ilike(term) | Venue.city.ilike(term) | Venue.state.ilike(term)).all()
-        data = []
-        for item in query_data:
-            data.append({
-                "id": item.id,
-                "name": item.name,
-                "num_upcoming_shows": 0
-            })
-        response={
-            "count": len(query_data),
-            "data": data
-        }
-        print(response)
+        term = request.form.get('search_term', '')
+        page = max(request.form.get('page', 1, type=int), 1)
+        response = venue_search_page(db.session, term, page, current_app.config['SEARCH_RESULTS_PER_PAGE'])
         return render_template('pages/search_venues.html',
                                results=response, search_term=request.form.get('search_term', ''))
 
     @venue_blueprint.route('/<int:venue_id>')
     def show_venue(venue_id):
-        venue = Venue.query.filter_by(id=venue_id).first()
-        past_shows_query = db.session.query(Show).join(Venue).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.now()).all()   
-        past_shows = []
-        for show in past_shows_query:
-            show_data = {
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link":show.artist.image_link,
-                "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            }
-            past_shows.append(show_data)
-            
-        upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.venue_id==venue_id).filter(Show.start_time>datetime.now()).all()   
-        upcoming_shows = []
-        for show in upcoming_shows_query:
-            show_data = {
-                "artist_id": show.artist_id,
-                "artist_name": show.artist.name,
-                "artist_image_link": show.artist.image_link,
-                "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-            } 
-            upcoming_shows.append(show_data)
-
-        data = {
-            "id": venue.id,
-            "name": venue.name,
-            "genres": venue.genres,
-            "city": venue.city,
-            "state": venue.state,
-            "address": venue.address,
-            "phone": venue.phone,
-            "website_link": venue.website_link,
-            "image_link": venue.image_link,
-            "facebook_link": venue.facebook_link,
-            "seeking_talent": venue.seeking_talent,
-            "seeking_description": venue.seeking_description,
-            "past_shows": past_shows,
-            "past_shows_count": len(past_shows),
-            "upcoming_shows": upcoming_shows,
-            "upcoming_shows_count": len(upcoming_shows)
-        }
-
-        return render_template('pages/show_venue.html', venue=data)
+        # answered from the venue row alone when the client's copy is current
+        validator = db.session.execute(venue_validator_query(venue_id)).first()
+        if validator is None:
+            abort(404)
+
+        def render():
+            data = detail_cache.get_or_set('venue', venue_id, lambda: venue_detail(
+                db.session, venue_id, current_app.config['PAST_SHOWS_LIMIT']))
+            if data is None:
+                abort(404)
+            return render_template('pages/show_venue.html', venue=data)
+
+        return conditional(validators('venue', newest(*validator), venue_id), render)
 
     #  Create Venue
     #  ----------------------------------------------------------------
 
     @venue_blueprint.route('/create', methods=['GET'])
+    @no_store
     def create_venue_form():
+        from forms import VenueForm
         form = VenueForm()
         return render_template('forms/new_venue.html', form=form)
 
@@ -136,7 +93,9 @@ class VenueController():
                         created_at=created_at)
 
             db.session.add(venue)
+            count_genres('venue', added=[genres])
             db.session.commit()
+            fragment_cache.invalidate(RECENT_VENUES)
         except:
             error = True
             db.session.rollback()
@@ -156,9 +115,13 @@ class VenueController():
     #  Edit Venue
     #  ----------------------------------------------------------------
     @venue_blueprint.route('/<int:venue_id>/edit', methods=['GET'])
+    @no_store
     def edit_venue(venue_id):
+        from forms import VenueForm
         form = VenueForm()
-        venue = Venue.query.filter_by(id=venue_id).first()
+        venue = Venue.query.filter_by(id=venue_id, deleted_at=None).first()
+        if venue is None:
+            abort(404)
 
         form.seeking_talent.default = venue.seeking_talent
         form.process()
@@ -180,14 +143,18 @@ class VenueController():
     def edit_venue_submission(venue_id):
         # take values from the form submitted, and update existing
         # venue record with ID <venue_id> using the new attributes
-        venue = Venue.query.get(venue_id)
+        venue = Venue.query.filter_by(id=venue_id, deleted_at=None).first()
+        if venue is None:
+            abort(404)
         error = False
         try:
+            old_genres = venue.genres
             venue.name = request.form.get('name')
             venue.city = request.form.get('city')
             venue.state = request.form.get('state')
             venue.address = request.form.get('address')
             venue.genres = request.form.getlist('genres')
+            count_genres('venue', added=[venue.genres], removed=[old_genres])
             venue.phone = request.form.get('phone')
             venue.image_link = request.form.get('image_link')
             venue.facebook_link = request.form.get('facebook_link')
@@ -195,7 +162,14 @@ class VenueController():
             venue.seeking_talent = json.loads(request.form.get('seeking_talent').lower())
             venue.seeking_description = request.form.get('seeking_description')
 
+            artist_ids = artist_ids_for_venue(db.session, venue_id)
+            # artist pages list this venue's name and image too
+            touch(db.session, Artist, artist_ids)
             db.session.commit()
+            detail_cache.invalidate('venue', venue_id)
+            detail_cache.invalidate('artist', *artist_ids)
+            # the home page lists names too
+            fragment_cache.invalidate(RECENT_VENUES)
         except:
             error = True
             db.session.rollback()
@@ -213,14 +187,19 @@ class VenueController():
     #  Delete Venue
     #  ----------------------------------------------------------------
 
-    @venue_blueprint.route('/<venue_id>', methods=['DELETE'])
+    @venue_blueprint.route('/<int:venue_id>', methods=['DELETE'])
     def delete_venue(venue_id):
-        error=False
+        error = False
+        artist_ids = None
         try:
-            venue = Venue.query.get(venue_id)
-            # TODO: delete related shows before deleting the venue
-            db.session.delete(venue)
-            db.session.commit()
+            # the venue is marked deleted and its shows removed in two
+            # statements, however many shows it had
+            artist_ids = soft_delete('venue', venue_id)
+            if artist_ids is not None:
+                db.session.commit()
+                detail_cache.invalidate('venue', venue_id)
+                detail_cache.invalidate('artist', *artist_ids)
+                fragment_cache.invalidate(RECENT_VENUES)
         except:
             error = True
             db.session.rollback()
@@ -228,6 +207,8 @@ class VenueController():
         finally:
             db.session.close()
 
+        if artist_ids is None and not error:
+            abort(404)
         if error:
             flash(f'An error occurred.')
         if not error:
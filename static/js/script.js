@@ -3,14 +3,16 @@ window.parseISOString = function parseISOString(s) {
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
 
-const deleteVenue = (e, route) => {
+const deleteRecord = (e, route) => {
 
   let id = e.target.classList.contains('delete-btn') ? e.target.dataset['id'] : e.target.parentNode.dataset['id']
   fetch(`/${route}/${id}`, {
-    method: 'POST',
+    method: 'DELETE',
+    // the flashed message is left for the reloaded page to show
+    redirect: 'manual',
   })
   .then(() => {
-    console.log("success");
+    window.location.reload();
   })
   .catch(() => {
     console.log("fail");
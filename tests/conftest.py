@@ -0,0 +1,153 @@
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+import config
+import profiler
+from models import Artist, Venue, Show, db
+
+#----------------------------------------------------------------------------#
+# Test database.
+#----------------------------------------------------------------------------#
+
+# Tests run against Postgres: the schema leans on arrays, generated tsvector
+# columns, exclusion constraints and partial indexes. TEST_DATABASE_URL picks
+# the database; by default it is `fyyur_test` on the server config.py points
+# at, created when missing. Tests that need it are skipped when no server
+# answers.
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL') or \
+    make_url(config.SQLALCHEMY_DATABASE_URI).set(database='fyyur_test').render_as_string(hide_password=False)
+
+EXTENSIONS = ('btree_gist', 'pg_trgm')
+
+
+def _create_database(url):
+    url = make_url(url)
+    engine = create_engine(url.set(database='postgres'), isolation_level='AUTOCOMMIT')
+    try:
+        with engine.connect() as connection:
+            exists = connection.scalar(text('SELECT 1 FROM pg_database WHERE datname = :name'),
+                                       {'name': url.database})
+            if not exists:
+                connection.execute(text('CREATE DATABASE "{}"'.format(url.database)))
+    finally:
+        engine.dispose()
+
+
+def _test_config(database_url, thumbnail_dir):
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings.update(
+        TESTING=True,
+        DEBUG=False,
+        WTF_CSRF_ENABLED=False,
+        SQLALCHEMY_DATABASE_URI=database_url,
+        SQLALCHEMY_ENGINE_OPTIONS=dict(config.SQLALCHEMY_ENGINE_OPTIONS),
+        # every request reads the database, so statement counts mean something
+        DETAIL_CACHE_BACKEND='none',
+        FRAGMENT_CACHE_BACKEND='none',
+        JOBS_EAGER=False,
+        THUMBNAIL_CACHE_DIR=thumbnail_dir,
+    )
+    return type('TestConfig', (), settings)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    try:
+        _create_database(TEST_DATABASE_URL)
+    except OperationalError as exc:
+        pytest.skip('no Postgres at TEST_DATABASE_URL: {}'.format(exc.orig))
+
+    from app import create_app
+    app = create_app(_test_config(TEST_DATABASE_URL, str(tmp_path_factory.mktemp('thumbnails'))))
+    with app.app_context():
+        for extension in EXTENSIONS:
+            db.session.execute(text('CREATE EXTENSION IF NOT EXISTS {}'.format(extension)))
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def database(app):
+    # an app context over an empty schema; everything written is truncated after the test
+    with app.app_context():
+        yield db
+        db.session.rollback()
+        db.session.execute(text('TRUNCATE {} RESTART IDENTITY CASCADE'.format(
+            ', '.join(table.name for table in db.metadata.sorted_tables))))
+        db.session.commit()
+
+
+@pytest.fixture
+def client(app, database):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_budget(database):
+    # fails the test when the block issues more statements than its budget,
+    # listing them; yields the statements issued so far:
+    #
+    #     with query_budget(2):
+    #         client.get('/shows/')
+    @contextmanager
+    def budget(limit):
+        try:
+            with profiler.query_budget(limit) as statements:
+                yield statements
+        except profiler.QueryBudgetExceeded as exc:
+            pytest.fail(str(exc), pytrace=False)
+
+    return budget
+
+
+#----------------------------------------------------------------------------#
+# Seed data.
+#----------------------------------------------------------------------------#
+
+SHOWS_START = datetime(2031, 1, 1, 20)
+
+
+def add_artist(name='Artist', **fields):
+    fields.setdefault('genres', ['Jazz'])
+    artist = Artist(name=name, **fields)
+    db.session.add(artist)
+    db.session.commit()
+    return artist.id
+
+
+def add_venue(name='Venue', **fields):
+    fields.setdefault('genres', ['Jazz'])
+    fields.setdefault('city', 'Austin')
+    fields.setdefault('state', 'TX')
+    venue = Venue(name=name, **fields)
+    db.session.add(venue)
+    db.session.commit()
+    return venue.id
+
+
+def add_shows(artist_id, venue_id, count, start=SHOWS_START, every=timedelta(hours=3)):
+    # `count` shows for one artist at one venue, `every` apart, in one INSERT
+    if count:
+        db.session.execute(insert(Show), [
+            {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': start + number * every,
+             'duration_minutes': 60}
+            for number in range(count)])
+        db.session.commit()
+
+
+@pytest.fixture
+def seed(database):
+    # the helpers above, for tests to call as seed.artist(), seed.shows(...)
+    return SimpleNamespace(artist=add_artist, venue=add_venue, shows=add_shows)
@@ -0,0 +1,59 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from activity import refresh_activity, refresh_activity_command
+from conftest import SHOWS_START
+from jobs import work
+from models import ArtistActivity, VenueActivity, db
+
+
+def activity(summary, key):
+    return {row[0]: tuple(row[1:]) for row in db.session.execute(
+        select(getattr(summary, key), summary.upcoming_shows_count, summary.next_show_time))}
+
+
+def test_refresh_recomputes_only_the_rows_given(seed, query_budget):
+    artist_id, other_id, venue_id = seed.artist(), seed.artist('Other'), seed.venue()
+    seed.shows(artist_id, venue_id, 3, every=timedelta(days=1))
+    seed.shows(other_id, venue_id, 1, start=SHOWS_START + timedelta(days=7))
+
+    # the first show has started
+    with query_budget(2):
+        refresh_activity([artist_id], [venue_id], now=SHOWS_START + timedelta(hours=1))
+    assert activity(ArtistActivity, 'artist_id') == {artist_id: (2, SHOWS_START + timedelta(days=1))}
+    assert activity(VenueActivity, 'venue_id') == {venue_id: (3, SHOWS_START + timedelta(days=1))}
+
+
+def test_command_refreshes_rows_whose_next_show_started(app, seed):
+    artist_id, other_id, venue_id = seed.artist(), seed.artist('Other'), seed.venue()
+    now = datetime.now().replace(microsecond=0)
+    seed.shows(artist_id, venue_id, 2, start=now - timedelta(hours=1), every=timedelta(days=1))
+    seed.shows(other_id, venue_id, 1, start=SHOWS_START)
+    refresh_activity(now=now - timedelta(hours=2), everything=True)
+    # a row time cannot have made stale is left alone
+    db.session.execute(update(ArtistActivity).where(ArtistActivity.artist_id == other_id)
+                       .values(upcoming_shows_count=99))
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    assert runner.invoke(refresh_activity_command).output == 'Activity counters refreshed.\n'
+    assert activity(ArtistActivity, 'artist_id') == {artist_id: (1, now + timedelta(days=1) - timedelta(hours=1)),
+                                                     other_id: (99, SHOWS_START)}
+    assert activity(VenueActivity, 'venue_id') == {venue_id: (2, now + timedelta(days=1) - timedelta(hours=1))}
+
+    runner.invoke(refresh_activity_command, ['--all'])
+    assert activity(ArtistActivity, 'artist_id')[other_id] == (1, SHOWS_START)
+
+
+def test_booking_a_show_queues_its_refresh(app, client, seed):
+    artist_id, venue_id = seed.artist(), seed.venue()
+    client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                       'start_time': '2031-01-01 20:00'})
+    assert activity(ArtistActivity, 'artist_id') == {}
+
+    assert work(app, threading.Event(), burst=True) == {'done': 1, 'failed': 0}
+    db.session.expire_all()
+    assert activity(ArtistActivity, 'artist_id') == {artist_id: (1, SHOWS_START)}
+    assert activity(VenueActivity, 'venue_id') == {venue_id: (1, SHOWS_START)}
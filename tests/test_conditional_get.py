@@ -0,0 +1,83 @@
+import re
+from datetime import timedelta
+
+import pytest
+from flask import template_rendered
+from sqlalchemy import text
+
+from conftest import SHOWS_START
+from models import db
+
+SHOWS_TABLE = re.compile(r'\bshows\b')
+
+DETAIL_PAGES = ('/artists/1', '/venues/1', '/api/v1/artists/1', '/api/v1/venues/1')
+
+
+@pytest.fixture
+def booked(seed):
+    seed.shows(seed.artist(), seed.venue(), 5)
+
+
+def revalidate(client, path, query_budget, **headers):
+    with query_budget(1) as statements:
+        response = client.get(path, headers=headers)
+    return response, statements
+
+
+@pytest.mark.parametrize('path', DETAIL_PAGES)
+def test_unchanged_detail_page_is_304_without_reading_shows(client, booked, query_budget, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+
+    for headers in ({'If-None-Match': first.headers['ETag']},
+                    {'If-Modified-Since': first.headers['Last-Modified']}):
+        response, statements = revalidate(client, path, query_budget, **headers)
+        assert response.status_code == 304
+        assert response.data == b''
+        assert not [statement for statement in statements if SHOWS_TABLE.search(statement)]
+
+
+def test_unchanged_show_listing_is_304_without_rendering(app, client, booked, query_budget):
+    # the listing's validators come from the page it fetched, so an unchanged
+    # page costs that one query and no template
+    first = client.get('/shows/')
+    rendered = []
+    for headers in ({'If-None-Match': first.headers['ETag']},
+                    {'If-Modified-Since': first.headers['Last-Modified']}):
+        with template_rendered.connected_to(lambda sender, template, **extra: rendered.append(template.name), app):
+            response, _ = revalidate(client, '/shows/', query_budget, **headers)
+        assert response.status_code == 304
+        assert response.data == b''
+        assert rendered == []
+
+
+def test_show_listing_etag_follows_the_ids_on_the_page(client, seed):
+    # shows 2 and 3 come first; once they are gone, 1 and 4 fill the same
+    # page with the same count, id sum and timestamps
+    artist_id, venue_id = seed.artist(), seed.venue()
+    for hours in (6, 0, 3, 9):
+        seed.shows(artist_id, venue_id, 1, start=SHOWS_START + timedelta(hours=hours))
+    db.session.execute(text("UPDATE shows SET updated_at = '2030-01-01'"))
+    db.session.commit()
+    etag = client.get('/shows/?per_page=1').headers['ETag']
+
+    db.session.execute(text('DELETE FROM shows WHERE id IN (2, 3)'))
+    db.session.commit()
+    response = client.get('/shows/?per_page=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('path', DETAIL_PAGES + ('/shows/',))
+def test_new_show_changes_the_validators(client, booked, path):
+    etag = client.get(path).headers['ETag']
+    response = client.post('/shows/create', data={'artist_id': 1, 'venue_id': 1,
+                                                  'start_time': '2031-06-01 20:00'})
+    assert response.status_code == 200
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_missing_record_is_404(client, booked):
+    assert client.get('/artists/2').status_code == 404
+    assert client.get('/venues/2', headers={'If-None-Match': 'W/"venue-x"'}).status_code == 404
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from conflicts import conflicts_command, is_double_booking
+from conftest import SHOWS_START
+from models import Show, db
+
+
+def show_count():
+    return db.session.scalar(select(func.count()).select_from(Show))
+
+
+@pytest.fixture
+def booked(seed):
+    # one 60-minute show at SHOWS_START, artist 1 at venue 1
+    artist_id, venue_id = seed.artist(), seed.venue()
+    seed.shows(artist_id, venue_id, 1)
+    return artist_id, venue_id
+
+
+def test_overlapping_write_is_a_double_booking(booked):
+    artist_id, venue_id = booked
+    db.session.add(Show(artist_id=artist_id, venue_id=venue_id, start_time=SHOWS_START + timedelta(minutes=30),
+                        duration_minutes=60))
+    with pytest.raises(IntegrityError) as raised:
+        db.session.flush()
+    assert raised.value.orig.pgcode == '23P01'
+    assert is_double_booking(raised.value)
+
+
+def test_form_names_the_show_already_booked(client, booked):
+    response = client.post('/shows/create', data={'artist_id': 1, 'venue_id': 1,
+                                                  'start_time': '2031-01-01 20:30'})
+    assert 'Venue 1 already has show 1 from 2031-01-01 20:00 to 21:00.' in response.get_data(as_text=True)
+    assert show_count() == 1
+
+
+def test_concurrent_booking_trips_the_constraint(client, booked, monkeypatch):
+    # another request booked the slot between the check and the insert
+    monkeypatch.setattr('routes.ShowController.booking_conflicts', lambda *args: [])
+    response = client.post('/shows/create', data={'artist_id': 1, 'venue_id': 1,
+                                                  'start_time': '2031-01-01 20:30'})
+    assert 'That venue or artist was just booked for an overlapping time.' in response.get_data(as_text=True)
+    assert show_count() == 1
+
+
+@pytest.mark.parametrize('duration', ('-30', '0', '1441', 'long'))
+def test_duration_out_of_range_is_refused(client, booked, duration):
+    response = client.post('/shows/create', data={'artist_id': 1, 'venue_id': 1, 'start_time': '2031-02-01 20:00',
+                                                  'duration_minutes': duration})
+    assert 'Show could not be listed: Duration (minutes):' in response.get_data(as_text=True)
+    assert show_count() == 1
+
+
+def test_conflicts_command_lists_overlaps(app, seed):
+    artist_ids = [seed.artist('Artist {}'.format(number)) for number in range(3)]
+    venue_ids = [seed.venue('Venue {}'.format(number)) for number in range(2)]
+    runner = app.test_cli_runner()
+    seed.shows(artist_ids[0], venue_ids[0], 1)
+    seed.shows(artist_ids[1], venue_ids[1], 1)
+    result = runner.invoke(conflicts_command)
+    assert (result.exit_code, result.output) == (0, '0 overlapping shows found.\n')
+
+    # overlaps written before the constraints existed; the test's transaction
+    # is rolled back afterwards, constraints included
+    db.session.execute(text('ALTER TABLE shows DROP CONSTRAINT ex_shows_venue_id_overlap, '
+                            'DROP CONSTRAINT ex_shows_artist_id_overlap'))
+    db.session.execute(text(
+        'INSERT INTO shows (artist_id, venue_id, start_time, duration_minutes, updated_at) VALUES '
+        "(:third, :first_venue, '2031-01-01 20:30', 60, now()), "
+        "(:first, :second_venue, '2031-01-01 20:45', 60, now())"),
+        {'first': artist_ids[0], 'third': artist_ids[2], 'first_venue': venue_ids[0],
+         'second_venue': venue_ids[1]})
+
+    result = runner.invoke(conflicts_command)
+    assert result.exit_code == 1
+    assert result.output.splitlines() == [
+        'venue 1: show 3 (2031-01-01 20:30) overlaps show 1 (2031-01-01 20:00 to 21:00)',
+        'venue 2: show 4 (2031-01-01 20:45) overlaps show 2 (2031-01-01 20:00 to 21:00)',
+        'artist 1: show 4 (2031-01-01 20:45) overlaps show 1 (2031-01-01 20:00 to 21:00)',
+        '3 overlapping shows found.',
+    ]
+    assert runner.invoke(conflicts_command, ['--by', 'artist']).output.splitlines()[-1] == \
+        '1 overlapping shows found.'
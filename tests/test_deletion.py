@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from conftest import SHOWS_START
+from deletion import purge_deleted_command, soft_delete
+from genres import refresh_genre_counts
+from models import Artist, GenreCount, Job, Show, Venue, db
+
+MODELS = {'artist': Artist, 'venue': Venue}
+
+
+@pytest.fixture
+def booked(seed):
+    # two of each; record 0 of each kind lists Jazz and Rock, record 1 Jazz:
+    # (artist 0, venue 0), (artist 1, venue 0), (artist 0, venue 1)
+    ids = {kind: [getattr(seed, kind)('{} {}'.format(kind.title(), number), genres=genres)
+                  for number, genres in enumerate((['Jazz', 'Rock'], ['Jazz']))]
+           for kind in MODELS}
+    for day, (artist, venue) in enumerate(((0, 0), (1, 0), (0, 1))):
+        seed.shows(ids['artist'][artist], ids['venue'][venue], 1, start=SHOWS_START + timedelta(days=day))
+    refresh_genre_counts()
+    db.session.commit()
+    return ids
+
+
+def genre_counts(kind):
+    return dict(db.session.execute(select(GenreCount.genre, GenreCount.total)
+                                   .where(GenreCount.kind == kind, GenreCount.total > 0)).all())
+
+
+@pytest.mark.parametrize('kind, other', (('venue', 'artist'), ('artist', 'venue')))
+def test_delete_removes_the_record_and_its_shows(client, booked, kind, other):
+    deleted, kept = booked[kind]
+    counterparts = booked[other]
+    touched_at = {id: db.session.get(MODELS[other], id).updated_at for id in counterparts}
+
+    response = client.delete('/{}s/{}'.format(kind, deleted))
+    assert response.status_code == 302
+    assert client.delete('/{}s/{}'.format(kind, deleted)).status_code == 404
+
+    db.session.expire_all()
+    left = (0, 1) if kind == 'venue' else (1, 0)
+    assert db.session.execute(select(Show.artist_id, Show.venue_id)).all() == \
+        [(booked['artist'][left[0]], booked['venue'][left[1]])]
+    assert genre_counts(kind) == {'Jazz': 1}
+    assert genre_counts(other) == {'Jazz': 2, 'Rock': 1}
+    # both counterparts listed a deleted show, and their counters catch up in a job
+    assert all(db.session.get(MODELS[other], id).updated_at > touched_at[id] for id in counterparts)
+    assert [(job.name, job.payload) for job in db.session.scalars(select(Job))] == \
+        [('refresh_activity', {other + '_ids': counterparts})]
+
+    for url in ('/{}s/{}', '/api/v1/{}s/{}'):
+        assert client.get(url.format(kind, deleted)).status_code == 404
+        assert client.get(url.format(kind, kept)).status_code == 200
+    listing = client.get('/{}s/'.format(kind)).get_data(as_text=True)
+    assert '{} 0'.format(kind.title()) not in listing
+    assert '{} 1'.format(kind.title()) in listing
+    assert [row['id'] for row in client.get('/api/v1/{}s'.format(kind)).get_json()['data']] == [kept]
+
+
+def test_purge_removes_rows_deleted_before_the_retention(app, booked):
+    soft_delete('artist', booked['artist'][0], now=datetime.now() - timedelta(days=31))
+    soft_delete('venue', booked['venue'][1])
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(purge_deleted_command)
+    assert (result.exit_code, result.output) == (0, 'Purged 1 artists and 0 venues.\n')
+    assert db.session.get(Artist, booked['artist'][0]) is None
+    assert db.session.get(Venue, booked['venue'][1]) is not None
+
+    assert runner.invoke(purge_deleted_command, ['--days', '0']).output == 'Purged 0 artists and 1 venues.\n'
+    assert db.session.get(Venue, booked['venue'][1]) is None
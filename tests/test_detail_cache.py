@@ -0,0 +1,40 @@
+import pytest
+
+from cache import LRUBackend, detail_cache
+
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    # the app's detail cache over an empty in-process backend
+    monkeypatch.setattr(detail_cache, 'backend', LRUBackend())
+    monkeypatch.setattr(detail_cache, 'hits', 0)
+    monkeypatch.setattr(detail_cache, 'misses', 0)
+    return detail_cache
+
+
+def counters(cache):
+    return cache.stats()['hits'], cache.stats()['misses']
+
+
+def test_booking_a_show_invalidates_both_pages(client, seed, cache):
+    artist_id, venue_id = seed.artist('Guns N Petals'), seed.venue('The Musical Hop')
+    for _ in range(2):
+        assert 'The Musical Hop' not in client.get('/artists/{}'.format(artist_id)).get_data(as_text=True)
+    assert 'Guns N Petals' not in client.get('/venues/{}'.format(venue_id)).get_data(as_text=True)
+    assert counters(cache) == (1, 2)
+
+    client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                       'start_time': '2031-01-01 20:00'})
+    assert 'The Musical Hop' in client.get('/artists/{}'.format(artist_id)).get_data(as_text=True)
+    assert 'Guns N Petals' in client.get('/venues/{}'.format(venue_id)).get_data(as_text=True)
+    assert counters(cache) == (1, 4)
+
+
+def test_deleting_a_venue_invalidates_its_artists(client, seed, cache):
+    artist_id, venue_id = seed.artist(), seed.venue('The Musical Hop')
+    seed.shows(artist_id, venue_id, 1)
+    assert 'The Musical Hop' in client.get('/artists/{}'.format(artist_id)).get_data(as_text=True)
+
+    client.delete('/venues/{}'.format(venue_id))
+    assert 'The Musical Hop' not in client.get('/artists/{}'.format(artist_id)).get_data(as_text=True)
+    assert counters(cache) == (0, 2)
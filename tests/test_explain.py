@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import text
+
+from conftest import SHOWS_START
+from queries import artist_shows_query, venue_shows_query
+
+# The detail pages' show queries must reach shows through an index on the
+# owner column, never a sequential scan. Seeded big enough, and analyzed, so
+# the planner prices a scan of the table honestly.
+ARTISTS = VENUES = 100
+SLOTS = 150    # shows per artist, and per venue
+
+INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+
+@pytest.fixture
+def seeded(database):
+    database.session.execute(text(
+        "INSERT INTO artists (name, genres, updated_at) "
+        "SELECT 'Artist ' || n, ARRAY['Jazz'], now() FROM generate_series(1, :count) AS n"), {'count': ARTISTS})
+    database.session.execute(text(
+        "INSERT INTO venues (name, city, state, genres, updated_at) "
+        "SELECT 'Venue ' || n, 'Austin', 'TX', ARRAY['Jazz'], now() FROM generate_series(1, :count) AS n"),
+        {'count': VENUES})
+    # in each slot every artist plays a different venue, so nothing overlaps
+    database.session.execute(text(
+        "INSERT INTO shows (artist_id, venue_id, start_time, duration_minutes, updated_at) "
+        "SELECT artist, 1 + (artist + slot) % :venues, :start + slot * interval '3 hours', 60, now() "
+        "FROM generate_series(1, :artists) AS artist, generate_series(0, :slots - 1) AS slot"),
+        {'artists': ARTISTS, 'venues': VENUES, 'slots': SLOTS, 'start': SHOWS_START})
+    database.session.commit()
+    for table in ('artists', 'venues', 'shows'):
+        database.session.execute(text('ANALYZE {}'.format(table)))
+    return database
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(database, query):
+    compiled = query.compile(dialect=database.engine.dialect)
+    plan = database.session.connection().exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + compiled.string, compiled.params).scalar()
+    return list(plan_nodes(plan[0]['Plan']))
+
+
+@pytest.mark.parametrize('build,column', ((artist_shows_query, 'artist_id'), (venue_shows_query, 'venue_id')))
+def test_detail_show_queries_use_an_index_on_the_owner(seeded, build, column):
+    now = SHOWS_START + timedelta(days=SLOTS // 16)
+    nodes = explain(seeded, build(42, now, past_limit=10))
+
+    shows = [node for node in nodes if node.get('Relation Name') == 'shows']
+    assert shows, 'shows is not read: {}'.format(nodes)
+    for node in shows:
+        assert node['Node Type'] in INDEX_SCANS, 'shows read by {}'.format(node['Node Type'])
+    assert 'ix_shows_{}_start_time'.format(column) in {node.get('Index Name') for node in nodes}
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from cache import LRUBackend, fragment_cache
+from routes.IndexController import RECENT_ARTISTS
+
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    # the app's fragment cache over an empty in-process backend
+    monkeypatch.setattr(fragment_cache, 'backend', LRUBackend(ttl=600))
+    for counter in ('hits', 'stale_hits', 'misses'):
+        monkeypatch.setattr(fragment_cache, counter, 0)
+    return fragment_cache
+
+
+def counters(cache):
+    stats = cache.stats()
+    return stats['hits'], stats['stale_hits'], stats['misses']
+
+
+def test_invalidate_marks_the_entry_stale(client, seed, cache):
+    seed.artist('Guns N Petals')
+    client.get('/')
+    client.get('/')
+    assert counters(cache) == (2, 0, 2)
+
+    seed.artist('The Wild Sax Band')
+    cache.invalidate(RECENT_ARTISTS, 'home:never_rendered')
+    # kept as a copy to serve, but no longer fresh
+    assert cache.backend.get(RECENT_ARTISTS)['fresh_until'] == 0
+    assert cache.backend.get('home:never_rendered') is None
+    assert 'The Wild Sax Band' in client.get('/').get_data(as_text=True)
+    assert counters(cache) == (3, 0, 3)
+
+
+def test_stale_copy_is_served_while_one_request_re_renders(client, seed, cache):
+    seed.artist('Guns N Petals')
+    client.get('/')
+    seed.artist('The Wild Sax Band')
+    cache.invalidate(RECENT_ARTISTS)
+
+    rendering, release = threading.Event(), threading.Event()
+
+    def slow_render():
+        rendering.set()
+        assert release.wait(5)
+        return '<h5>refreshed</h5>'
+
+    refresher = threading.Thread(target=cache.get_or_render, args=(RECENT_ARTISTS, slow_render))
+    refresher.start()
+    try:
+        assert rendering.wait(5)
+        page = client.get('/').get_data(as_text=True)
+        assert 'Guns N Petals' in page and 'The Wild Sax Band' not in page
+        assert counters(cache) == (1, 1, 2)
+    finally:
+        release.set()
+        refresher.join(5)
+    assert 'refreshed' in client.get('/').get_data(as_text=True)
+    assert counters(cache) == (3, 1, 3)
@@ -0,0 +1,50 @@
+from sqlalchemy import select
+
+from genres import count_genres, refresh_genre_counts
+from models import GenreCount, db
+
+
+def genre_counts(kind):
+    return dict(db.session.execute(select(GenreCount.genre, GenreCount.total)
+                                   .where(GenreCount.kind == kind)).all())
+
+
+def test_counts_move_by_deltas_in_one_upsert(database, query_budget):
+    with query_budget(1):
+        # a genre listed twice on one record counts once
+        count_genres('artist', added=[['Jazz', 'Rock'], ['Jazz', 'Jazz']])
+    assert genre_counts('artist') == {'Jazz': 2, 'Rock': 1}
+
+    # an edit from Jazz, Rock to Rock, Blues
+    with query_budget(1):
+        count_genres('artist', added=[['Rock', 'Blues']], removed=[['Jazz', 'Rock']])
+    assert genre_counts('artist') == {'Blues': 1, 'Jazz': 1, 'Rock': 1}
+    assert genre_counts('venue') == {}
+
+    with query_budget(0):
+        count_genres('artist', added=[['Folk']], removed=[['Folk']])
+        count_genres('artist', added=[None, []])
+
+
+def recount(kind):
+    # the counts refresh_genre_counts rebuilds from the records, rolled back
+    with db.session.begin_nested() as savepoint:
+        refresh_genre_counts([kind])
+        counts = genre_counts(kind)
+        savepoint.rollback()
+    return counts
+
+
+def test_write_paths_keep_the_counts_in_step(client):
+    form = {'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'phone': '326-123-5000',
+            'genres': ['Jazz', 'Rock'], 'seeking_venue': 'False'}
+    client.post('/artists/create', data=form)
+    client.post('/artists/create', data=dict(form, name='The Wild Sax Band', genres=['Jazz']))
+    assert genre_counts('artist') == recount('artist') == {'Jazz': 2, 'Rock': 1}
+
+    client.post('/artists/1/edit', data=dict(form, genres=['Rock', 'Blues']))
+    assert genre_counts('artist') == recount('artist') == {'Blues': 1, 'Jazz': 1, 'Rock': 1}
+
+    client.delete('/artists/2')
+    assert {genre: total for genre, total in genre_counts('artist').items() if total} == \
+        recount('artist') == {'Blues': 1, 'Rock': 1}
@@ -0,0 +1,49 @@
+import json
+
+from sqlalchemy import select
+
+from importer import run_import
+from models import Artist, GenreCount, Job, Show, db
+
+ARTIST = {'city': 'Austin', 'state': 'TX', 'phone': '512-555-0100', 'genres': 'Jazz,Blues',
+          'facebook_link': 'https://www.facebook.com/fyyur', 'website_link': 'https://fyyur.example.com'}
+
+
+def write_jsonl(tmp_path, lines):
+    path = tmp_path / 'rows.jsonl'
+    path.write_text('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines) + '\n')
+    return str(path)
+
+
+def test_lines_that_are_not_json_objects_are_reported(database, tmp_path):
+    path = write_jsonl(tmp_path, [dict(ARTIST, name='First'), '{"name": "Broken', '["a", "list"]',
+                                  dict(ARTIST, name='Second')])
+    reported = []
+    assert run_import('artists', path, 'jsonl', 10, report=reported.append) == (2, 2)
+
+    assert reported[0].startswith('{}:2: {{"json": '.format(path))
+    assert reported[1] == '{}:3: {{"json": ["expected an object, got list"]}}'.format(path)
+    assert database.session.scalars(select(Artist.name).order_by(Artist.id)).all() == ['First', 'Second']
+    counts = dict(database.session.execute(select(GenreCount.genre, GenreCount.total)
+                                           .where(GenreCount.kind == 'artist')).all())
+    assert counts == {'Blues': 2, 'Jazz': 2}
+
+
+def test_show_batch_commits_with_its_refresh_job(seed, tmp_path):
+    artist_id, venue_id = seed.artist(), seed.venue()
+    touched_at = db.session.get(Artist, artist_id).updated_at
+    show = {'artist_id': artist_id, 'venue_id': venue_id}
+    # the second show overlaps the first, so the batch falls back to row-by-row inserts
+    path = write_jsonl(tmp_path, [dict(show, start_time='2031-03-01 20:00:00'),
+                                  dict(show, start_time='2031-03-01 21:00:00'),
+                                  dict(show, start_time='2031-03-02 20:00:00')])
+    reported = []
+    assert run_import('shows', path, 'jsonl', 10, report=reported.append) == (2, 1)
+    assert reported[0].startswith('{}:2: {{"database": '.format(path))
+
+    db.session.expire_all()
+    assert db.session.scalar(select(db.func.count()).select_from(Show)) == 2
+    assert db.session.get(Artist, artist_id).updated_at > touched_at
+    jobs = db.session.scalars(select(Job)).all()
+    assert [(job.name, job.status, job.payload) for job in jobs] == [
+        ('refresh_activity', 'pending', {'artist_ids': [artist_id], 'venue_ids': [venue_id]})]
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+import importtime
+
+# The same budgets importtime.py enforces by hand. Each boot is measured a
+# few times and the fastest counts, so a busy machine does not fail the run.
+BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', 1000))
+CLI_BUDGET_MS = float(os.getenv('CLI_IMPORT_TIME_BUDGET_MS', 1200))
+RUNS = 3
+
+
+@pytest.fixture(scope='module')
+def boots():
+    # {cli: top-level imports of the fastest of RUNS boots}
+    return {cli: min((importtime.measure(cli) for _ in range(RUNS)), key=importtime.total_ms)
+            for cli in (False, True)}
+
+
+@pytest.mark.parametrize('cli,budget_ms', ((False, BUDGET_MS), (True, CLI_BUDGET_MS)))
+def test_boot_is_within_import_time_budget(boots, cli, budget_ms):
+    slowest = sorted(boots[cli], key=lambda entry: -entry[1])[:5]
+    assert importtime.total_ms(boots[cli]) <= budget_ms, 'slowest imports: {}'.format(slowest)
+
+
+def test_web_boot_skips_cli_only_imports(boots):
+    assert 'flask_migrate' not in {name for name, _ in boots[False]}
+    assert 'flask_migrate' in {name for name, _ in boots[True]}
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from jobs import claim, release_lost
+from models import Job, db
+
+NOW = datetime(2031, 1, 1, 12)
+
+
+def add_job(**fields):
+    job = Job(name='refresh_activity', max_attempts=3, run_at=NOW - timedelta(hours=1), **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_lost_run_counts_as_an_attempt(database, app):
+    job_id, now = add_job(), NOW
+    for attempt in range(1, 4):
+        claimed = claim(10, now=now)
+        assert [(job.id, job.attempts) for job in claimed] == [(job_id, attempt)]
+        # the worker died; once the lock times out the job is released
+        now += timedelta(seconds=app.config['JOB_LOCK_TIMEOUT_SECONDS'] + 1)
+        assert release_lost(now=now) == 1
+
+    job = db.session.get(Job, job_id)
+    db.session.refresh(job)
+    assert (job.status, job.attempts, job.finished_at) == ('failed', 3, now)
+    assert job.last_error.startswith('Worker lost the job')
+    assert claim(10, now=now) == []
+
+
+def test_release_leaves_live_and_retryable_jobs(database, app):
+    timeout = timedelta(seconds=app.config['JOB_LOCK_TIMEOUT_SECONDS'])
+    live = add_job(status='running', attempts=1, locked_at=NOW - timeout / 2)
+    lost = add_job(status='running', attempts=1, locked_at=NOW - 2 * timeout)
+
+    assert release_lost(now=NOW) == 1
+    statuses = dict(db.session.execute(select(Job.id, Job.status)).all())
+    assert statuses == {live: 'running', lost: 'pending'}
@@ -0,0 +1,119 @@
+import re
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+from conftest import TEST_DATABASE_URL, _test_config
+from models import db
+
+SAMPLE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(exposition):
+    # {name: {frozenset(labels): value}} plus {name: type} from the # TYPE lines
+    samples, types = defaultdict(dict), {}
+    for line in exposition.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line and not line.startswith('#'):
+            match = SAMPLE.match(line)
+            assert match, 'unparseable line: {!r}'.format(line)
+            labels = frozenset(LABEL.findall(match.group('labels') or ''))
+            samples[match.group('name')][labels] = float(match.group('value'))
+    return samples, types
+
+
+@pytest.fixture
+def scraped(client, seed):
+    seed.shows(seed.artist(), seed.venue(), 3)
+    for path in ('/', '/shows/', '/artists/1', '/venues/1', '/artists/1'):
+        assert client.get(path).status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert response.headers['Cache-Control'] == 'no-store'
+    return parse(response.get_data(as_text=True))
+
+
+def histogram(samples, name, **labels):
+    # (cumulative buckets by le, sum, count) of one labelled series
+    labels = set(labels.items())
+    buckets = {dict(key)['le']: value for key, value in samples[name + '_bucket'].items() if labels < key}
+    series = frozenset(labels)
+    return buckets, samples[name + '_sum'][series], samples[name + '_count'][series]
+
+
+def test_request_duration_histograms(scraped):
+    samples, types = scraped
+    assert types['fyyur_request_duration_seconds'] == 'histogram'
+    for blueprint, endpoint in (('home', 'home.index'), ('shows', 'shows.shows'),
+                                ('artists', 'artists.show_artist'), ('venues', 'venues.show_venue')):
+        buckets, total, count = histogram(samples, 'fyyur_request_duration_seconds',
+                                          blueprint=blueprint, endpoint=endpoint)
+        bounds = sorted(buckets, key=lambda le: float('inf') if le == '+Inf' else float(le))
+        assert bounds[-1] == '+Inf'
+        cumulative = [buckets[le] for le in bounds]
+        assert cumulative == sorted(cumulative)
+        assert cumulative[-1] == count >= 1
+        assert total > 0
+
+    _, _, artist_views = histogram(samples, 'fyyur_request_duration_seconds',
+                                   blueprint='artists', endpoint='artists.show_artist')
+    assert artist_views >= 2
+
+
+def test_render_and_db_time(scraped):
+    samples, types = scraped
+    assert types['fyyur_template_render_seconds'] == 'histogram'
+    _, render_time, renders = histogram(samples, 'fyyur_template_render_seconds', template='pages/shows.html')
+    assert renders >= 1 and render_time > 0
+    _, db_time, requests = histogram(samples, 'fyyur_request_db_seconds', blueprint='shows', endpoint='shows.shows')
+    assert requests >= 1 and db_time > 0
+
+
+def test_in_flight_gauge_and_request_counter(scraped):
+    samples, types = scraped
+    assert types['fyyur_requests_in_flight'] == 'gauge'
+    in_flight = {dict(key)['blueprint']: value for key, value in samples['fyyur_requests_in_flight'].items()}
+    # only the scrape itself is still being handled
+    assert in_flight['metrics'] == 1
+    assert in_flight['shows'] == in_flight['artists'] == 0
+    assert samples['fyyur_requests_total'][frozenset(
+        {('blueprint', 'shows'), ('endpoint', 'shows.shows'), ('status', '200')})] >= 1
+
+
+def test_cache_series(scraped):
+    samples, types = scraped
+    for name, caches in (('fyyur_cache_hits_total', {'detail', 'fragment', 'thumbnail'}),
+                         ('fyyur_cache_misses_total', {'detail', 'fragment', 'thumbnail'}),
+                         ('fyyur_cache_evictions_total', {'detail', 'fragment', 'thumbnail'}),
+                         ('fyyur_cache_stale_hits_total', {'fragment'}),
+                         ('fyyur_cache_failures_total', {'thumbnail'}),
+                         # thumbnails live on disk and are not counted
+                         ('fyyur_cache_entries', {'detail', 'fragment'})):
+        assert {dict(key)['cache'] for key in samples[name]} == caches, name
+    assert types['fyyur_cache_hits_total'] == 'counter'
+    assert types['fyyur_cache_entries'] == 'gauge'
+    # the detail pages went through the detail cache
+    assert samples['fyyur_cache_misses_total'][frozenset({('cache', 'detail')})] >= 2
+
+
+def test_db_time_listeners_stay_on_each_apps_engine(database, tmp_path):
+    # another app in the same process times its own engine, not this one's again
+    from app import create_app
+    other = create_app(_test_config(TEST_DATABASE_URL, str(tmp_path)))
+    with other.app_context():
+        other_engine = db.engine
+    try:
+        for name, listener in (('before_cursor_execute', metrics._before_cursor_execute),
+                               ('after_cursor_execute', metrics._after_cursor_execute)):
+            assert event.contains(database.engine, name, listener)
+            assert event.contains(other_engine, name, listener)
+            assert not event.contains(Engine, name, listener)
+    finally:
+        other_engine.dispose()
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import pytest
+
+from conftest import SHOWS_START, TEST_DATABASE_URL, _test_config
+from models import db
+
+# Statements each read endpoint may issue, whatever the number of rows it
+# lists. An N+1 loop shows up as a budget overrun with the repeated statement.
+BUDGETS = (
+    ('/', 2),
+    ('/shows/', 1),
+    ('/artists/', 2),
+    ('/venues/', 2),
+    ('/artists/1', 3),
+    ('/venues/1', 3),
+    ('/api/v1/shows', 1),
+    ('/api/v1/artists/1', 3),
+    ('/api/v1/venues/1', 3),
+)
+
+
+@pytest.fixture
+def booked(seed):
+    # three artists each playing all three venues, in nine separate slots
+    artist_ids = [seed.artist('Artist {}'.format(number)) for number in range(3)]
+    venue_ids = [seed.venue('Venue {}'.format(number)) for number in range(3)]
+    for slot, (artist_id, venue_id) in enumerate((a, v) for a in artist_ids for v in venue_ids):
+        seed.shows(artist_id, venue_id, 1, start=SHOWS_START + slot * timedelta(hours=3))
+
+
+@pytest.mark.parametrize('path,budget', BUDGETS)
+def test_read_endpoints_stay_within_budget(client, booked, query_budget, path, budget):
+    with query_budget(budget):
+        response = client.get(path)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('path,term', (('/artists/search', 'Artist'), ('/venues/search', 'Venue')))
+def test_search_is_one_statement(client, booked, query_budget, path, term):
+    with query_budget(1):
+        response = client.post(path, data={'search_term': term})
+    assert response.status_code == 200
+
+
+def test_budget_overrun_fails_the_test(client, booked, query_budget):
+    with pytest.raises(pytest.fail.Exception, match='1 queries issued, budget is 0'):
+        with query_budget(0):
+            client.get('/shows/')
+
+
+def test_profiler_counts_each_statement_once(booked, query_budget, tmp_path):
+    # two profiled apps in one process; each counts only its own engine's statements
+    from app import create_app
+    config = _test_config(TEST_DATABASE_URL, str(tmp_path))
+    config.SQL_PROFILER = True
+    profiled = [create_app(config) for _ in range(2)]
+    try:
+        with profiled[0].app_context(), query_budget(1) as statements:
+            response = profiled[0].test_client().get('/shows/')
+        assert response.headers['X-Query-Count'] == str(len(statements))
+    finally:
+        for app in profiled:
+            with app.app_context():
+                db.engine.dispose()
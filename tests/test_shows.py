@@ -0,0 +1,48 @@
+import re
+from datetime import timedelta
+
+from conftest import SHOWS_START
+
+SHOWS = 30
+NEXT_PAGE = re.compile(r'<li class="next"><a href="([^"]+)"')
+
+
+def seed_shows(seed, artist_ids, venue_ids, count, first=0):
+    # `count` shows spread over the artists and venues, each pair booked a day apart
+    pairs = list(zip(artist_ids, venue_ids))
+    for number, (artist_id, venue_id) in enumerate(pairs):
+        per_pair = count // len(pairs) + (number < count % len(pairs))
+        seed.shows(artist_id, venue_id, per_pair, start=SHOWS_START + timedelta(days=first), every=timedelta(days=1))
+
+
+def listing_statements(client, query_budget):
+    with query_budget(1) as statements:
+        response = client.get('/shows/')
+    assert response.status_code == 200
+    return statements
+
+
+def test_show_listing_statements_do_not_grow_with_the_table(client, seed, query_budget):
+    artist_ids = [seed.artist('Artist {}'.format(number)) for number in range(5)]
+    venue_ids = [seed.venue('Venue {}'.format(number)) for number in range(5)]
+
+    seed_shows(seed, artist_ids, venue_ids, SHOWS)
+    small = listing_statements(client, query_budget)
+    seed_shows(seed, artist_ids, venue_ids, 9 * SHOWS, first=SHOWS)
+    large = listing_statements(client, query_budget)
+    assert len(small) == len(large)
+
+
+def test_cursor_does_not_repeat_shows_starting_in_the_same_second(client, seed):
+    # three shows within one second, at different venues by different artists
+    for number in range(3):
+        seed.shows(seed.artist('Artist {}'.format(number)), seed.venue('Venue {}'.format(number)), 1,
+                   start=SHOWS_START + timedelta(microseconds=250000 * (number + 1)))
+
+    seen, url = [], '/shows/?per_page=1'
+    while url and len(seen) <= 3:
+        page = client.get(url).get_data(as_text=True)
+        seen.extend(int(artist_id) for artist_id in re.findall(r'href="/artists/(\d+)"', page))
+        next_page = NEXT_PAGE.search(page)
+        url = next_page and next_page.group(1).replace('&amp;', '&')
+    assert seen == [1, 2, 3]
@@ -0,0 +1,28 @@
+from sqlalchemy import text
+
+import config
+from conftest import TEST_DATABASE_URL, _test_config
+from models import db
+
+
+def statement_timeout():
+    # in milliseconds, 0 for none
+    return int(db.session.scalar(text("SELECT setting FROM pg_settings WHERE name = 'statement_timeout'")))
+
+
+def test_web_workers_cap_statements(database):
+    assert statement_timeout() == config.DB_STATEMENT_TIMEOUT_MS
+
+
+def test_cli_runs_without_a_statement_timeout(app, monkeypatch, tmp_path):
+    # migrations and bulk commands go through the same factory under `flask`
+    from app import create_app
+    monkeypatch.setenv('FLASK_RUN_FROM_CLI', 'true')
+    cli_app = create_app(_test_config(TEST_DATABASE_URL, str(tmp_path)))
+    with cli_app.app_context():
+        try:
+            assert statement_timeout() == 0
+        finally:
+            db.session.rollback()
+            db.engine.dispose()
+    assert 'connect_args' not in config.SQLALCHEMY_ENGINE_OPTIONS
@@ -0,0 +1,123 @@
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from PIL import Image
+
+import thumbnails
+from thumbnails import HttpFetcher, LocalFetcher, ThumbnailStore, link_version, thumbnail_store
+
+POSTER = 'https://images.example/poster.png'
+MISSING = 'https://images.example/missing.png'
+
+
+@pytest.fixture
+def images(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    Image.new('RGB', (800, 600), 'red').save(images / 'poster.png')
+    return images
+
+
+@pytest.fixture
+def store(app, images, tmp_path, monkeypatch):
+    # the app's store, over an empty cache and reading links from `images`
+    monkeypatch.setattr(thumbnail_store, 'directory', str(tmp_path / 'cache'))
+    monkeypatch.setattr(thumbnail_store, 'fetcher', LocalFetcher(str(images)))
+    monkeypatch.setattr(thumbnail_store, '_usage', None)
+    for counter in ('hits', 'misses', 'failures', 'evictions'):
+        monkeypatch.setattr(thumbnail_store, counter, 0)
+    return thumbnail_store
+
+
+def counters(store):
+    stats = store.stats()
+    return stats['hits'], stats['misses'], stats['failures']
+
+
+def test_first_request_renders_later_ones_hit(client, seed, store):
+    url = '/img/artist/{}/small'.format(seed.artist(image_link=POSTER))
+    first = client.get(url)
+    assert (first.status_code, first.mimetype) == (200, 'image/jpeg')
+    assert Image.open(io.BytesIO(first.data)).size == (160, 160)
+    assert counters(store) == (0, 1, 0)
+
+    second = client.get(url)
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert counters(store) == (1, 1, 0)
+
+
+def test_failed_fetch_redirects_until_it_is_due_again(client, seed, store, images):
+    url = '/img/venue/{}/medium'.format(seed.venue(image_link=MISSING))
+    for _ in range(2):
+        response = client.get(url)
+        assert (response.status_code, response.location) == (302, MISSING)
+        assert response.headers['Cache-Control'] == 'public, max-age=300'
+    # the second request is answered from the remembered failure
+    assert counters(store) == (0, 1, 1)
+
+    Image.new('RGB', (400, 400), 'blue').save(images / 'missing.png')
+    assert client.get(url).status_code == 302
+    past = time.time() - 301
+    os.utime(store._ref_path(MISSING), (past, past))
+    assert client.get(url).status_code == 200
+    assert counters(store) == (0, 2, 1)
+
+
+def test_only_versioned_urls_are_cached_for_good(client, seed, store):
+    url = '/img/artist/{}/large'.format(seed.artist(image_link=POSTER))
+    versioned = client.get(url + '?v=' + link_version(POSTER))
+    assert (versioned.cache_control.max_age, versioned.cache_control.immutable) == (365 * 24 * 3600, True)
+    for stale in (url, url + '?v=' + link_version('https://images.example/old.png')):
+        response = client.get(stale)
+        assert (response.cache_control.max_age, response.cache_control.immutable) == (300, False)
+
+
+def test_eviction_drops_the_least_recently_served_thumbnails(tmp_path):
+    store = ThumbnailStore()
+    store.directory, store.max_bytes = str(tmp_path), 250
+    # (path, mtime): the reference and the file being written are older than
+    # every thumbnail, and still stay
+    for path, mtime in (('refs/0123', 1), ('ab/.tmp-x', 1), ('ab/b.small.jpg', 2), ('ab/a.small.jpg', 3),
+                        ('cd/c.small.jpg', 4)):
+        os.makedirs(os.path.dirname(tmp_path / path), exist_ok=True)
+        (tmp_path / path).write_bytes(b'x' * 100)
+        os.utime(tmp_path / path, (mtime, mtime))
+
+    assert store.evict() == 200
+    assert store.evictions == 1
+    assert sorted(os.path.relpath(os.path.join(root, name), tmp_path)
+                  for root, _, names in os.walk(tmp_path) for name in names) == \
+        ['ab/.tmp-x', 'ab/a.small.jpg', 'cd/c.small.jpg', 'refs/0123']
+
+
+def test_fetch_connects_to_the_address_that_was_checked(monkeypatch):
+    hosts = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hosts.append(self.headers['Host'])
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'image')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for name in ('http_proxy', 'HTTP_PROXY'):
+        monkeypatch.delenv(name, raising=False)
+    # images.example resolves nowhere: only the checked address is connected to
+    monkeypatch.setattr(thumbnails, 'check_public_url', lambda url: '127.0.0.1')
+    try:
+        url = 'http://images.example:{}/poster.png'.format(server.server_port)
+        assert HttpFetcher()(url) == b'image'
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert hosts == ['images.example:{}'.format(server.server_port)]
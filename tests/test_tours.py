@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+import tours
+from conftest import SHOWS_START
+from models import Show, db
+from tours import TourError, book_tour, expand_rule
+
+
+def show_count():
+    return db.session.scalar(select(func.count()).select_from(Show))
+
+
+@pytest.fixture
+def booked(seed):
+    # one 60-minute show at SHOWS_START by artist 1 at venue 1; artist 2 tours
+    artist_id, venue_id = seed.artist(), seed.venue()
+    seed.shows(artist_id, venue_id, 1)
+    return seed.artist('Touring'), venue_id
+
+
+def test_rule_expands_to_weekly_dates():
+    assert expand_rule(3, SHOWS_START, 'FREQ=WEEKLY;COUNT=3', 10) == [
+        (3, SHOWS_START), (3, SHOWS_START + timedelta(weeks=1)), (3, SHOWS_START + timedelta(weeks=2))]
+
+
+def test_rule_without_an_end_is_refused():
+    with pytest.raises(TourError, match='more than 5 dates'):
+        expand_rule(3, SHOWS_START, 'FREQ=DAILY', 5)
+
+
+def test_tour_books_the_free_dates_and_reports_the_rest(booked):
+    artist_id, venue_id = booked
+    entries = [(venue_id, SHOWS_START + timedelta(minutes=30)),  # the venue is taken
+               (venue_id, SHOWS_START + timedelta(days=1)),
+               (99, SHOWS_START + timedelta(days=2)),
+               (venue_id, SHOWS_START + timedelta(days=1, minutes=30))]  # overlaps date 2
+    results = book_tour(artist_id, entries, 60)
+
+    assert [result['status'] for result in results] == ['rejected', 'booked', 'rejected', 'rejected']
+    assert results[0]['error'] == 'Venue 1 already has show 1 from 2031-01-01 20:00 to 21:00.'
+    assert results[2]['error'] == 'No venue with id 99'
+    assert results[3]['error'] == 'Overlaps date 2 of this tour.'
+    assert db.session.get(Show, results[1]['show_id']).start_time == datetime(2031, 1, 2, 20)
+    assert show_count() == 2
+
+
+def test_concurrent_booking_fails_the_whole_tour(client, booked, monkeypatch):
+    # another request booked date 2 between the check and the insert
+    schedule_conflicts, calls = tours.schedule_conflicts, []
+
+    def missed_once(*args):
+        calls.append(args)
+        return {} if len(calls) == 1 else schedule_conflicts(*args)
+
+    monkeypatch.setattr(tours, 'schedule_conflicts', missed_once)
+    response = client.post('/api/v1/shows/tour', json={'artist_id': 2, 'duration_minutes': 60, 'shows': [
+        {'venue_id': 1, 'start_time': '2030-12-31T20:00'},
+        {'venue_id': 1, 'start_time': '2031-01-01T20:30'}]})
+
+    assert response.status_code == 409
+    assert response.get_json() == {'error': 'Date 2 was just booked: Venue 1 already has show 1 '
+                                            'from 2031-01-01 20:00 to 21:00.; nothing was listed.'}
+    assert show_count() == 1
+
+
+@pytest.mark.parametrize('duration', ('-30', '1441'))
+def test_tour_form_refuses_durations_out_of_range(client, booked, duration):
+    response = client.post('/shows/tour', data={'artist_id': 2, 'dates': '1, 2031-02-01 20:00',
+                                                'duration_minutes': duration})
+    assert response.status_code == 200
+    assert 'Tour could not be listed: duration_minutes:' in response.get_data(as_text=True)
+    assert show_count() == 1
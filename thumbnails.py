@@ -0,0 +1,325 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+
+#----------------------------------------------------------------------------#
+# Image thumbnails.
+#----------------------------------------------------------------------------#
+
+# image_link is any URL an editor typed in. /img/<kind>/<id>/<size> fetches it
+# once, renders every configured size from it and keeps the results on disk:
+#
+#   <THUMBNAIL_CACHE_DIR>/<aa>/<sha256 of source>.<size>.jpg   thumbnails
+#   <THUMBNAIL_CACHE_DIR>/refs/<sha256 of URL>                  URL -> source hash
+#
+# Thumbnails are named by their source's content, so records sharing an image
+# share its thumbnails, and a changed image_link is simply a new reference.
+
+class ThumbnailError(Exception):
+    pass
+
+
+def check_public_url(url):
+    # image links may only point at public http(s) hosts, so they cannot be
+    # used to probe the network the app runs in; returns the address to
+    # connect to, the first the host resolved to
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ThumbnailError('not an http(s) URL: {}'.format(url))
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, None)]
+    except socket.gaierror as error:
+        raise ThumbnailError('cannot resolve {}: {}'.format(parsed.hostname, error))
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ThumbnailError('{} resolves to a non-public address'.format(parsed.hostname))
+    return addresses[0]
+
+
+def _pinned_connection(connection_class, req):
+    # connection_class, connecting to the address check_public_url approved
+    # rather than resolving the host again, which a DNS server could answer
+    # differently the second time; the Host header and the TLS certificate
+    # check still use the name
+    hostname = urlparse(req.full_url).hostname
+    address = check_public_url(req.full_url)
+
+    def create_connection(target, *args, **kwargs):
+        # a proxy, when one is configured, is connected to as usual
+        if target[0].lower() == hostname:
+            target = (address, target[1])
+        return socket.create_connection(target, *args, **kwargs)
+
+    def connection(*args, **kwargs):
+        connection = connection_class(*args, **kwargs)
+        connection._create_connection = create_connection
+        return connection
+    return connection
+
+
+class _PinnedHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_pinned_connection(http.client.HTTPConnection, req), req)
+
+
+class _PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_pinned_connection(http.client.HTTPSConnection, req), req, context=self._context)
+
+
+class _PublicRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_public_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+class HttpFetcher():
+    # fetches public http(s) URLs, redirects included, up to max_bytes
+    def __init__(self, timeout=5, max_bytes=10 * 1024 * 1024):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.opener = urllib.request.build_opener(_PublicRedirectHandler, _PinnedHTTPHandler, _PinnedHTTPSHandler)
+
+    def __call__(self, url):
+        # refuses other schemes up front; each connection, redirects
+        # included, checks its host again and keeps to the address checked
+        check_public_url(url)
+        request = urllib.request.Request(url, headers={'User-Agent': 'fyyur-thumbnailer'})
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                body = response.read(self.max_bytes + 1)
+        except (OSError, ValueError) as error:
+            raise ThumbnailError('fetching {} failed: {}'.format(url, error))
+        if len(body) > self.max_bytes:
+            raise ThumbnailError('{} is larger than {} bytes'.format(url, self.max_bytes))
+        return body
+
+
+class LocalFetcher():
+    # answers every URL with the file of the same name in `directory`, so
+    # tests and offline development need no network
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, url):
+        path = os.path.join(self.directory, os.path.basename(urlparse(url).path))
+        try:
+            with open(path, 'rb') as source:
+                return source.read()
+        except OSError as error:
+            raise ThumbnailError('no local stand-in for {}: {}'.format(url, error))
+
+
+def fetcher_from_config(app):
+    if app.config.get('THUMBNAIL_FETCHER', 'http') == 'local':
+        return LocalFetcher(app.config['THUMBNAIL_LOCAL_DIR'])
+    return HttpFetcher(app.config.get('THUMBNAIL_FETCH_TIMEOUT', 5),
+                       app.config.get('THUMBNAIL_MAX_SOURCE_BYTES', 10 * 1024 * 1024))
+
+
+def render_thumbnail(source, size, max_pixels=None):
+    # JPEG bytes of `source` scaled and center-cropped to exactly `size`
+    from PIL import Image, ImageOps
+    if max_pixels:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(io.BytesIO(source)) as image:
+            # JPEGs decode straight at a reduced scale, far cheaper than in full
+            image.draft('RGB', (size[0] * 2, size[1] * 2))
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                flattened = Image.new('RGB', image.size, 'white')
+                flattened.paste(image, mask=image.getchannel('A'))
+                image = flattened
+            thumbnail = ImageOps.fit(image.convert('RGB'), size, Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise ThumbnailError('not a usable image: {}'.format(error))
+    output = io.BytesIO()
+    thumbnail.save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def link_version(image_link):
+    # changes whenever image_link does, so thumbnail URLs can be cached forever
+    return hashlib.sha256(image_link.encode()).hexdigest()[:12]
+
+
+def thumbnail_url(kind, id, image_link, size='medium'):
+    # template helper; a plain path rather than url_for so the ASGI app, which
+    # hands /img to the Flask app, renders the same URLs
+    if not image_link:
+        return image_link
+    return '/img/{}/{}/{}?v={}'.format(kind, id, size, link_version(image_link))
+
+
+#  Disk cache
+#  ----------------------------------------------------------------
+
+class ThumbnailStore():
+    # Content-addressed thumbnail files, kept under THUMBNAIL_CACHE_MAX_BYTES
+    # by evicting the least recently served files first. Every hit refreshes
+    # a file's mtime, which is what eviction orders by. Each process counts
+    # what it writes and rescans the directory only when the count passes the
+    # limit, so a few processes sharing a directory may briefly overshoot.
+    def __init__(self, app=None):
+        self.directory = None
+        self.sizes = {}
+        self.max_bytes = 0
+        self.retry_after = 300
+        self.max_pixels = None
+        self.fetcher = None
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.evictions = 0
+        self._usage = None
+        self._usage_lock = threading.Lock()
+        # one fetch per URL at a time, without a lock object per URL
+        self._locks = [threading.Lock() for _ in range(64)]
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, fetcher=None):
+        self.directory = app.config['THUMBNAIL_CACHE_DIR']
+        self.sizes = app.config['THUMBNAIL_SIZES']
+        self.max_bytes = app.config['THUMBNAIL_CACHE_MAX_BYTES']
+        self.retry_after = app.config.get('THUMBNAIL_RETRY_SECONDS', 300)
+        self.max_pixels = app.config.get('THUMBNAIL_MAX_PIXELS')
+        self.fetcher = fetcher or fetcher_from_config(app)
+        app.jinja_env.globals['thumbnail_url'] = thumbnail_url
+        app.extensions['thumbnail_store'] = self
+
+    def _ref_path(self, url):
+        return os.path.join(self.directory, 'refs', hashlib.sha256(url.encode()).hexdigest())
+
+    def _thumbnail_path(self, digest, size):
+        return os.path.join(self.directory, digest[:2], '{}.{}.jpg'.format(digest, size))
+
+    def _write(self, path, data):
+        # whole files or nothing: readers never see a partial thumbnail
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(handle, 'wb') as output:
+            output.write(data)
+        os.replace(temporary, path)
+        return len(data)
+
+    def _lookup(self, url, size):
+        # (file, None) on a hit, (None, True) while a failed URL is not yet
+        # due for another try, (None, False) when it has to be fetched
+        ref = self._ref_path(url)
+        try:
+            with open(ref) as source:
+                digest = source.read().strip()
+            if not digest:
+                return None, os.path.getmtime(ref) + self.retry_after > time.time()
+            thumbnail = self._open(self._thumbnail_path(digest, size))
+            os.utime(ref)
+            return thumbnail, None
+        except OSError:
+            return None, False
+
+    def _open(self, path):
+        # an open file stays readable after eviction unlinks it, so a
+        # thumbnail handed out is never deleted from under the response
+        thumbnail = open(path, 'rb')
+        os.utime(path)
+        return thumbnail
+
+    def get(self, url, size):
+        # `url`'s thumbnail at `size` as an open file, fetched and rendered
+        # on first use; None when the source cannot be fetched or decoded
+        thumbnail, failed = self._lookup(url, size)
+        if thumbnail is None and not failed:
+            with self._locks[hash(url) % len(self._locks)]:
+                # whoever held the lock may have just fetched it
+                thumbnail, failed = self._lookup(url, size)
+                if thumbnail is None and not failed:
+                    return self._fetch(url, size)
+        if thumbnail is not None:
+            self.hits += 1
+        return thumbnail
+
+    def _fetch(self, url, size):
+        self.misses += 1
+        ref = self._ref_path(url)
+        try:
+            source = self.fetcher(url)
+            rendered = {name: render_thumbnail(source, dimensions, self.max_pixels)
+                        for name, dimensions in self.sizes.items()}
+        except ThumbnailError:
+            self.failures += 1
+            # an empty reference remembers the failure for retry_after seconds
+            self._write(ref, b'')
+            return None
+        digest = hashlib.sha256(source).hexdigest()
+        path = self._thumbnail_path(digest, size)
+        written = sum(self._write(self._thumbnail_path(digest, name), data)
+                      for name, data in rendered.items())
+        written += self._write(ref, digest.encode())
+        try:
+            thumbnail = self._open(path)
+        except FileNotFoundError:
+            # another process evicted it already
+            self._write(path, rendered[size])
+            thumbnail = self._open(path)
+        self._account(written)
+        return thumbnail
+
+    def _account(self, written):
+        with self._usage_lock:
+            if self._usage is not None:
+                self._usage += written
+            if self._usage is None or self._usage > self.max_bytes:
+                self._usage = self.evict()
+
+    def evict(self):
+        # deletes the least recently served thumbnails until the cache is
+        # back under 90% of its limit; returns the bytes left. References are
+        # a few bytes each and stay, as do files still being written.
+        files = []
+        for root, directories, names in os.walk(self.directory):
+            if root == self.directory and 'refs' in directories:
+                directories.remove('refs')
+            for name in names:
+                if name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    status = os.stat(path)
+                except OSError:
+                    continue
+                files.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return total
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        return total
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'failures': self.failures,
+            'evictions': self.evictions,
+        }
+
+
+thumbnail_store = ThumbnailStore()
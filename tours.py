@@ -0,0 +1,176 @@
+from datetime import timedelta
+from itertools import islice
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+
+from cache import detail_cache
+from conflicts import describe_conflict
+from jobs import enqueue
+from models import Artist, Venue, Show, SHOW_DURATION_MINUTES, db
+from queries import existing_ids, touch, tour_conflicts_query
+
+#----------------------------------------------------------------------------#
+# Tours.
+#----------------------------------------------------------------------------#
+
+# A tour is one artist's list of (venue_id, start_time) dates, given one per
+# line or as a recurrence rule, and booked in one request: the ids are checked
+# with one IN query, overlaps with one query, and the dates that pass are
+# written with one multi-row INSERT in one transaction. Each date gets its
+# own result, so one taken night does not cost the rest of the tour.
+
+
+class TourError(ValueError):
+    pass
+
+
+def parse_start(value):
+    import dateutil.parser
+    try:
+        start_time = dateutil.parser.parse(value)
+    except (OverflowError, ValueError):
+        raise TourError('{!r} is not a date and time'.format(value))
+    # shows are stored in naive local time
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone().replace(tzinfo=None)
+    return start_time
+
+
+def parse_entries(text):
+    # "venue_id, start time" per line -> [(venue_id, start_time)]
+    entries = []
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        venue_id, _, start = line.partition(',')
+        try:
+            entries.append((int(venue_id), parse_start(start.strip())))
+        except ValueError:
+            raise TourError('Line {}: expected "venue_id, start time", got {!r}'.format(line_no, line.strip()))
+    return entries
+
+
+def expand_rule(venue_id, start_time, rule, limit):
+    # an RFC 5545 RRULE such as "FREQ=WEEKLY;BYDAY=FR,SA;COUNT=8", starting
+    # at start_time, as (venue_id, start_time) entries
+    from dateutil.rrule import rrulestr
+    try:
+        dates = list(islice(rrulestr(rule, dtstart=start_time), limit + 1))
+    except (TypeError, ValueError) as error:
+        raise TourError('Invalid recurrence rule: {}'.format(error))
+    if len(dates) > limit:
+        raise TourError('The recurrence rule yields more than {} dates; add COUNT or UNTIL'.format(limit))
+    return [(venue_id, date) for date in dates]
+
+
+def tour_entries(limit, entries=(), venue_id=None, start_time=None, rule=None):
+    # a tour's dates, from parsed entries, a recurrence rule or both
+    entries = list(entries)
+    if rule:
+        if venue_id is None or start_time is None:
+            raise TourError('A recurrence rule needs a venue and a first start time')
+        entries += expand_rule(venue_id, start_time, rule, limit)
+    if not entries:
+        raise TourError('Give at least one date or a recurrence rule')
+    if len(entries) > limit:
+        raise TourError('A tour books at most {} dates at once'.format(limit))
+    return entries
+
+
+def _result(venue_id, start_time, show_id=None, error=None):
+    return {
+        'venue_id': venue_id,
+        'start_time': start_time,
+        'status': 'rejected' if error else 'booked',
+        'show_id': show_id,
+        'error': error,
+    }
+
+
+def schedule_conflicts(artist_id, entries, candidates, length):
+    # {entry: message} for the candidate entries that overlap a show already
+    # booked at their venue or by the artist, in one query
+    conflicts = {}
+    if candidates:
+        rows = db.session.execute(tour_conflicts_query(artist_id, [
+            (entries[entry][0], entries[entry][1], entries[entry][1] + length) for entry in candidates
+        ])).all()
+        for row in rows:
+            entry = candidates[row.entry]
+            if entry not in conflicts:
+                conflicts[entry] = describe_conflict(row, artist_id, entries[entry][0])
+    return conflicts
+
+
+def tour_conflict(artist_id, entries, duration=None):
+    # explains a tour that tripped the exclusion constraints: the first date
+    # the schedule, as committed since, overlaps; None when none does now
+    length = timedelta(minutes=duration or SHOW_DURATION_MINUTES)
+    conflicts = schedule_conflicts(artist_id, entries, list(range(len(entries))), length)
+    if not conflicts:
+        return None
+    entry = min(conflicts)
+    return 'Date {} was just booked: {}'.format(entry + 1, conflicts[entry])
+
+
+def book_tour(artist_id, entries, duration=None):
+    # Books every entry that names a real venue and overlaps nothing, commits,
+    # and returns one result per entry, in order. A write that trips the
+    # exclusion constraints anyway, because a concurrent request booked one
+    # of the slots first, rolls the whole tour back and raises; callers tell
+    # that case apart with conflicts.is_double_booking.
+    duration = duration or SHOW_DURATION_MINUTES
+    length = timedelta(minutes=duration)
+    errors = [None] * len(entries)
+
+    if not existing_ids(db.session, Artist, {artist_id}):
+        return [_result(venue_id, start, error='No artist with id {}'.format(artist_id))
+                for venue_id, start in entries]
+    venue_ids = existing_ids(db.session, Venue, {venue_id for venue_id, _ in entries})
+    for entry, (venue_id, _) in enumerate(entries):
+        if venue_id not in venue_ids:
+            errors[entry] = 'No venue with id {}'.format(venue_id)
+
+    # against the schedule already booked...
+    candidates = [entry for entry, error in enumerate(errors) if error is None]
+    for entry, conflict in schedule_conflicts(artist_id, entries, candidates, length).items():
+        errors[entry] = conflict
+    # ...and against the tour's own dates, all by the same artist
+    booked = []
+    for entry in sorted(range(len(entries)), key=lambda entry: entries[entry][1]):
+        if errors[entry] is not None:
+            continue
+        if booked and entries[booked[-1]][1] + length > entries[entry][1]:
+            errors[entry] = 'Overlaps date {} of this tour.'.format(booked[-1] + 1)
+        else:
+            booked.append(entry)
+    booked.sort()
+
+    show_ids = {}
+    if booked:
+        records = [{'artist_id': artist_id, 'venue_id': entries[entry][0], 'start_time': entries[entry][1],
+                    'duration_minutes': duration} for entry in booked]
+        try:
+            # one INSERT ... VALUES (...), (...) RETURNING for the whole tour;
+            # the artist plays one show at a time, so start_time tells the rows apart
+            rows = db.session.execute(insert(Show).values(records).returning(Show.id, Show.start_time)).all()
+            created = {row.start_time: row.id for row in rows}
+            ids = [created[entries[entry][1]] for entry in booked]
+            booked_venues = sorted({record['venue_id'] for record in records})
+            # their pages list the new shows now; the counters catch up in a job
+            touch(db.session, Artist, [artist_id])
+            touch(db.session, Venue, booked_venues)
+            enqueue('refresh_activity', {'artist_ids': [artist_id], 'venue_ids': booked_venues},
+                    key='tour-created:{}'.format(min(ids)))
+            db.session.commit()
+        except DBAPIError:
+            db.session.rollback()
+            raise
+        show_ids = dict(zip(booked, ids))
+        detail_cache.invalidate('artist', artist_id)
+        for venue_id in booked_venues:
+            detail_cache.invalidate('venue', venue_id)
+
+    return [_result(venue_id, start, show_ids.get(entry), errors[entry])
+            for entry, (venue_id, start) in enumerate(entries)]